@@ -17,6 +17,39 @@ def create_app():
     # 必须放在 db.init_app 之后，注册蓝图之前
     from app import models
 
+    # 遥测写后缓冲 (后台线程批量入库)
+    from app.services.write_buffer import write_buffer
+    write_buffer.init_app(app)
+
+    # 光伏数据落库时同步累加 5 分钟时间槽汇总
+    from app.models import PVGenerationData
+    from app.services.pv_rollup_service import PVRollupService
+    write_buffer.register_hook(PVGenerationData, PVRollupService.apply)
+
+    # 能耗数据落库时增量更新峰谷日统计，提交后失效周期报表缓存
+    from app.models import EnergyData
+    from app.services.energy_service import AnalysisService
+    write_buffer.register_hook(EnergyData, AnalysisService.apply_energy_rows)
+    write_buffer.register_listener(EnergyData, AnalysisService.energy_rows_committed)
+
+    # 光伏实时数据推送 (SSE)
+    from app.services.pv_stream import pv_stream_hub
+    pv_stream_hub.init_app(app)
+
+    # 系统参数进程内缓存
+    from app.services.config_cache import system_config
+    system_config.init_app(app)
+
+    # 未结案告警去重索引
+    from app.services.alarm_service import open_alarm_index
+    open_alarm_index.init_app(app)
+
+    # 遥测阈值规则引擎: 每批数据落库后向量化判定并建立告警
+    from app.services.rule_engine import rule_engine
+    rule_engine.init_app(app)
+    for model in rule_engine.models():
+        write_buffer.register_listener(model, rule_engine.listener(model))
+
     # 4. 注册蓝图
     from app.blueprints import auth, dashboard, monitor, energy, maintenance, admin
 
@@ -9,6 +9,11 @@ from datetime import datetime, date
 from flask import Blueprint, render_template, request, flash, redirect, url_for, send_file
 from app.decorators import role_required
 from app.extensions import db
+from app.services.write_buffer import write_buffer
+from app.services.pv_cache import history_profile_cache
+from app.services.config_cache import system_config
+from app.services.tariff_calendar import tariff_calendar
+from app.services.alarm_service import open_alarm_index
 
 # 引入所有需要备份的模型
 from app.models import (
@@ -299,6 +304,8 @@ def restore_backup():
                 db.session.add(RealtimeSummary(**item))
 
         db.session.commit()
+        # 告警整表被替换，未结案去重键以恢复后的数据为准
+        open_alarm_index.invalidate()
         flash('全量数据恢复成功！', 'success')
 
     except Exception as e:
@@ -341,6 +348,10 @@ def system_monitor():
     except Exception as e:
         status['os_error'] = str(e)
 
+    # 3. 遥测写入缓冲 (队列深度 / 刷写延迟 / 丢弃行数)
+    status['write_buffer'] = write_buffer.stats()
+    status['history_cache'] = history_profile_cache.stats()
+
     return render_template('admin/monitor.html', status=status)
 
 
@@ -350,32 +361,47 @@ def system_monitor():
 @bp.route('/system/config', methods=['GET', 'POST'])
 @role_required(['admin'])
 def config_management():
-    """ 配置告警阈值与峰谷时段 """
+    """ 配置告警阈值、峰谷时段与分时电价日历 """
     default_configs = [
         ('transformer_temp_high', '85', '变压器高温告警阈值 (℃)'),
         ('circuit_overload_amp', '400', '回路电流过载阈值 (A)'),
+        ('voltage_limit_35kv', '37', '35KV回路电压上限 (kV)'),
+        ('inverter_efficiency_min', '85', '逆变器效率下限 (%)'),
         ('peak_hours', '09:00-11:00,15:00-17:00', '峰段电价时间范围'),
-        ('data_refresh_rate', '15', '采集终端数据刷新间隔 (秒)')
+        ('data_refresh_rate', '15', '采集终端数据刷新间隔 (秒)'),
+        ('data_retention_days', '365', '遥测数据保留天数 (天)'),
+        ('tariff_calendar', '{}', '分时电价日历 (JSON，{} 表示使用内置时段与单价)')
     ]
 
     if request.method == 'POST':
+        # 时段与电价日历保存前先编译校验，避免错误配置影响计价
+        try:
+            tariff_calendar.parse(request.form.get('tariff_calendar'), request.form.get('peak_hours'))
+        except ValueError as e:
+            flash(str(e), 'danger')
+            return redirect(url_for('admin.config_management'))
+
+        keys = [key for key, _, _ in default_configs]
+        existing = {c.config_key: c for c in SystemConfig.query.filter(SystemConfig.config_key.in_(keys))}
         for key, default_val, desc in default_configs:
             new_val = request.form.get(key)
-            conf = SystemConfig.query.get(key)
+            conf = existing.get(key)
             if conf:
                 conf.config_value = new_val
             else:
                 db.session.add(SystemConfig(config_key=key, config_value=new_val, description=desc))
         db.session.commit()
+        # 本进程立即生效，其他 worker 通过 updated_at 检测到变化
+        system_config.invalidate()
         flash('系统参数配置已更新', 'success')
         return redirect(url_for('admin.config_management'))
 
+    saved = system_config.all()
     configs = {}
     for key, default_val, desc in default_configs:
-        conf = SystemConfig.query.get(key)
-        if not conf:
+        if key not in saved:
             configs[key] = {'val': default_val, 'desc': desc}
         else:
-            configs[key] = {'val': conf.config_value, 'desc': conf.description}
+            configs[key] = {'val': saved[key][0], 'desc': saved[key][1]}
 
     return render_template('admin/config.html', configs=configs)
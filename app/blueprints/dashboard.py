@@ -1,5 +1,5 @@
 # app/blueprints/dashboard.py
-from flask import Blueprint, render_template, jsonify
+from flask import Blueprint, render_template, jsonify, request, current_app
 from flask_login import login_required, current_user
 from sqlalchemy import func
 from app.models import (
@@ -7,6 +7,7 @@ from app.models import (
     ScreenConfig, RealtimeSummary, HistoryTrend
 )
 from app.extensions import db
+from app.services.analysis_service import AnalysisService
 from datetime import datetime, timedelta
 import random
 
@@ -80,16 +81,44 @@ def index():
 def get_realtime_chart_data():
     """
     API 接口: 折线图数据 (配电网负荷趋势)
+    - 在 SQL 中按时间桶降采样 (桶内各回路平均功率求和 = 全网总负荷)，点数不超过 max_points
+    - 首次请求返回最近 24 小时数据 (full=true)
+    - 之后携带 since=<上次返回的 cursor> 只返回游标所在桶及之后的桶 (full=false)，
+      前端按 ts 覆盖同一个桶的旧值
     """
-    # 返回最近 24 小时的配电总负荷数据
-    one_day_ago = datetime.now() - timedelta(hours=24)
-    data = CircuitData.query.filter(CircuitData.collect_time >= one_day_ago) \
-        .order_by(CircuitData.collect_time.asc()).all()
+    max_points = min(max(request.args.get('max_points', 288, type=int), 10), 2000)
+    bucket_seconds = AnalysisService.bucket_seconds_for(24 * 3600, max_points)
+
+    now = datetime.now()
+    one_day_ago = now - timedelta(hours=24)
+    # 遥测经写后缓冲延迟落库，游标只推进到确定已落库的时间点，避免漏掉晚到的数据
+    settled = now - timedelta(seconds=2 * current_app.config.get('WRITE_BUFFER_FLUSH_INTERVAL', 1.0))
+
+    since = None
+    if request.args.get('since'):
+        try:
+            since = datetime.fromisoformat(request.args['since'])
+        except ValueError:
+            since = None
+    if since is not None and since < one_day_ago:
+        since = None
+
+    if since is None:
+        start = one_day_ago
+    else:
+        # 游标所在的桶上次可能只聚合了一部分，从桶起点重新聚合
+        offset = int((since - AnalysisService.BUCKET_ANCHOR).total_seconds()) // bucket_seconds
+        start = AnalysisService.BUCKET_ANCHOR + timedelta(seconds=offset * bucket_seconds)
+
+    series = AnalysisService.get_circuit_load_series(start, settled, bucket_seconds)
 
-    # 简单取值
     result = {
-        'time': [d.collect_time.strftime('%H:%M') for d in data],
-        'value': [float(d.active_power_kw or 0) for d in data]
+        'time': [t.strftime('%H:%M') for t, _ in series],
+        'ts': [t.isoformat() for t, _ in series],
+        'value': [round(v, 2) for _, v in series],
+        'bucket_seconds': bucket_seconds,
+        'cursor': settled.isoformat(),
+        'full': since is None
     }
     return jsonify(result)
 
@@ -98,12 +98,20 @@ def edit_data(data_id):
 @role_required(['energy_manager', 'admin'])
 def high_energy_analysis():
     date_str = request.args.get('date')
+    month_str = request.args.get('month')  # YYYY-MM，按月分析 (读月度立方体)
     energy_type = request.args.get('energy_type', 'gas')
 
     avg_value = None
     high_plants = []
 
-    if date_str:
+    if month_str:
+        month_date = datetime.strptime(month_str, "%Y-%m")
+        avg_value, high_plants = AnalysisService.analyze_high_energy_plant_month(
+            year=month_date.year,
+            month=month_date.month,
+            energy_type=energy_type
+        )
+    elif date_str:
         stat_date = datetime.strptime(date_str, "%Y-%m-%d").date()
         avg_value, high_plants = AnalysisService.analyze_high_energy_plant(
             stat_date=stat_date,
@@ -113,14 +121,15 @@ def high_energy_analysis():
     return render_template(
         'energy/high_energy.html',
         avg_value=avg_value,
-        high_plants=high_plants
+        high_plants=high_plants,
+        energy_type=energy_type
     )
 # ===================== 月度报表即查即看 =====================
 @bp.route('/period-report')
 @role_required(['admin',  'analyst','energy_manager'])
 def period_report():
     year = request.args.get('year', datetime.now().year, type=int)
-    period_type = request.args.get('period_type', 'month') # month 或 quarter
+    period_type = request.args.get('period_type', 'month') # month / quarter / year
     period_value = request.args.get('period_value', type=int)
     plant_id = request.args.get('plant_id', type=int)
     energy_type = request.args.get('energy_type', 'electric')
@@ -137,7 +146,7 @@ def period_report():
             period_type=period_type
         )
         if not report:
-            flash(f'暂无该{ "月份" if period_type=="month" else "季度" }的统计数据', 'info')
+            flash(f'暂无该{ {"month": "月份", "quarter": "季度"}.get(period_type, "年度") }的统计数据', 'info')
 
     return render_template(
         'energy/period_report.html',
@@ -1,14 +1,20 @@
 # app/blueprints/monitor.py
 
-from flask import Blueprint, render_template, request, jsonify,flash
-from sqlalchemy import func
+from flask import Blueprint, render_template, request, jsonify, flash, Response
 from app.decorators import role_required
 from app.models import PowerRoom, CircuitData, PVDevice, GridPoint, TransformerData, PVGenerationData, PVForecastData
 from app.extensions import db
+from app.services.pv_cache import pv_latest_cache, history_profile_cache, realtime_snapshot_cache
+from app.services.pv_forecast_engine import PVForecastEngine
+from app.services.pv_forecast_state import forecast_state_store
+from app.services.pv_ingest_service import PVIngestService
+from app.services.pv_rollup_service import PVRollupService
+from app.services.pv_stream import pv_stream_hub
+from app.services.write_buffer import write_buffer
 from datetime import datetime, date, time , timedelta
 from flask_login import current_user # 【新增】需要获取当前登录用户
-import math
-import time as time_mod  # 重命名避免冲突
+import json
+import zlib
 
 bp = Blueprint('monitor', __name__)
 
@@ -22,10 +28,9 @@ BASE_FORECAST_RULES = [
     30, 0, 0, 0, 0, 0, 0
 ]
 
-# 【核心逻辑】预测修正系数
+# 【核心逻辑】预测修正系数 (按并网点持久化，见 PVForecastStateStore)
 # 1.0 = 正常状态
 # 0.6 = 优化后状态 (适应故障/低功率环境)
-current_forecast_factor = 1.0
 
 
 # ============= 配电网监测业务线  =============
@@ -75,33 +80,20 @@ def pv_dashboard():
 
 @bp.route('/api/pv/upload', methods=['POST'])
 def upload_pv_data():
-    """接收模拟器数据并存入数据库"""
-    data = request.json
+    """接收模拟器数据并存入数据库 (与批量接口同一套校验，校验通过才入队)"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"code": 400, "msg": "请求体应为 JSON 对象"}), 400
     try:
-        # 1. 获取设备 ID (确保和 init_data 中的 device_id 对应)
-        dev_id = data.get('device_id')
-        if not dev_id:
-            return jsonify({"code": 400, "msg": "缺少 device_id"}), 400
-
-        # 2. 从数据包中提取字段 (适配你的 Mock 脚本)
-        v = data.get('string_voltage_v', 0)
-        i = data.get('string_current_a', 0)
-        eff = data.get('inverter_eff_pct', 98.5)
-        gen = data.get('gen_kwh', 0)
-
-        # 3. 创建新记录 (字段名必须与你的 PVGenerationData 模型完全一致)
-        new_record = PVGenerationData(
-            device_id=dev_id,
-            collect_time=datetime.now(),
-            string_voltage_v=v,
-            string_current_a=i,
-            inverter_eff_pct=eff,
-            gen_kwh=gen,
-            grid_point_id=1  # 对应你 init_data 中创建的 grid_point_id
-        )
-
-        db.session.add(new_record)
-        db.session.commit()
+        # 1. 校验设备与数值字段，不合法的读数直接拒绝，不进入写入队列
+        rows, results = PVIngestService.validate_readings([data])
+        if not rows:
+            return jsonify({"code": 400, "msg": results[0]['reason']}), 400
+
+        # 2. 交给写后缓冲批量入库，队列已满时提示网关稍后重试
+        if not write_buffer.submit(PVGenerationData, rows):
+            return jsonify({"code": 503, "msg": "写入队列已满，请稍后重试"}), 503
+        pv_latest_cache.update(rows)
 
         return jsonify({"code": 200, "msg": "数据上传成功"})
 
@@ -112,655 +104,167 @@ def upload_pv_data():
         return jsonify({"code": 500, "msg": f"后端处理出错: {str(e)}"}), 500
 
 
-def get_historical_average_power(hour, minute_slot):
+@bp.route('/api/pv/upload_batch', methods=['POST'])
+def upload_pv_data_batch():
     """
-    ✅ 新增：从数据库获取过去3天该时间点的平均功率
+    批量接收网关数据 (JSON 数组 / NDJSON)
+    整批一次校验后交给写后缓冲多行 INSERT 入库，逐行返回接收/拒绝结果
     """
     try:
-        # 获取过去3天的同一时间段
-        # 这里为了演示逻辑，我们通过 SQL 计算该时段的历史平均值
-        # 实际生产中建议将此计算结果缓存，避免每次请求都扫大表
-        avg_val = db.session.query(
-            func.avg(PVGenerationData.string_voltage_v * PVGenerationData.string_current_a / 1000.0)
-        ).filter(
-            func.date_format(PVGenerationData.collect_time, '%H:%i') >= f"{hour:02d}:{minute_slot:02d}",
-            func.date_format(PVGenerationData.collect_time, '%H:%i') < f"{hour:02d}:{(minute_slot + 5):02d}"
-        ).scalar() or 0
-        return float(avg_val)
-    except:
-        return 0
-
-
-current_forecast_factor = 1.0
-
-
-# def get_smoothed_forecast(factor):
-#     """
-#     ✅ 关键改进：引入动态权重权重
-#     如果 factor 被人工调整（不等于 1.0），说明历史数据不可信，加大理论基准的权重
-#     """
-#     smoothed_data = []
-#     history_features = get_db_weighted_history()
-#
-#     # 判定是否处于人工干预状态
-#     is_intervened = abs(factor - 1.0) > 0.05
-#
-#     for h in range(24):
-#         curr_rule = BASE_FORECAST_RULES[h] * factor
-#         next_rule = BASE_FORECAST_RULES[(h + 1) % 24] * factor
-#
-#         for i in range(12):
-#             slot_idx = h * 12 + i
-#             fraction = i / 12.0
-#             interp_val = curr_rule + (next_rule - curr_rule) * fraction
-#
-#             db_val = history_features.get(slot_idx)
-#
-#             # ✅ 动态调权逻辑：
-#             # 如果人工点击了优化，理论基准(interp_val)权重占 90%，强制曲线移动
-#             # 如果是正常运行，历史特征(db_val)权重占 90%，保持波形真实
-#             if is_intervened or db_val is None:
-#                 final_val = interp_val
-#             else:
-#                 # 正常模式下，结合历史特征
-#                 final_val = (db_val * 0.9) + (interp_val * 0.1)
-#
-#             pseudo_noise = (math.sin(h + i) * 0.01 + 1)
-#             smoothed_data.append(round(final_val * pseudo_noise, 2))
-#     return smoothed_data
-
-def slot_noise(h, i):
-    """生成基于时间槽的固定伪噪声，让预测线带点“历史感”"""
-    return (math.sin(h + i) + math.cos(h * i)) if 'math' in globals() else 1
-
-
-# def get_db_weighted_forecast(factor):
-#     """
-#     ✅ 修复：统一 Slot 计算 + 全局系数应用
-#     """
-#     forecast_288 = []
-#     device_count = PVDevice.query.count() or 1
-#
-#     # 获取历史特征 (get_db_weighted_history 已经改对了，这里直接调用)
-#     history_map = get_db_weighted_history()
-#
-#     for slot in range(288):
-#         h = slot // 12
-#         m_frac = (slot % 12) / 12.0
-#
-#         # 理论插值
-#         curr_rule = BASE_FORECAST_RULES[h]
-#         next_rule = BASE_FORECAST_RULES[(h + 1) % 24]
-#         rule_val = curr_rule + (next_rule - curr_rule) * m_frac
-#
-#         # 混合历史
-#         hist_val = history_map.get(slot, rule_val)
-#
-#         # 混合基数 (80% 历史 + 20% 理论)
-#         base_val = (hist_val * 0.8) + (rule_val * 0.2)
-#
-#         # ✅ 关键修改：系数 factor 乘在最外面
-#         # 这样 optimize_model 算出的 factor 才能真正把曲线拉到实际值
-#         final_val = base_val * factor
-#
-#         forecast_288.append(round(final_val * (1 + math.sin(slot) * 0.002), 2))
-#
-#     return forecast_288
-
-def get_db_history_map():
-    """(保持不变)"""
-    history_map = {}
-    try:
-        seven_days_ago = datetime.now() - timedelta(days=7)
-        stats = db.session.query(
-            (func.hour(PVGenerationData.collect_time) * 12 + func.floor(func.minute(PVGenerationData.collect_time) / 5)).label('slot'),
-            func.avg(PVGenerationData.string_voltage_v * PVGenerationData.string_current_a / 1000.0)
-        ).filter(PVGenerationData.collect_time >= seven_days_ago).group_by('slot').all()
-
-        device_count = PVDevice.query.count() or 1
-        history_map = {int(s): float(v or 0) * device_count for s, v in stats}
-    except Exception as e:
-        print(f"提取历史特征失败: {e}")
-    return history_map
-
-
-def get_final_forecast_series(factor, split_idx=None):
-    """
-    ✅ 核心修复：分段预测生成
-    - split_idx 之前 (过去)：使用系数 1.0 (显示原始基准，证明过去预测可能有偏)
-    - split_idx 之后 (未来)：使用优化系数 (显示修正后的趋势)
-    """
-    forecast_288 = []
-    history_map = get_db_history_map()
-
-    # 如果没有传入分割点，说明是查看明天/全天预览，直接全量应用系数
-    if split_idx is None:
-        split_idx = -1
-
-    for slot in range(288):
-        h = slot // 12
-        m_frac = (slot % 12) / 12.0
-
-        # 1. 基础计算
-        curr_rule = BASE_FORECAST_RULES[h]
-        next_rule = BASE_FORECAST_RULES[(h + 1) % 24]
-        rule_val = curr_rule + (next_rule - curr_rule) * m_frac
-        hist_val = history_map.get(slot, rule_val)
-        base_val = (hist_val * 0.8) + (rule_val * 0.2)
-
-        # 2. ✅ 分段应用系数
-        # 过去的时间保持原样 (1.0)，未来的时间应用优化系数
-        # 这样点击优化时，只有当前点之后的蓝线会跳变，前面的保持不动
-        active_factor = 1.0 if slot < split_idx else factor
-
-        final_val = base_val * active_factor
-
-        # 注入微小噪声
-        forecast_288.append(round(final_val * (1 + math.sin(slot) * 0.002), 2))
-
-    return forecast_288
-
-
-# =================================================
-
-@bp.route('/api/pv/realtime')
-def pv_realtime_data():
-    global current_forecast_factor
-    now = datetime.now()
-    today_start = datetime.combine(date.today(), time.min)
-
-    devices = PVDevice.query.all()
-    device_count = len(devices) if devices else 1
-
-    # A. 实时功率
-    total_latest_power = 0.0
-    for dev in devices:
-        last = PVGenerationData.query.filter_by(device_id=dev.device_id).order_by(
-            PVGenerationData.collect_time.desc()).first()
-        if last and (now - last.collect_time).total_seconds() < 60:
-            total_latest_power += (float(last.string_voltage_v or 0) * float(last.string_current_a or 0)) / 1000.0
-
-    # B. ✅ 绿线修复：初始化为 None，实现断线效果
-    real_power_series = [None] * 288
-
-    stats = db.session.query(
-        (func.hour(PVGenerationData.collect_time) * 12 + func.floor(func.minute(PVGenerationData.collect_time) / 5)).label(
-            'slot'),
-        (func.avg(PVGenerationData.string_voltage_v * PVGenerationData.string_current_a / 1000.0) * device_count)
-    ).filter(PVGenerationData.collect_time >= today_start).group_by('slot').all()
-
-    for slot, val in stats:
-        idx = int(slot)
-        if 0 <= idx < 288:
-            real_power_series[idx] = round(float(val or 0), 2)
-
-    # 锁定当前时间槽
-    current_idx = now.hour * 12 + now.minute // 5
+        readings = PVIngestService.parse_payload(request.get_data(as_text=True), request.mimetype)
+    except ValueError as e:
+        return jsonify({"code": 400, "msg": str(e)}), 400
 
-    # 填充 0 点到当前点的空洞 (防止断断续续)，但只填到 current_idx
-    # 如果数据库没数，说明是 0 功率
-    for i in range(current_idx + 1):
-        if real_power_series[i] is None:
-            real_power_series[i] = 0.0
+    if len(readings) > PVIngestService.MAX_BATCH_SIZE:
+        return jsonify({"code": 413, "msg": f"单批最多 {PVIngestService.MAX_BATCH_SIZE} 条"}), 413
 
-    # 强制对齐末端
-    if 0 <= current_idx < 288:
-        real_power_series[current_idx] = round(total_latest_power, 2)
-
-    # ✅ 关键：current_idx 之后的数据保持为 None (ECharts 不会绘制)
-
-    # C. 生成分段预测线
-    forecast_series = get_final_forecast_series(current_forecast_factor, split_idx=current_idx)
-
-    # D. 偏差率 (复用分段后的预测值)
-    current_forecast = forecast_series[current_idx] if current_idx < 288 else 0
-    deviation_rate = 0.0
-    if current_forecast > 1.0:
-        deviation_rate = (abs(total_latest_power - current_forecast) / current_forecast) * 100
-    elif total_latest_power > 1.0:
-        deviation_rate = 100.0
-
-    total_energy = db.session.query(func.sum(PVGenerationData.gen_kwh)).filter(
-        PVGenerationData.collect_time >= today_start).scalar() or 0
+    try:
+        results = PVIngestService.ingest_batch(readings)
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ 批量上传失败详情: {str(e)}")
+        return jsonify({"code": 500, "msg": f"后端处理出错: {str(e)}"}), 500
 
+    accepted = sum(1 for r in results if r['status'] == 'accepted')
     return jsonify({
-        'current_power': round(total_latest_power, 2),
-        'daily_energy': round(float(total_energy), 1),
-        'co2_reduce': round(float(total_energy) * 0.997 / 1000, 3),
-        'deviation_rate': round(deviation_rate, 1),
-        'chart_series': real_power_series,  # 包含 None 的数组
-        'forecast_series': forecast_series,
-        'status': 'healthy' if deviation_rate < 15.0 else 'risk'
+        "code": 200,
+        "msg": f"接收 {accepted} 条，拒绝 {len(results) - accepted} 条",
+        "accepted": accepted,
+        "rejected": len(results) - accepted,
+        "results": results
     })
 
-# 修改 monitor.py 中的 get_pv_forecast 接口
-@bp.route('/api/pv/forecast')
-def get_pv_forecast():
-    """
-    ✅ 核心功能：基于【历史特征】的明日天气模拟
-    逻辑：复用 get_final_forecast_series，但 split_idx 传 None (全天应用系数)
-    """
-    global current_forecast_factor
 
-    weather = request.args.get('weather')
+def get_historical_average_power(slot, days=3, grid_point_id=None):
+    """ 过去 days 天某个 5 分钟时间槽 (0-287) 的单条读数平均功率，读时间槽汇总表 """
+    today = date.today()
+    return PVRollupService.slot_average(slot, today - timedelta(days=days), today, grid_point_id)
 
-    # 定义三种典型气象的修正系数
-    # 晴天=1.15 (比平时高)，多云=0.65 (明显下降)，雨天=0.25 (压得很低)
-    weather_map = {
-        'sunny': 1.15,
-        'cloudy': 0.65,
-        'rainy': 0.25
-    }
 
-    # 获取目标系数：
-    # 如果前端传了 weather 参数，使用对应系数
-    # 如果没传 (比如刚加载时)，使用当前正在运行的实时系数 (current_forecast_factor)
-    target_factor = weather_map.get(weather, current_forecast_factor)
+def get_db_history_map(grid_point_id=None):
+    """过去 7 天各时间槽平均功率 (带 TTL 缓存，各预测接口共用；grid_point_id 为空表示全站)"""
+    return history_profile_cache.get(grid_point_id, lambda: load_db_history_map(grid_point_id))
 
-    # 生成预测数据
-    # 注意：这里不传 split_idx，意味着全天 288 个点都应用 target_factor
-    # 这样用户看到的就是一条完整的、带有本电站历史特征的“明天预测线”
-    forecast_data = get_final_forecast_series(target_factor)
 
-    return jsonify({'code': 200, 'data': forecast_data})
-
-
-# app/blueprints/monitor.py
-
-@bp.route('/api/pv/model_status')
-def get_model_status():
-    """
-    ✅ 唯一的模型状态函数
-    合并了实时偏差对齐逻辑与历史显示逻辑
-    """
-    global current_forecast_factor
-    try:
-        # 1. 统一调用实时数据接口的逻辑，确保数值与顶部卡片绝对一致
-        realtime_response = pv_realtime_data()
-        realtime_data = realtime_response.get_json()
-
-        today_deviation = realtime_data.get('deviation_rate', 0.0)
-
-        # 2. 获取历史记录 (过去2天)
-        today_date = date.today()
-        history_records = PVForecastData.query.filter(PVForecastData.forecast_date < today_date).order_by(
-            PVForecastData.forecast_date.desc()).limit(2).all()
-
-        # 3. 构造返回列表
-        data_list = [
-            {
-                'date': '今天 (实时)',
-                'deviation': today_deviation,
-                'status': '异常' if today_deviation > 15 else '正常'
-            }
-        ]
-
-        for r in history_records:
-            dev_val = float(r.deviation_pct or 0)
-            data_list.append({
-                'date': r.forecast_date.strftime('%m-%d'),
-                'deviation': round(dev_val, 1),
-                'status': '异常' if dev_val > 15 else '正常'
-            })
-
-        # 4. 判定状态：只要今天异常，就激活优化按钮
-        is_alarm = True if today_deviation > 15.0 else False
-
-        return jsonify({
-            'status': 'risk' if is_alarm else 'healthy',
-            'history': data_list,
-            'model_version': 'v2.2-Unified'
-        })
-    except Exception as e:
-        print(f"❌ get_model_status 报错: {e}")
-        return jsonify({'code': 500, 'msg': str(e)}), 500
-
-
-@bp.route('/api/pv/optimize', methods=['POST'])
-def optimize_model():
-    # ... (保持你之前的 optimize_model 代码，逻辑是通用的) ...
-    # 只需要把计算逻辑放这里即可
-    global current_forecast_factor
-    try:
-        now = datetime.now()
-        current_slot = now.hour * 12 + now.minute // 5
-
-        res = pv_realtime_data().get_json()
-        actual_p = res['current_power']
-
-        # 计算基准时，factor 传 1.0，split_idx 传 -1 (取纯基准)
-        # 这里我们需要手动算一下基准值
-        h = current_slot // 12
-        m = (current_slot % 12) / 12.0
-        rule = BASE_FORECAST_RULES[h] + (BASE_FORECAST_RULES[(h + 1) % 24] - BASE_FORECAST_RULES[h]) * m
-        hist = get_db_history_map().get(current_slot, rule)
-        base_p = hist * 0.8 + rule * 0.2
-
-        if base_p > 5.0:
-            new_factor = actual_p / base_p
-            current_forecast_factor = round(max(0.1, min(2.5, new_factor)), 4)
-            return jsonify({'code': 200, 'msg': f"已优化未来趋势，系数: {current_forecast_factor}"})
-        return jsonify({'code': 400, 'msg': "功率过低"})
-    except Exception as e:
-        return jsonify({'code': 500, 'msg': str(e)})
-
-def get_db_weighted_history():
-    """获取过去7天历史特征，增加错误处理防止空表报错"""
+def load_db_history_map(grid_point_id=None):
+    """过去 7 天各时间槽平均功率 (读 5 分钟时间槽汇总表)"""
     history_map = {}
     try:
-        # 只选取过去7天中偏差率小于20%的“高质量”历史数据作为参考
-        # 避免模型学习到之前因为模拟器停发产生的 0 功率“脏数据”
         seven_days_ago = datetime.now() - timedelta(days=7)
-        stats = db.session.query(
-            (func.hour(PVGenerationData.collect_time) * 12 + func.floor(
-                func.minute(PVGenerationData.collect_time) / 5)).label('slot'),
-            func.avg(PVGenerationData.string_voltage_v * PVGenerationData.string_current_a / 1000.0)
-        ).filter(PVGenerationData.collect_time >= seven_days_ago).group_by('slot').all()
-
-        device_count = PVDevice.query.count() or 1
-        history_map = {int(s): float(v or 0) * device_count for s, v in stats}
+        stats = PVRollupService.history_slot_averages(seven_days_ago, grid_point_id)
+
+        device_count = pv_device_query(grid_point_id).count() or 1
+        history_map = {s: v * device_count for s, v in stats.items()}
     except Exception as e:
         print(f"提取历史特征失败: {e}")
     return history_map
 
 
-# app/blueprints/monitor.py
+def pv_device_query(grid_point_id=None):
+    """ 全站或指定并网点下的光伏设备 """
+    query = PVDevice.query
+    if grid_point_id is not None:
+        query = query.filter(PVDevice.grid_point_id == grid_point_id)
+    return query
 
-# app/blueprints/monitor.py
-
-from flask import Blueprint, render_template, request, jsonify,flash
-from sqlalchemy import func
-from app.decorators import role_required
-from app.models import PowerRoom, CircuitData, PVDevice, GridPoint, TransformerData, PVGenerationData, PVForecastData
-from app.extensions import db
-from datetime import datetime, date, time , timedelta
-from flask_login import current_user # 【新增】需要获取当前登录用户
-import math
-import time as time_mod  # 重命名避免冲突
 
-bp = Blueprint('monitor', __name__)
-
-# =================================================
-# 1. 定义标准预测曲线 (基准线 0-23点)
-# =================================================
-BASE_FORECAST_RULES = [
-    0, 0, 0, 0, 0, 0,
-    30, 240, 540, 960, 1350, 1500,  # 06:00 - 11:00
-    1530, 1440, 1140, 750, 450, 180, # 12:00 - 17:00
-    30, 0, 0, 0, 0, 0, 0
-]
-
-# 【核心逻辑】预测修正系数
-# 1.0 = 正常状态
-# 0.6 = 优化后状态 (适应故障/低功率环境)
-current_forecast_factor = 1.0
-
-
-# ============= 配电网监测业务线  =============
-@bp.route('/distribution')
-@role_required(['operator', 'admin', 'analyst', 'order_manager'])
-def distribution_list():
+def get_final_forecast_series(factor, split_idx=None, grid_point_id=None):
     """
-    配电房列表与状态
-    【修改】实现权限控制: 运维人员仅能查看负责区域
+    ✅ 核心修复：分段预测生成
+    - split_idx 之前 (过去)：使用系数 1.0 (显示原始基准，证明过去预测可能有偏)
+    - split_idx 之后 (未来)：使用优化系数 (显示修正后的趋势)
+    计算由 PVForecastEngine 向量化完成 (历史*0.8 + 规则*0.2，再叠加微小噪声)
     """
-    user_roles = [r.role_name for r in current_user.roles]
-
-    # 如果是超级管理员，查看所有
-    if 'admin' in user_roles:
-        rooms = PowerRoom.query.all()
-
-    # 如果只是运维人员(且不是管理员)，只查 responsible_id 匹配的
-    elif 'operator' in user_roles:
-        rooms = PowerRoom.query.filter_by(responsible_id=current_user.user_id).all()
-        # 如果该运维人员没被分配任何配电房，给个空列表或提示
-        if not rooms:
-            flash('您当前没有负责的配电区域，请联系管理员分配。', 'info')
-
-    # 其他角色(如分析师)默认看所有(或根据需求调整)
-    else:
-        rooms = PowerRoom.query.all()
-
-    return render_template('monitor/distribution_list.html', rooms=rooms)
-@bp.route('/transformer/<int:power_room_id>')
-@role_required(['operator', 'energy_manager', 'admin', 'order_manager'])
-def transformer_detail(power_room_id):
-    """ 变压器监测详情页 """
-    room = PowerRoom.query.get_or_404(power_room_id)
-    transformers = TransformerData.query.filter_by(power_room_id=power_room_id) \
-        .order_by(TransformerData.collect_time.desc()).limit(50).all()
-    return render_template('monitor/transformer_detail.html', room=room, transformers=transformers)
-
-
-# ============= 分布式光伏管理业务线  =============
-@bp.route('/pv')
-@role_required(['analyst', 'admin', 'operator'])
-def pv_dashboard():
-    """ 光伏设备运行状态 """
-    devices = PVDevice.query.join(GridPoint).all()
-    return render_template('monitor/pv_dashboard.html', devices=devices)
+    history = PVForecastEngine.profile_matrix([get_db_history_map(grid_point_id)])
 
+    # 如果没有传入分割点，说明是查看明天/全天预览，直接全量应用系数
+    forecast = PVForecastEngine.forecast(history, factor, BASE_FORECAST_RULES, split_idx=split_idx)
+    return forecast[0].tolist()
 
-@bp.route('/api/pv/upload', methods=['POST'])
-def upload_pv_data():
-    """接收模拟器数据并存入数据库"""
-    data = request.json
-    try:
-        # 1. 获取设备 ID (确保和 init_data 中的 device_id 对应)
-        dev_id = data.get('device_id')
-        if not dev_id:
-            return jsonify({"code": 400, "msg": "缺少 device_id"}), 400
-
-        # 2. 从数据包中提取字段 (适配你的 Mock 脚本)
-        v = data.get('string_voltage_v', 0)
-        i = data.get('string_current_a', 0)
-        eff = data.get('inverter_eff_pct', 98.5)
-        gen = data.get('gen_kwh', 0)
-
-        # 3. 创建新记录 (字段名必须与你的 PVGenerationData 模型完全一致)
-        new_record = PVGenerationData(
-            device_id=dev_id,
-            collect_time=datetime.now(),
-            string_voltage_v=v,
-            string_current_a=i,
-            inverter_eff_pct=eff,
-            gen_kwh=gen,
-            grid_point_id=1  # 对应你 init_data 中创建的 grid_point_id
-        )
-
-        db.session.add(new_record)
-        db.session.commit()
-
-        return jsonify({"code": 200, "msg": "数据上传成功"})
-
-    except Exception as e:
-        db.session.rollback()
-        # 在终端打印错误详情，方便你看到底是哪个字段错了
-        print(f"❌ 上传失败详情: {str(e)}")
-        return jsonify({"code": 500, "msg": f"后端处理出错: {str(e)}"}), 500
 
+# =================================================
 
-def get_historical_average_power(hour, minute_slot):
+@bp.route('/api/pv/realtime')
+def pv_realtime_data():
     """
-    ✅ 新增：从数据库获取过去3天该时间点的平均功率
+    实时数据 (轮询)
+    - 首次请求返回完整的 288 点曲线，并附带 series_version 与 current_slot
+    - 之后携带 since=<上次的 current_slot> 与 version=<上次的 series_version>：
+      实际功率只返回 since 之后的时间槽 {slot: value}，预测曲线未变化时不再返回
     """
-    try:
-        # 获取过去3天的同一时间段
-        # 这里为了演示逻辑，我们通过 SQL 计算该时段的历史平均值
-        # 实际生产中建议将此计算结果缓存，避免每次请求都扫大表
-        avg_val = db.session.query(
-            func.avg(PVGenerationData.string_voltage_v * PVGenerationData.string_current_a / 1000.0)
-        ).filter(
-            func.date_format(PVGenerationData.collect_time, '%H:%i') >= f"{hour:02d}:{minute_slot:02d}",
-            func.date_format(PVGenerationData.collect_time, '%H:%i') < f"{hour:02d}:{(minute_slot + 5):02d}"
-        ).scalar() or 0
-        return float(avg_val)
-    except:
-        return 0
-
-
-current_forecast_factor = 1.0
-
-
-# def get_smoothed_forecast(factor):
-#     """
-#     ✅ 关键改进：引入动态权重权重
-#     如果 factor 被人工调整（不等于 1.0），说明历史数据不可信，加大理论基准的权重
-#     """
-#     smoothed_data = []
-#     history_features = get_db_weighted_history()
-#
-#     # 判定是否处于人工干预状态
-#     is_intervened = abs(factor - 1.0) > 0.05
-#
-#     for h in range(24):
-#         curr_rule = BASE_FORECAST_RULES[h] * factor
-#         next_rule = BASE_FORECAST_RULES[(h + 1) % 24] * factor
-#
-#         for i in range(12):
-#             slot_idx = h * 12 + i
-#             fraction = i / 12.0
-#             interp_val = curr_rule + (next_rule - curr_rule) * fraction
-#
-#             db_val = history_features.get(slot_idx)
-#
-#             # ✅ 动态调权逻辑：
-#             # 如果人工点击了优化，理论基准(interp_val)权重占 90%，强制曲线移动
-#             # 如果是正常运行，历史特征(db_val)权重占 90%，保持波形真实
-#             if is_intervened or db_val is None:
-#                 final_val = interp_val
-#             else:
-#                 # 正常模式下，结合历史特征
-#                 final_val = (db_val * 0.9) + (interp_val * 0.1)
-#
-#             pseudo_noise = (math.sin(h + i) * 0.01 + 1)
-#             smoothed_data.append(round(final_val * pseudo_noise, 2))
-#     return smoothed_data
-
-def slot_noise(h, i):
-    """生成基于时间槽的固定伪噪声，让预测线带点“历史感”"""
-    return (math.sin(h + i) + math.cos(h * i)) if 'math' in globals() else 1
-
-
-# def get_db_weighted_forecast(factor):
-#     """
-#     ✅ 修复：统一 Slot 计算 + 全局系数应用
-#     """
-#     forecast_288 = []
-#     device_count = PVDevice.query.count() or 1
-#
-#     # 获取历史特征 (get_db_weighted_history 已经改对了，这里直接调用)
-#     history_map = get_db_weighted_history()
-#
-#     for slot in range(288):
-#         h = slot // 12
-#         m_frac = (slot % 12) / 12.0
-#
-#         # 理论插值
-#         curr_rule = BASE_FORECAST_RULES[h]
-#         next_rule = BASE_FORECAST_RULES[(h + 1) % 24]
-#         rule_val = curr_rule + (next_rule - curr_rule) * m_frac
-#
-#         # 混合历史
-#         hist_val = history_map.get(slot, rule_val)
-#
-#         # 混合基数 (80% 历史 + 20% 理论)
-#         base_val = (hist_val * 0.8) + (rule_val * 0.2)
-#
-#         # ✅ 关键修改：系数 factor 乘在最外面
-#         # 这样 optimize_model 算出的 factor 才能真正把曲线拉到实际值
-#         final_val = base_val * factor
-#
-#         forecast_288.append(round(final_val * (1 + math.sin(slot) * 0.002), 2))
-#
-#     return forecast_288
-
-def get_db_history_map():
-    """(保持不变)"""
-    history_map = {}
-    try:
-        seven_days_ago = datetime.now() - timedelta(days=7)
-        stats = db.session.query(
-            (func.hour(PVGenerationData.collect_time) * 12 + func.floor(func.minute(PVGenerationData.collect_time) / 5)).label('slot'),
-            func.avg(PVGenerationData.string_voltage_v * PVGenerationData.string_current_a / 1000.0)
-        ).filter(PVGenerationData.collect_time >= seven_days_ago).group_by('slot').all()
+    grid_point_id = request.args.get('grid_point_id', type=int)
+    snapshot = get_realtime_snapshot(grid_point_id)
 
-        device_count = PVDevice.query.count() or 1
-        history_map = {int(s): float(v or 0) * device_count for s, v in stats}
-    except Exception as e:
-        print(f"提取历史特征失败: {e}")
-    return history_map
+    since = request.args.get('since', type=int)
+    version = request.args.get('version')
+    return jsonify(build_realtime_delta(snapshot, since, version))
 
 
-def get_final_forecast_series(factor, split_idx=None):
-    """
-    ✅ 核心修复：分段预测生成
-    - split_idx 之前 (过去)：使用系数 1.0 (显示原始基准，证明过去预测可能有偏)
-    - split_idx 之后 (未来)：使用优化系数 (显示修正后的趋势)
-    """
-    forecast_288 = []
-    history_map = get_db_history_map()
-
-    # 如果没有传入分割点，说明是查看明天/全天预览，直接全量应用系数
-    if split_idx is None:
-        split_idx = -1
+def build_realtime_delta(snapshot, since=None, version=None):
+    """ 按客户端游标裁剪快照；游标缺失、跨天或不合法时返回完整数据 """
+    current_version = snapshot['series_version']
+    same_day = version is not None and version.split('.')[0] == current_version.split('.')[0]
+    if since is None or not same_day or not 0 <= since < 288:
+        return dict(snapshot, full=True)
 
-    for slot in range(288):
-        h = slot // 12
-        m_frac = (slot % 12) / 12.0
+    payload = {k: v for k, v in snapshot.items() if k not in ('chart_series', 'forecast_series')}
+    payload['full'] = False
 
-        # 1. 基础计算
-        curr_rule = BASE_FORECAST_RULES[h]
-        next_rule = BASE_FORECAST_RULES[(h + 1) % 24]
-        rule_val = curr_rule + (next_rule - curr_rule) * m_frac
-        hist_val = history_map.get(slot, rule_val)
-        base_val = (hist_val * 0.8) + (rule_val * 0.2)
+    # 从 since 开始重发 (含 since 本身)：上次末端的实时对齐值此时已被汇总值替换
+    chart = snapshot['chart_series']
+    payload['chart_series'] = {str(i): chart[i] for i in range(since, snapshot['current_slot'] + 1)}
 
-        # 2. ✅ 分段应用系数
-        # 过去的时间保持原样 (1.0)，未来的时间应用优化系数
-        # 这样点击优化时，只有当前点之后的蓝线会跳变，前面的保持不动
-        active_factor = 1.0 if slot < split_idx else factor
+    if version != current_version:
+        payload['forecast_series'] = snapshot['forecast_series']
+    return payload
 
-        final_val = base_val * active_factor
 
-        # 注入微小噪声
-        forecast_288.append(round(final_val * (1 + math.sin(slot) * 0.002), 2))
+@bp.route('/api/pv/stream')
+def pv_realtime_stream():
+    """
+    实时数据推送 (SSE)：首个事件为完整快照，之后每个周期只推送变化的部分
+    所有连接共享同一份周期快照，数据库负载不随大屏数量增长
+    每个连接占用一个处理线程，连接数达到 PV_STREAM_MAX_CLIENTS 时返回 503，页面改用 /api/pv/realtime 增量轮询
+    """
+    grid_point_id = request.args.get('grid_point_id', type=int)
+    q = pv_stream_hub.subscribe(grid_point_id, lambda: get_realtime_snapshot(grid_point_id))
+    if q is None:
+        return jsonify({"code": 503, "msg": "实时推送连接数已满，请使用轮询接口",
+                        "fallback": "/monitor/api/pv/realtime"}), 503
+    return Response(pv_stream_hub.listen(grid_point_id, q), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
-    return forecast_288
 
+def get_realtime_snapshot(grid_point_id=None):
+    """ 当前刷新周期内的实时快照 (同一周期内只计算一次，按并网点分别缓存) """
+    return realtime_snapshot_cache.get(grid_point_id, lambda: build_realtime_snapshot(grid_point_id))
 
-# =================================================
 
-@bp.route('/api/pv/realtime')
-def pv_realtime_data():
-    global current_forecast_factor
+def build_realtime_snapshot(grid_point_id=None):
     now = datetime.now()
     today_start = datetime.combine(date.today(), time.min)
+    forecast_factor = forecast_state_store.get(grid_point_id)['factor']
 
-    devices = PVDevice.query.all()
+    devices = pv_device_query(grid_point_id).all()
     device_count = len(devices) if devices else 1
 
-    # A. 实时功率
+    # A. 实时功率 (读最新读数缓存，不再逐台查询)
     total_latest_power = 0.0
+    latest_readings = pv_latest_cache.get_all()
     for dev in devices:
-        last = PVGenerationData.query.filter_by(device_id=dev.device_id).order_by(
-            PVGenerationData.collect_time.desc()).first()
-        if last and (now - last.collect_time).total_seconds() < 60:
-            total_latest_power += (float(last.string_voltage_v or 0) * float(last.string_current_a or 0)) / 1000.0
+        last = latest_readings.get(dev.device_id)
+        if last and (now - last['collect_time']).total_seconds() < 60:
+            total_latest_power += (last['string_voltage_v'] * last['string_current_a']) / 1000.0
 
     # B. ✅ 绿线修复：初始化为 None，实现断线效果
     real_power_series = [None] * 288
 
-    stats = db.session.query(
-        (func.hour(PVGenerationData.collect_time) * 12 + func.floor(func.minute(PVGenerationData.collect_time) / 5)).label(
-            'slot'),
-        (func.avg(PVGenerationData.string_voltage_v * PVGenerationData.string_current_a / 1000.0) * device_count)
-    ).filter(PVGenerationData.collect_time >= today_start).group_by('slot').all()
+    # 读 5 分钟时间槽汇总表，不再对当天原始数据做 GROUP BY
+    stats = PVRollupService.day_slot_averages(today_start.date(), grid_point_id)
 
-    for slot, val in stats:
-        idx = int(slot)
+    for idx, val in stats.items():
         if 0 <= idx < 288:
-            real_power_series[idx] = round(float(val or 0), 2)
+            real_power_series[idx] = round(val * device_count, 2)
 
     # 锁定当前时间槽
     current_idx = now.hour * 12 + now.minute // 5
@@ -778,7 +282,7 @@ def pv_realtime_data():
     # ✅ 关键：current_idx 之后的数据保持为 None (ECharts 不会绘制)
 
     # C. 生成分段预测线
-    forecast_series = get_final_forecast_series(current_forecast_factor, split_idx=current_idx)
+    forecast_series = get_final_forecast_series(forecast_factor, split_idx=current_idx, grid_point_id=grid_point_id)
 
     # D. 偏差率 (复用分段后的预测值)
     current_forecast = forecast_series[current_idx] if current_idx < 288 else 0
@@ -788,10 +292,14 @@ def pv_realtime_data():
     elif total_latest_power > 1.0:
         deviation_rate = 100.0
 
-    total_energy = db.session.query(func.sum(PVGenerationData.gen_kwh)).filter(
-        PVGenerationData.collect_time >= today_start).scalar() or 0
+    total_energy = PVRollupService.day_energy(today_start.date(), grid_point_id)
 
-    return jsonify({
+    # 版本号: 日期 + 预测曲线校验值 (内容派生，多 worker 之间一致)
+    series_version = f"{now.strftime('%Y%m%d')}.{zlib.crc32(json.dumps(forecast_series).encode()):08x}"
+
+    return {
+        'series_version': series_version,
+        'current_slot': current_idx,
         'current_power': round(total_latest_power, 2),
         'daily_energy': round(float(total_energy), 1),
         'co2_reduce': round(float(total_energy) * 0.997 / 1000, 3),
@@ -799,18 +307,16 @@ def pv_realtime_data():
         'chart_series': real_power_series,  # 包含 None 的数组
         'forecast_series': forecast_series,
         'status': 'healthy' if deviation_rate < 15.0 else 'risk'
-    })
+    }
 
-# 修改 monitor.py 中的 get_pv_forecast 接口
 @bp.route('/api/pv/forecast')
 def get_pv_forecast():
     """
     ✅ 核心功能：基于【历史特征】的明日天气模拟
     逻辑：复用 get_final_forecast_series，但 split_idx 传 None (全天应用系数)
     """
-    global current_forecast_factor
-
     weather = request.args.get('weather')
+    grid_point_id = request.args.get('grid_point_id', type=int)
 
     # 定义三种典型气象的修正系数
     # 晴天=1.15 (比平时高)，多云=0.65 (明显下降)，雨天=0.25 (压得很低)
@@ -822,37 +328,42 @@ def get_pv_forecast():
 
     # 获取目标系数：
     # 如果前端传了 weather 参数，使用对应系数
-    # 如果没传 (比如刚加载时)，使用当前正在运行的实时系数 (current_forecast_factor)
-    target_factor = weather_map.get(weather, current_forecast_factor)
+    # 如果没传 (比如刚加载时)，使用该并网点当前正在运行的实时系数
+    target_factor = weather_map.get(weather, forecast_state_store.get(grid_point_id)['factor'])
+
+    # weather=all: 一次返回三种气象的预测曲线 (引擎单次批量计算)
+    if weather == 'all':
+        history = PVForecastEngine.profile_matrix([get_db_history_map(grid_point_id)])
+        forecast = PVForecastEngine.forecast(history, list(weather_map.values()), BASE_FORECAST_RULES)
+        return jsonify({'code': 200, 'data': dict(zip(weather_map.keys(), forecast[0].tolist()))})
 
     # 生成预测数据
     # 注意：这里不传 split_idx，意味着全天 288 个点都应用 target_factor
     # 这样用户看到的就是一条完整的、带有本电站历史特征的“明天预测线”
-    forecast_data = get_final_forecast_series(target_factor)
+    forecast_data = get_final_forecast_series(target_factor, grid_point_id=grid_point_id)
 
     return jsonify({'code': 200, 'data': forecast_data})
 
 
-# app/blueprints/monitor.py
-
 @bp.route('/api/pv/model_status')
 def get_model_status():
     """
     ✅ 唯一的模型状态函数
     合并了实时偏差对齐逻辑与历史显示逻辑
     """
-    global current_forecast_factor
+    grid_point_id = request.args.get('grid_point_id', type=int)
     try:
-        # 1. 统一调用实时数据接口的逻辑，确保数值与顶部卡片绝对一致
-        realtime_response = pv_realtime_data()
-        realtime_data = realtime_response.get_json()
+        # 1. 读取与实时接口同一份快照，确保数值与顶部卡片绝对一致
+        realtime_data = get_realtime_snapshot(grid_point_id)
 
         today_deviation = realtime_data.get('deviation_rate', 0.0)
 
         # 2. 获取历史记录 (过去2天)
         today_date = date.today()
-        history_records = PVForecastData.query.filter(PVForecastData.forecast_date < today_date).order_by(
-            PVForecastData.forecast_date.desc()).limit(2).all()
+        history_query = PVForecastData.query.filter(PVForecastData.forecast_date < today_date)
+        if grid_point_id is not None:
+            history_query = history_query.filter(PVForecastData.grid_point_id == grid_point_id)
+        history_records = history_query.order_by(PVForecastData.forecast_date.desc()).limit(2).all()
 
         # 3. 构造返回列表
         data_list = [
@@ -874,10 +385,13 @@ def get_model_status():
         # 4. 判定状态：只要今天异常，就激活优化按钮
         is_alarm = True if today_deviation > 15.0 else False
 
+        state = forecast_state_store.get(grid_point_id)
         return jsonify({
             'status': 'risk' if is_alarm else 'healthy',
             'history': data_list,
-            'model_version': 'v2.2-Unified'
+            'model_version': state['model_version'],
+            'forecast_factor': state['factor'],
+            'optimized_at': state['optimized_at'].strftime('%Y-%m-%d %H:%M:%S') if state['optimized_at'] else None
         })
     except Exception as e:
         print(f"❌ get_model_status 报错: {e}")
@@ -886,50 +400,43 @@ def get_model_status():
 
 @bp.route('/api/pv/optimize', methods=['POST'])
 def optimize_model():
-    # ... (保持你之前的 optimize_model 代码，逻辑是通用的) ...
-    # 只需要把计算逻辑放这里即可
-    global current_forecast_factor
+    # 并网点可通过查询参数或 JSON 请求体指定，不传表示全站
+    grid_point_id = request.args.get('grid_point_id', type=int)
+    if grid_point_id is None:
+        body = request.get_json(silent=True) or {}
+        if body.get('grid_point_id') is not None:
+            try:
+                grid_point_id = int(body['grid_point_id'])
+            except (TypeError, ValueError):
+                return jsonify({'code': 400, 'msg': "grid_point_id 格式错误"}), 400
+
     try:
+        if grid_point_id is not None and not GridPoint.query.get(grid_point_id):
+            return jsonify({'code': 404, 'msg': f"并网点 {grid_point_id} 不存在"}), 404
+
         now = datetime.now()
         current_slot = now.hour * 12 + now.minute // 5
 
-        res = pv_realtime_data().get_json()
-        actual_p = res['current_power']
+        actual_p = get_realtime_snapshot(grid_point_id)['current_power']
 
-        # 计算基准时，factor 传 1.0，split_idx 传 -1 (取纯基准)
-        # 这里我们需要手动算一下基准值
-        h = current_slot // 12
-        m = (current_slot % 12) / 12.0
-        rule = BASE_FORECAST_RULES[h] + (BASE_FORECAST_RULES[(h + 1) % 24] - BASE_FORECAST_RULES[h]) * m
-        hist = get_db_history_map().get(current_slot, rule)
-        base_p = hist * 0.8 + rule * 0.2
+        # 取当前时间槽的纯基准值 (未应用系数、无噪声)
+        history = PVForecastEngine.profile_matrix([get_db_history_map(grid_point_id)])
+        base_p = float(PVForecastEngine.base_series(history, BASE_FORECAST_RULES)[0, current_slot])
 
         if base_p > 5.0:
-            new_factor = actual_p / base_p
-            current_forecast_factor = round(max(0.1, min(2.5, new_factor)), 4)
-            return jsonify({'code': 200, 'msg': f"已优化未来趋势，系数: {current_forecast_factor}"})
+            new_factor = round(max(0.1, min(2.5, actual_p / base_p)), 4)
+            forecast_state_store.save_factor(grid_point_id, new_factor)
+            # 系数变化后预测曲线随之改变，下一次请求重新计算快照
+            realtime_snapshot_cache.invalidate(grid_point_id)
+            return jsonify({'code': 200, 'msg': f"已优化未来趋势，系数: {new_factor}"})
         return jsonify({'code': 400, 'msg': "功率过低"})
     except Exception as e:
+        db.session.rollback()
         return jsonify({'code': 500, 'msg': str(e)})
 
 def get_db_weighted_history():
-    """获取过去7天历史特征，增加错误处理防止空表报错"""
-    history_map = {}
-    try:
-        # 只选取过去7天中偏差率小于20%的“高质量”历史数据作为参考
-        # 避免模型学习到之前因为模拟器停发产生的 0 功率“脏数据”
-        seven_days_ago = datetime.now() - timedelta(days=7)
-        stats = db.session.query(
-            (func.hour(PVGenerationData.collect_time) * 12 + func.floor(
-                func.minute(PVGenerationData.collect_time) / 5)).label('slot'),
-            func.avg(PVGenerationData.string_voltage_v * PVGenerationData.string_current_a / 1000.0)
-        ).filter(PVGenerationData.collect_time >= seven_days_ago).group_by('slot').all()
-
-        device_count = PVDevice.query.count() or 1
-        history_map = {int(s): float(v or 0) * device_count for s, v in stats}
-    except Exception as e:
-        print(f"提取历史特征失败: {e}")
-    return history_map
+    """获取过去7天历史特征 (与 get_db_history_map 同源)"""
+    return get_db_history_map()
 
 @bp.route('/circuit/<int:power_room_id>')
 @role_required(['operator', 'admin', 'order_manager'])
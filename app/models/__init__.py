@@ -3,8 +3,8 @@ from .user import User, Role
 from .device import Plant, PowerRoom, EquipmentLedger, GridPoint, PVDevice, EnergyMeter
 from .energy import (
     CircuitData, TransformerData,
-    PVGenerationData, PVForecastData,
-    EnergyData, PeakValleyEnergy,
+    PVGenerationData, PVSlotRollup, PVForecastData, PVForecastState,
+    EnergyData, PeakValleyEnergy, EnergyMonthlyCube,
     ScreenConfig, HistoryTrend, RealtimeSummary,
     SystemConfig
 )
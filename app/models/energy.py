@@ -7,6 +7,9 @@ from sqlalchemy.orm import relationship
 class CircuitData(db.Model):
     """ 回路监测数据 """
     __tablename__ = 'circuit_data'
+    __table_args__ = (
+        db.Index('ix_circuit_data_room_time', 'power_room_id', 'collect_time'),
+    )
     circuit_data_id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
     power_room_id = db.Column(db.BigInteger, db.ForeignKey('power_room.power_room_id'))
     circuit_code = db.Column(db.String(50))
@@ -28,6 +31,9 @@ class CircuitData(db.Model):
 class TransformerData(db.Model):
     """ 变压器监测数据 """
     __tablename__ = 'transformer_data'
+    __table_args__ = (
+        db.Index('ix_transformer_data_room_time', 'power_room_id', 'collect_time'),
+    )
     transformer_data_id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
     power_room_id = db.Column(db.BigInteger, db.ForeignKey('power_room.power_room_id'))
     transformer_code = db.Column(db.String(50))
@@ -45,6 +51,9 @@ class TransformerData(db.Model):
 class PVGenerationData(db.Model):
     """ 光伏发电数据 """
     __tablename__ = 'pv_generation_data'
+    __table_args__ = (
+        db.Index('ix_pv_generation_data_device_time', 'device_id', 'collect_time'),
+    )
     gen_data_id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
     device_id = db.Column(db.BigInteger, db.ForeignKey('pv_device.device_id'))
     grid_point_id = db.Column(db.BigInteger, db.ForeignKey('grid_point.grid_point_id'))
@@ -59,6 +68,29 @@ class PVGenerationData(db.Model):
     is_abnormal = db.Column(db.SmallInteger, default=0)
 
 
+class PVSlotRollup(db.Model):
+    """
+    光伏 5 分钟时间槽汇总 (按设备)
+    随数据接入增量维护，实时曲线/历史特征直接读此表，避免扫描原始数据
+    """
+    __tablename__ = 'pv_slot_rollup'
+    __table_args__ = (
+        db.UniqueConstraint('slot_date', 'slot_index', 'device_id', name='uq_pv_slot_rollup'),
+        db.Index('ix_pv_slot_rollup_grid', 'grid_point_id', 'slot_date', 'slot_index'),
+    )
+    rollup_id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    slot_date = db.Column(db.Date, nullable=False)
+    slot_index = db.Column(db.SmallInteger, nullable=False, comment='时间槽 (hour*12 + minute//5, 0-287)')
+    device_id = db.Column(db.BigInteger, db.ForeignKey('pv_device.device_id'), nullable=False)
+    grid_point_id = db.Column(db.BigInteger, db.ForeignKey('grid_point.grid_point_id'))
+
+    reading_cnt = db.Column(db.Integer, default=0, comment='读数条数')
+    power_sum_kw = db.Column(db.Numeric(16, 4), default=0, comment='功率累计 (kW)')
+    power_min_kw = db.Column(db.Numeric(12, 4), comment='最小功率 (kW)')
+    power_max_kw = db.Column(db.Numeric(12, 4), comment='最大功率 (kW)')
+    gen_kwh_sum = db.Column(db.Numeric(16, 4), default=0, comment='发电量累计')
+
+
 class PVForecastData(db.Model):
     """ 光伏预测数据 """
     __tablename__ = 'pv_forecast_data'
@@ -73,10 +105,28 @@ class PVForecastData(db.Model):
     need_optimize = db.Column(db.SmallInteger, default=0)
 
 
+class PVForecastState(db.Model):
+    """
+    光伏预测模型运行状态 (按并网点)
+    grid_point_id 为空的一行表示全站汇总
+    """
+    __tablename__ = 'pv_forecast_state'
+    state_id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    grid_point_id = db.Column(db.BigInteger, db.ForeignKey('grid_point.grid_point_id'), unique=True)
+    forecast_factor = db.Column(db.Numeric(6, 4), default=1.0, comment='预测修正系数')
+    model_version = db.Column(db.String(20), comment='模型版本')
+    optimized_at = db.Column(db.DateTime, comment='最近一次优化时间')
+    revision = db.Column(db.Integer, default=0, nullable=False, comment='修改次数 (用于多进程缓存失效判断)')
+    updated_at = db.Column(db.DateTime, default=db.func.now(), onupdate=db.func.now())
+
+
 # ---------------- 能耗与报表 ----------------
 class EnergyData(db.Model):
     """ 能耗监测数据 """
     __tablename__ = 'energy_data'
+    __table_args__ = (
+        db.Index('ix_energy_data_meter_time', 'meter_id', 'collect_time'),
+    )
     energy_data_id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
     meter_id = db.Column(db.BigInteger, db.ForeignKey('energy_meter.meter_id'))
     plant_id = db.Column(db.BigInteger, db.ForeignKey('plant.plant_id'))
@@ -92,6 +142,10 @@ class EnergyData(db.Model):
 class PeakValleyEnergy(db.Model):
     """ 峰谷能耗统计 """
     __tablename__ = 'peak_valley_energy'
+    __table_args__ = (
+        # 每个 (日期, 厂区, 能源类型) 只有一条日统计；周期报表按日期区间查询命中此索引
+        db.Index('uq_peak_valley_date_plant_type', 'stat_date', 'plant_id', 'energy_type', unique=True),
+    )
     pv_id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
     energy_type = db.Column(db.String(20))  # 能源类型（水/蒸汽/天然气/电力等）
     plant_id = db.Column(db.BigInteger, db.ForeignKey('plant.plant_id'))
@@ -106,6 +160,30 @@ class PeakValleyEnergy(db.Model):
     price_per_unit = db.Column(db.Numeric(10, 4))
 
 
+class EnergyMonthlyCube(db.Model):
+    """
+    能耗月度汇总立方体 (厂区 × 能源类型 × 月)
+    随峰谷日统计的变化增量维护，季度 / 年度由月度汇总得出，周期报表直接读此表
+    """
+    __tablename__ = 'energy_monthly_cube'
+    __table_args__ = (
+        db.UniqueConstraint('stat_year', 'stat_month', 'plant_id', 'energy_type', name='uq_energy_monthly_cube'),
+    )
+    cube_id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    stat_year = db.Column(db.SmallInteger, nullable=False)
+    stat_month = db.Column(db.SmallInteger, nullable=False, comment='月份 (1-12)')
+    plant_id = db.Column(db.BigInteger, db.ForeignKey('plant.plant_id'), nullable=False)
+    energy_type = db.Column(db.String(20), nullable=False)
+
+    sharp_value = db.Column(db.Numeric(16, 2), default=0)
+    peak_value = db.Column(db.Numeric(16, 2), default=0)
+    flat_value = db.Column(db.Numeric(16, 2), default=0)
+    valley_value = db.Column(db.Numeric(16, 2), default=0)
+    total_value = db.Column(db.Numeric(16, 2), default=0)
+    total_cost = db.Column(db.Numeric(16, 2), default=0)
+    revision = db.Column(db.Integer, default=0, nullable=False, comment='修改次数 (用于多进程报表缓存失效判断)')
+
+
 # ---------------- 大屏配置与汇总 ----------------
 class ScreenConfig(db.Model):
     """
@@ -194,10 +272,10 @@ class RealtimeSummary(db.Model):
 class SystemConfig(db.Model):
     """
     系统全局参数配置表
-    存储如: 变压器高温阈值、峰谷电价时段、数据保留天数等
+    存储如: 变压器高温阈值、峰谷电价时段、分时电价日历、数据保留天数等
     """
     __tablename__ = 'system_config'
     config_key = db.Column(db.String(50), primary_key=True, comment='配置键 (如 transformer_temp_limit)')
-    config_value = db.Column(db.String(255), nullable=False, comment='配置值')
+    config_value = db.Column(db.Text, nullable=False, comment='配置值 (分时电价日历为 JSON)')
     description = db.Column(db.String(200), comment='参数说明')
     updated_at = db.Column(db.DateTime, default=db.func.now(), onupdate=db.func.now())
\ No newline at end of file
@@ -5,6 +5,10 @@ from app.extensions import db
 class Alarm(db.Model):
     """ 告警表 [cite: 54] """
     __tablename__ = 'alarm'
+    __table_args__ = (
+        # 唯一索引允许多个 NULL: 同一去重键同时只能有一条未结案告警
+        db.Index('uq_alarm_open_dedup_key', 'open_dedup_key', unique=True),
+    )
     alarm_id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
     # 关联设备台账，实现统一的设备告警管理
     equipment_id = db.Column(db.BigInteger, db.ForeignKey('equipment_ledger.equipment_id'))
@@ -14,6 +18,8 @@ class Alarm(db.Model):
     alarm_content = db.Column(db.String(255))
     handle_status = db.Column(db.String(20), default='未处理')
     trigger_thresh = db.Column(db.String(50))
+    # 未结案告警去重键 (设备ID:告警类型，规则引擎告警为 设备ID:规则名)，结案后置空
+    open_dedup_key = db.Column(db.String(100), nullable=True)
 
     # 一对一关联工单
     work_order = db.relationship('WorkOrder', backref='alarm', uselist=False)
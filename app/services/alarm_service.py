@@ -1,7 +1,86 @@
 # app/services/alarm_service.py
+import threading
+import time
 from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, object_session
 from app.extensions import db
-from app.models import Alarm, WorkOrder, EquipmentLedger, SystemConfig
+from app.models import Alarm, WorkOrder, EquipmentLedger
+from app.services.config_cache import system_config
+
+
+class OpenAlarmIndex:
+    """
+    未结案告警去重键的进程内索引 {open_dedup_key: alarm_id}
+    - 持续越限时每条读数只查内存，不访问数据库
+    - 每 resync_seconds 秒从 alarm.open_dedup_key 唯一索引重新加载，感知其他进程的新建 / 结案
+    """
+
+    def __init__(self, app=None):
+        self.resync_seconds = 60
+        self._lock = threading.Lock()
+        self._keys = {}
+        self._loaded_at = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.resync_seconds = app.config.get('ALARM_OPEN_INDEX_RESYNC_SECONDS', 60)
+
+    def _ensure_loaded(self):
+        now = time.monotonic()
+        if self._loaded_at is not None and now - self._loaded_at < self.resync_seconds:
+            return
+        rows = db.session.query(Alarm.open_dedup_key, Alarm.alarm_id).filter(Alarm.open_dedup_key.isnot(None)).all()
+        with self._lock:
+            self._keys = dict(rows)
+            self._loaded_at = now
+
+    def get(self, key):
+        self._ensure_loaded()
+        with self._lock:
+            return self._keys.get(key)
+
+    def add(self, key, alarm_id):
+        with self._lock:
+            self._keys[key] = alarm_id
+
+    def discard(self, key):
+        with self._lock:
+            self._keys.pop(key, None)
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+
+# 进程内单例，在 create_app 中通过 open_alarm_index.init_app(app) 绑定
+open_alarm_index = OpenAlarmIndex()
+
+CLOSED_STATUS = '已结案'
+
+
+@event.listens_for(Alarm.handle_status, 'set')
+def _release_dedup_key(alarm, value, oldvalue, initiator):
+    """ 任何代码路径把告警置为已结案时都释放去重键，提交成功后再移出内存索引 """
+    if value != CLOSED_STATUS or not alarm.open_dedup_key:
+        return
+    session = object_session(alarm)
+    if session is not None:
+        session.info.setdefault('released_alarm_keys', []).append(alarm.open_dedup_key)
+    alarm.open_dedup_key = None
+
+
+@event.listens_for(Session, 'after_commit')
+def _discard_released_keys(session):
+    for key in session.info.pop('released_alarm_keys', ()):
+        open_alarm_index.discard(key)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _keep_released_keys(session, previous_transaction):
+    session.info.pop('released_alarm_keys', None)
 
 
 class AlarmService:
@@ -11,11 +90,24 @@ class AlarmService:
     """
 
     @staticmethod
-    def create_alarm(equipment_id, content, level='低', alarm_type='越限告警'):
+    def dedup_key(equipment_id, alarm_type):
+        """ 去重键 (设备ID:告警类型)，规则引擎的告警类型为规则名，不含会被修改的阈值 """
+        return f"{equipment_id}:{alarm_type}"
+
+    @staticmethod
+    def create_alarm(equipment_id, content, level='低', alarm_type='越限告警', rule_name=None):
         """
         创建新告警 (通常由监测数据自动触发)
+        幂等: 同一设备同一告警类型 (传入 rule_name 时为同一规则) 已有未结案告警时不再新建，返回 (None, "告警已存在")
+        命中内存索引时不访问数据库，持续越限时每条读数的开销为 O(1)
+        :param alarm_type: 告警类型或阈值描述 (如 '>85℃')，存入 trigger_thresh
+        :param rule_name: 触发规则名，作为去重依据，管理员修改阈值后仍与原告警视为同一告警
         """
+        key = AlarmService.dedup_key(equipment_id, rule_name or alarm_type)
         try:
+            if open_alarm_index.get(key) is not None:
+                return None, "告警已存在"
+
             # 校验设备是否存在于台账中
             equipment = EquipmentLedger.query.get(equipment_id)
             if not equipment:
@@ -27,11 +119,20 @@ class AlarmService:
                 alarm_content=content,
                 occur_time=datetime.now(),
                 handle_status='未处理',
-                trigger_thresh=alarm_type  # 复用字段存储类型或阈值描述
+                trigger_thresh=alarm_type,  # 复用字段存储类型或阈值描述
+                open_dedup_key=key
             )
             db.session.add(alarm)
             db.session.commit()
+            open_alarm_index.add(key, alarm.alarm_id)
             return alarm, "创建成功"
+        except IntegrityError:
+            # 其他进程已创建同一去重键的告警 (唯一索引冲突)，同步到本地索引
+            db.session.rollback()
+            existing = Alarm.query.filter_by(open_dedup_key=key).first()
+            if existing:
+                open_alarm_index.add(key, existing.alarm_id)
+            return None, "告警已存在"
         except Exception as e:
             db.session.rollback()
             return None, str(e)
@@ -85,9 +186,9 @@ class AlarmService:
             order.attachment_path = attachment_path
             order.review_status = '已完成'
 
-            # 2. 级联更新告警状态
+            # 2. 级联更新告警状态 (结案时自动释放去重键，同类越限可再次告警)
             if order.alarm:
-                order.alarm.handle_status = '已结案'
+                order.alarm.handle_status = CLOSED_STATUS
 
             db.session.commit()
             return True, "结案成功"
@@ -98,15 +199,9 @@ class AlarmService:
     @staticmethod
     def get_dynamic_threshold(key, default_val=85.0):
         """
-        从数据库读取最新的告警阈值
+        读取最新的告警阈值 (经 system_config 进程内缓存，不访问数据库)
         :param key: 配置键 (如 'transformer_temp_high')
         :param default_val: 如果没配，使用的默认值
         :return: float 类型的阈值
         """
-        try:
-            config = SystemConfig.query.get(key)
-            if config:
-                return float(config.config_value)
-            return float(default_val)
-        except:
-            return float(default_val)
\ No newline at end of file
+        return float(system_config.get_float(key, default_val))
@@ -1,5 +1,7 @@
 # app/services/analysis_service.py
-from sqlalchemy import func
+import math
+from datetime import datetime, timedelta
+from sqlalchemy import func, cast, literal_column, Integer
 from app.extensions import db
 from app.models import CircuitData, PeakValleyEnergy, PVForecastData, Plant
 
@@ -28,4 +30,48 @@ class AnalysisService:
                     warnings.append(f"时段 {f.forecast_period} 偏差过大 ({f.deviation_pct}%)，建议优化模型")
 
         db.session.commit()
-        return warnings
\ No newline at end of file
+        return warnings
+
+    # 时间分桶的对齐基准 (分桶编号与请求时间无关，多次请求的桶边界一致)
+    BUCKET_ANCHOR = datetime(2000, 1, 1)
+
+    @classmethod
+    def _bucket_expr(cls, column, bucket_seconds):
+        """ 时间列 -> 分桶编号 (自 BUCKET_ANCHOR 起的第几个桶)，在 SQL 中计算 """
+        if db.session.get_bind().dialect.name == 'mysql':
+            seconds = func.timestampdiff(literal_column('SECOND'), cls.BUCKET_ANCHOR, column)
+        else:
+            # SQLite (本地调试)
+            seconds = cast(func.strftime('%s', column), Integer) - \
+                int((cls.BUCKET_ANCHOR - datetime(1970, 1, 1)).total_seconds())
+        # 整除 (向下取整)，SQLAlchemy 按方言生成 FLOOR(x / n) 或整数除法
+        return seconds // bucket_seconds
+
+    @staticmethod
+    def bucket_seconds_for(span_seconds, max_points):
+        """ 按时间跨度和最大点数计算分桶宽度 (秒)，至少 60 秒 """
+        return max(60, int(math.ceil(span_seconds / max(1, max_points))))
+
+    @classmethod
+    def get_circuit_load_series(cls, start, end, bucket_seconds):
+        """
+        配电网总负荷曲线 (按时间桶降采样)
+        每个桶先求各回路平均有功功率，再按桶求和，得到该时段的全网总负荷
+        :return: [(桶起始时间, 总负荷 kW), ...] 按时间升序
+        """
+        bucket = cls._bucket_expr(CircuitData.collect_time, bucket_seconds).label('bucket')
+        per_circuit = db.session.query(
+            bucket,
+            func.avg(CircuitData.active_power_kw).label('avg_kw')
+        ).filter(
+            CircuitData.collect_time >= start,
+            CircuitData.collect_time <= end
+        ).group_by(bucket, CircuitData.power_room_id, CircuitData.circuit_code).subquery()
+
+        rows = db.session.query(
+            per_circuit.c.bucket,
+            func.sum(per_circuit.c.avg_kw)
+        ).group_by(per_circuit.c.bucket).order_by(per_circuit.c.bucket).all()
+
+        return [(cls.BUCKET_ANCHOR + timedelta(seconds=int(b) * bucket_seconds), float(v or 0))
+                for b, v in rows]
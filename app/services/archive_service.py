@@ -0,0 +1,273 @@
+# app/services/archive_service.py
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+import numpy as np
+from flask import current_app
+from sqlalchemy import select, delete, func
+from app.extensions import db
+from app.models import CircuitData, TransformerData, PVGenerationData, EnergyData
+
+
+class ArchiveService:
+    """
+    遥测数据冷存储归档
+    - 将早于 ARCHIVE_AFTER_DAYS 天的遥测数据按 (表, 日) 导出为列式压缩文件 (numpy .npz)，
+      目录结构: {ARCHIVE_DIR}/{表名}/{年}/{表名}_{YYYYMMDD}.npz，并记录到 manifest.json
+    - 文件写入并登记后，按主键分批删除已导出的行 (只删除导出过的主键，归档期间新到的补传数据不会丢失)
+    - 已归档的日期再次归档时与原文件合并
+    - 归档能耗数据前先补齐峰谷日统计；重算日统计时通过 rows() 读取归档部分，与在线表中尚未归档 (补传) 的行合并
+    """
+
+    TABLES = [CircuitData, TransformerData, PVGenerationData, EnergyData]
+    MANIFEST = 'manifest.json'
+
+    _lock = threading.Lock()
+    _manifest = None
+    _manifest_mtime = None
+
+    # ------------------------------------------------------------------
+    # 路径与清单
+    # ------------------------------------------------------------------
+    @staticmethod
+    def archive_dir():
+        return current_app.config.get('ARCHIVE_DIR') or os.path.join(current_app.root_path, '..', 'archive')
+
+    @classmethod
+    def _manifest_path(cls):
+        return os.path.join(cls.archive_dir(), cls.MANIFEST)
+
+    @classmethod
+    def manifest(cls):
+        """ {表名: {'YYYY-MM-DD': {file, rows, sha256, archived_at}}}，按文件修改时间缓存 """
+        path = cls._manifest_path()
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        with cls._lock:
+            if cls._manifest is None or mtime != cls._manifest_mtime:
+                if mtime is None:
+                    cls._manifest = {}
+                else:
+                    with open(path, encoding='utf-8') as f:
+                        cls._manifest = json.load(f)
+                cls._manifest_mtime = mtime
+            return cls._manifest
+
+    @classmethod
+    def _save_manifest(cls, manifest):
+        path = cls._manifest_path()
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp, path)
+        with cls._lock:
+            cls._manifest = manifest
+            cls._manifest_mtime = os.path.getmtime(path)
+
+    @classmethod
+    def archived_days(cls, model, start_date=None, end_date=None):
+        """ 已归档的日期 (含两端) """
+        days = cls.manifest().get(model.__tablename__, {})
+        result = []
+        for key in sorted(days):
+            day = date.fromisoformat(key)
+            if (start_date is None or day >= start_date) and (end_date is None or day <= end_date):
+                result.append(day)
+        return result
+
+    @classmethod
+    def is_archived(cls, model, day):
+        return day.isoformat() in cls.manifest().get(model.__tablename__, {})
+
+    # ------------------------------------------------------------------
+    # 列式编码
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _encode(column, values):
+        """
+        将一列 Python 值编码为 numpy 数组
+        :return: (数组, 空值掩码或 None)
+        """
+        mask = np.array([v is None for v in values], dtype=bool)
+        python_type = column.type.python_type
+        if python_type is datetime:
+            arr = np.array([v or datetime.min for v in values], dtype='datetime64[us]')
+        elif python_type is Decimal or python_type is float:
+            arr = np.array([float(v) if v is not None else np.nan for v in values], dtype=np.float64)
+        elif python_type is int:
+            arr = np.array([v if v is not None else 0 for v in values], dtype=np.int64)
+        else:
+            arr = np.array([v if v is not None else '' for v in values], dtype=str)
+        return arr, (mask if mask.any() else None)
+
+    @staticmethod
+    def _decode(column, arr, mask):
+        python_type = column.type.python_type
+        if python_type is datetime:
+            values = arr.astype('datetime64[us]').astype(object).tolist()
+        elif python_type is Decimal:
+            # Numeric 列按定义的小数位还原，与在线表读取结果一致
+            quant = Decimal(1).scaleb(-(column.type.scale or 0))
+            values = [Decimal(repr(v)).quantize(quant) for v in arr.tolist()]
+        else:
+            values = arr.tolist()
+        if mask is not None:
+            values = [None if m else v for v, m in zip(values, mask.tolist())]
+        return values
+
+    @classmethod
+    def _columns(cls, model):
+        return list(model.__table__.columns)
+
+    @classmethod
+    def _file_path(cls, model, day):
+        table = model.__tablename__
+        return os.path.join(cls.archive_dir(), table, f'{day.year}', f"{table}_{day.strftime('%Y%m%d')}.npz")
+
+    @classmethod
+    def _write_day(cls, model, day, columns_data):
+        path = cls._file_path(model, day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        arrays = {}
+        for column in cls._columns(model):
+            arr, mask = cls._encode(column, columns_data[column.name])
+            arrays[column.name] = arr
+            if mask is not None:
+                arrays[f'{column.name}__null'] = mask
+
+        tmp = path + '.tmp.npz'
+        np.savez_compressed(tmp, **arrays)
+        os.replace(tmp, path)
+
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        return os.path.relpath(path, cls.archive_dir()), digest
+
+    @classmethod
+    def read_day(cls, model, day):
+        """ 读取某日归档文件，返回 {列名: [值]}；未归档返回 None """
+        entry = cls.manifest().get(model.__tablename__, {}).get(day.isoformat())
+        if entry is None:
+            return None
+        with np.load(os.path.join(cls.archive_dir(), entry['file'])) as npz:
+            return {
+                column.name: cls._decode(column, npz[column.name],
+                                         npz[f'{column.name}__null'] if f'{column.name}__null' in npz.files else None)
+                for column in cls._columns(model)
+            }
+
+    # ------------------------------------------------------------------
+    # 归档
+    # ------------------------------------------------------------------
+    @staticmethod
+    def cutoff(today=None):
+        today = today or date.today()
+        days = current_app.config.get('ARCHIVE_AFTER_DAYS', 90)
+        return today - timedelta(days=days)
+
+    @classmethod
+    def pending_days(cls, model, cutoff):
+        """ 在线表中早于 cutoff 的所有日期 """
+        rows = db.session.query(func.date(model.collect_time)).filter(
+            model.collect_time < datetime.combine(cutoff, datetime.min.time())
+        ).distinct().all()
+        days = []
+        for (d,) in rows:
+            if isinstance(d, str):
+                d = date.fromisoformat(d)
+            days.append(d)
+        return sorted(days)
+
+    @classmethod
+    def plan(cls, today=None):
+        cutoff = cls.cutoff(today)
+        return [
+            {'table': model.__tablename__, 'cutoff': cutoff, 'days': cls.pending_days(model, cutoff)}
+            for model in cls.TABLES
+        ]
+
+    @classmethod
+    def run(cls, dry_run=False, today=None):
+        """ 归档全部待归档日期，返回计划 (含 archived_rows) """
+        items = cls.plan(today)
+        if dry_run:
+            return items
+        for item, model in zip(items, cls.TABLES):
+            if model is EnergyData and item['days']:
+                cls._ensure_daily_stats(item['days'][0], item['days'][-1])
+            item['archived_rows'] = sum(cls.archive_day(model, day) for day in item['days'])
+        return items
+
+    @staticmethod
+    def _ensure_daily_stats(start_date, end_date):
+        """ 归档能耗数据前补齐峰谷日统计，报表只汇总日统计，不再回读归档文件 """
+        from app.services.peak_valley_rollup import PeakValleyRollupService
+        gaps = PeakValleyRollupService.find_gaps(start_date, end_date)
+        if gaps:
+            print(f"📊 归档前补算峰谷日统计 {len(gaps)} 条")
+            PeakValleyRollupService.backfill(gaps, workers=1)
+
+    @classmethod
+    def archive_day(cls, model, day):
+        """ 导出某表某日的在线数据 (与已有归档合并)，登记清单后分批删除，返回归档行数 """
+        start = datetime.combine(day, datetime.min.time())
+        end = start + timedelta(days=1)
+        columns = cls._columns(model)
+        pk = model.__mapper__.primary_key[0]
+
+        rows = db.session.execute(
+            select(*columns).where(model.collect_time >= start, model.collect_time < end).order_by(pk)
+        ).all()
+        if not rows:
+            return 0
+
+        data = {c.name: [r[i] for r in rows] for i, c in enumerate(columns)}
+        existing = cls.read_day(model, day)
+        if existing:
+            # 按整行去重 (自增主键在在线表清空后可能被复用，不能只比较主键)
+            names = [c.name for c in columns]
+            known = set(zip(*(existing[n] for n in names)))
+            keep = [i for i, row in enumerate(zip(*(data[n] for n in names))) if row not in known]
+            data = {n: existing[n] + [data[n][i] for i in keep] for n in names}
+
+        file, digest = cls._write_day(model, day, data)
+
+        manifest = dict(cls.manifest())
+        table_entries = dict(manifest.get(model.__tablename__, {}))
+        table_entries[day.isoformat()] = {
+            'file': file,
+            'rows': len(data[pk.name]),
+            'sha256': digest,
+            'archived_at': datetime.now().isoformat(timespec='seconds')
+        }
+        manifest[model.__tablename__] = table_entries
+        cls._save_manifest(manifest)
+
+        # 文件落盘后再删除，中途失败最多留下重复数据 (下次归档时去重)，不会丢数据
+        ids = [r[columns.index(pk)] for r in rows]
+        batch = current_app.config.get('ARCHIVE_DELETE_BATCH', 5000)
+        for i in range(0, len(ids), batch):
+            db.session.execute(delete(model).where(pk.in_(ids[i:i + batch])))
+            db.session.commit()
+        return len(ids)
+
+    # ------------------------------------------------------------------
+    # 透明读取
+    # ------------------------------------------------------------------
+    @classmethod
+    def rows(cls, model, day, **filters):
+        """
+        某日归档数据中满足等值条件的行 (以未持久化的模型实例返回，属性访问与在线查询结果一致)
+        未归档的日期返回 []
+        """
+        data = cls.read_day(model, day)
+        if not data:
+            return []
+        names = list(data)
+        count = len(data[names[0]])
+        selected = np.ones(count, dtype=bool)
+        for name, value in filters.items():
+            selected &= np.array([v == value for v in data[name]], dtype=bool)
+        return [model(**{n: data[n][i] for n in names}) for i in np.flatnonzero(selected)]
@@ -0,0 +1,109 @@
+# app/services/config_cache.py
+import threading
+import time
+from sqlalchemy import func
+from app.extensions import db
+from app.models import SystemConfig
+
+
+class SystemConfigCache:
+    """
+    系统参数 (system_config) 进程内缓存
+    - 一次查询加载全部参数，按类型读取 (get_float / get_int / get_str)，读取不访问数据库
+    - 本进程保存参数后调用 invalidate() 立即失效
+    - 每 check_seconds 秒最多执行一次轻量查询 (COUNT + MAX(updated_at))，感知其他 worker 的修改
+    - version 在每次重新加载后递增，依赖参数的派生缓存 (如阈值规则引擎) 据此判断是否需要重建
+    """
+
+    def __init__(self, app=None):
+        self.check_seconds = 5
+        self._lock = threading.Lock()
+        self._values = None
+        self._descriptions = {}
+        self._token = None
+        self._checked_at = 0.0
+        self.version = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.check_seconds = app.config.get('SYSTEM_CONFIG_CHECK_SECONDS', 5)
+
+    # ------------------------------------------------------------------
+    # 加载与失效
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _fetch_token():
+        return tuple(db.session.query(func.count(), func.max(SystemConfig.updated_at)).one())
+
+    def _load(self):
+        token = self._fetch_token()
+        rows = db.session.query(SystemConfig.config_key, SystemConfig.config_value, SystemConfig.description).all()
+        with self._lock:
+            self._values = {key: value for key, value, _ in rows}
+            self._descriptions = {key: desc for key, _, desc in rows}
+            self._token = token
+            self._checked_at = time.monotonic()
+            self.version += 1
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        with self._lock:
+            loaded = self._values is not None
+            due = now - self._checked_at >= self.check_seconds
+        if not loaded:
+            self._load()
+        elif due:
+            token = self._fetch_token()
+            with self._lock:
+                changed = token != self._token
+                self._checked_at = now
+            if changed:
+                self._load()
+
+    def invalidate(self):
+        # 不清空已有数据 (避免并发读取拿到空缓存)，只让下一次读取强制比对并重新加载
+        with self._lock:
+            self._token = None
+            self._checked_at = float('-inf')
+
+    def current_version(self):
+        """ 确认缓存为最新后返回版本号 """
+        self._ensure_fresh()
+        return self.version
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+    def get(self, key, default=None):
+        self._ensure_fresh()
+        with self._lock:
+            return self._values.get(key, default)
+
+    def get_str(self, key, default=None):
+        value = self.get(key)
+        return default if value in (None, '') else str(value)
+
+    def get_float(self, key, default=None):
+        value = self.get(key)
+        if value in (None, ''):
+            return default
+        try:
+            return float(value)
+        except ValueError:
+            print(f"⚠️ 系统参数 {key}={value} 不是数值，使用默认值 {default}")
+            return default
+
+    def get_int(self, key, default=None):
+        value = self.get_float(key)
+        return default if value is None else int(value)
+
+    def all(self):
+        """ {配置键: (值, 说明)} """
+        self._ensure_fresh()
+        with self._lock:
+            return {key: (value, self._descriptions.get(key)) for key, value in self._values.items()}
+
+
+# 进程内单例，在 create_app 中通过 system_config.init_app(app) 绑定
+system_config = SystemConfigCache()
@@ -0,0 +1,143 @@
+# app/services/energy_cube.py
+from decimal import Decimal
+from sqlalchemy import func, extract, delete, insert
+from sqlalchemy.dialects import mysql, sqlite
+from app.extensions import db
+from app.models import PeakValleyEnergy, EnergyMonthlyCube, Plant
+from app.services.report_cache import period_report_cache
+
+
+class EnergyCubeService:
+    """
+    能耗月度汇总立方体 (energy_monthly_cube) 维护与查询
+    - apply: 日统计每次写入时把变化量 (新值 - 旧值) 累加到所在月份，与日统计同一事务
+    - rebuild: 从日统计整表重建 (初次上线 / 校验修复)
+    - 每次修改格子都递增 revision，SUM(revision) 单调递增，作为周期报表缓存的版本号
+    - 查询: 月 / 季度 / 年均为至多 12 个月度格子的汇总，与历史数据量无关
+    """
+
+    FIELDS = ('sharp_value', 'peak_value', 'flat_value', 'valley_value', 'total_value', 'total_cost')
+
+    @staticmethod
+    def period_months(period_type, period_value):
+        """ 周期 → (起始月, 结束月) """
+        if period_type == 'month':
+            return int(period_value), int(period_value)
+        if period_type == 'quarter':
+            start_month = (int(period_value) - 1) * 3 + 1
+            return start_month, start_month + 2
+        return 1, 12  # year
+
+    # ------------------------------------------------------------------
+    # 维护
+    # ------------------------------------------------------------------
+    @classmethod
+    def delta(cls, report, new_values):
+        """ 日统计即将写入 new_values 前调用，返回 {字段: 变化量} (新日统计的旧值按 0 计) """
+        return {f: Decimal(str(new_values[f])) - Decimal(str(getattr(report, f) or 0)) for f in cls.FIELDS}
+
+    @classmethod
+    def apply(cls, changes):
+        """
+        累加变化量
+        :param changes: [(plant_id, energy_type, stat_date, {字段: 变化量}), ...]
+        """
+        cells = {}
+        for plant_id, energy_type, stat_date, delta in changes:
+            key = (stat_date.year, stat_date.month, plant_id, energy_type)
+            cell = cells.setdefault(key, dict.fromkeys(cls.FIELDS, Decimal(0)))
+            for f in cls.FIELDS:
+                cell[f] += delta[f]
+
+        values = [
+            dict(stat_year=year, stat_month=month, plant_id=plant_id, energy_type=energy_type, revision=1, **cell)
+            for (year, month, plant_id, energy_type), cell in cells.items()
+            if any(cell.values())
+        ]
+        if not values:
+            return
+
+        table = EnergyMonthlyCube.__table__
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'mysql':
+            stmt = mysql.insert(table)
+            stmt = stmt.on_duplicate_key_update(
+                revision=table.c.revision + 1, **{f: table.c[f] + stmt.inserted[f] for f in cls.FIELDS}
+            )
+        else:
+            # 本地 SQLite (压测/调试) 使用等价的 ON CONFLICT 语法
+            stmt = sqlite.insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['stat_year', 'stat_month', 'plant_id', 'energy_type'],
+                set_=dict(revision=table.c.revision + 1, **{f: table.c[f] + stmt.excluded[f] for f in cls.FIELDS})
+            )
+        db.session.execute(stmt, values)
+
+    @classmethod
+    def rebuild(cls):
+        """ 一次分组查询从日统计重建整个立方体，返回格子数 (调用方提交) """
+        year = extract('year', PeakValleyEnergy.stat_date)
+        month = extract('month', PeakValleyEnergy.stat_date)
+        rows = db.session.query(
+            year, month, PeakValleyEnergy.plant_id, PeakValleyEnergy.energy_type,
+            *[func.coalesce(func.sum(getattr(PeakValleyEnergy, f)), 0) for f in cls.FIELDS]
+        ).filter(
+            PeakValleyEnergy.plant_id.isnot(None), PeakValleyEnergy.energy_type.isnot(None)
+        ).group_by(year, month, PeakValleyEnergy.plant_id, PeakValleyEnergy.energy_type).all()
+
+        # 重建后每格 revision 取重建前的总和 + 1，保证 SUM(revision) 仍然递增，其他进程的报表缓存随之失效
+        revision = cls.revision() + 1
+        db.session.execute(delete(EnergyMonthlyCube))
+        values = [
+            dict(stat_year=int(r[0]), stat_month=int(r[1]), plant_id=r[2], energy_type=r[3], revision=revision,
+                 **{f: r[4 + i] for i, f in enumerate(cls.FIELDS)})
+            for r in rows
+        ]
+        for i in range(0, len(values), 5000):
+            db.session.execute(insert(EnergyMonthlyCube), values[i:i + 5000])
+        period_report_cache.invalidate()
+        return len(values)
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+    @staticmethod
+    def revision():
+        """ 立方体版本号: 全部格子的 SUM(revision) """
+        return int(db.session.query(func.coalesce(func.sum(EnergyMonthlyCube.revision), 0)).scalar())
+
+    @staticmethod
+    def _period_filter(query, year, start_month, end_month):
+        return query.filter(EnergyMonthlyCube.stat_year == year,
+                            EnergyMonthlyCube.stat_month.between(start_month, end_month))
+
+    @classmethod
+    def period_total(cls, plant_id, energy_type, year, period_type, period_value):
+        """ 单个厂区单种能源的周期汇总 (sharp / peak / flat / valley / total / cost) """
+        start_month, end_month = cls.period_months(period_type, period_value)
+        query = db.session.query(
+            func.sum(EnergyMonthlyCube.sharp_value).label('sharp'),
+            func.sum(EnergyMonthlyCube.peak_value).label('peak'),
+            func.sum(EnergyMonthlyCube.flat_value).label('flat'),
+            func.sum(EnergyMonthlyCube.valley_value).label('valley'),
+            func.sum(EnergyMonthlyCube.total_value).label('total'),
+            func.sum(EnergyMonthlyCube.total_cost).label('cost')
+        ).filter(EnergyMonthlyCube.plant_id == plant_id, EnergyMonthlyCube.energy_type == energy_type)
+        return cls._period_filter(query, year, start_month, end_month).first()
+
+    @classmethod
+    def plant_type_totals(cls, year, period_type, period_value, energy_type=None):
+        """ 周期内按 (厂区, 能源类型) 汇总: [(plant_id, plant_name, energy_type, total_val, total_cost)] """
+        start_month, end_month = cls.period_months(period_type, period_value)
+        query = db.session.query(
+            Plant.plant_id,
+            Plant.plant_name,
+            EnergyMonthlyCube.energy_type,
+            func.sum(EnergyMonthlyCube.total_value).label('total_val'),
+            func.sum(EnergyMonthlyCube.total_cost).label('total_cost')
+        ).join(EnergyMonthlyCube, EnergyMonthlyCube.plant_id == Plant.plant_id)
+        if energy_type:
+            query = query.filter(EnergyMonthlyCube.energy_type == energy_type)
+        query = cls._period_filter(query, year, start_month, end_month)
+        return query.group_by(Plant.plant_id, Plant.plant_name, EnergyMonthlyCube.energy_type) \
+            .order_by(Plant.plant_id, EnergyMonthlyCube.energy_type).all()
@@ -1,6 +1,99 @@
 # app/services/energy_data_service.py
+import threading
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+import numpy as np
+from flask import current_app
+from sqlalchemy import func, and_
 from app.extensions import db
 from app.models import EnergyData,Plant
+from app.services.write_buffer import write_buffer
+from app.services.energy_service import AnalysisService
+from app.services.report_cache import period_report_cache
+
+
+class TrustedReadingCache:
+    """
+    每块计量表最近一条"可信数据" (Good / Fair) 的进程内缓存
+    - 首次遇到的计量表用一次查询批量加载 (meter_id IN ...)，之后判定不再访问数据库
+    - 判定为可信的新读数立即更新缓存 (按采集时间取最新)，与逐条入库后再查询的结果一致
+    - 每 ENERGY_TRUSTED_CACHE_RESYNC_SECONDS 秒从数据库重新加载，感知其他进程写入 / 修正的数据
+    """
+
+    VALUE_SCALE = Decimal('0.01')  # 与 energy_data.energy_value 的 DECIMAL(12, 2) 一致
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._readings = {}  # meter_id -> (collect_time, value)，无可信数据时 value 为 None
+        self._synced_at = None
+
+    @classmethod
+    def quantize(cls, value):
+        """
+        入库后再读出的值: 缓存保存同样的值，下一次判定才与查库结果逐位一致
+        MySQL DECIMAL 按十进制四舍五入；SQLite 存浮点数，读出时按 '%.2f' 格式化
+        """
+        if value is None:
+            return None
+        if db.session.get_bind().dialect.name == 'sqlite':
+            return float(Decimal('%.2f' % float(value)))
+        return float(Decimal(str(value)).quantize(cls.VALUE_SCALE, rounding=ROUND_HALF_UP))
+
+    @staticmethod
+    def _load(meter_ids):
+        """ 一次查询取出各计量表最近一条可信数据 """
+        trusted = EnergyData.data_quality.in_(['Good', 'Fair'])
+        latest = db.session.query(
+            EnergyData.meter_id,
+            func.max(EnergyData.collect_time).label('max_time')
+        ).filter(EnergyData.meter_id.in_(meter_ids), trusted).group_by(EnergyData.meter_id).subquery()
+
+        records = db.session.query(EnergyData.meter_id, EnergyData.collect_time, EnergyData.energy_value).join(
+            latest,
+            and_(EnergyData.meter_id == latest.c.meter_id, EnergyData.collect_time == latest.c.max_time)
+        ).filter(trusted).order_by(EnergyData.energy_data_id).all()
+
+        readings = dict.fromkeys(meter_ids, (None, None))
+        for meter_id, collect_time, value in records:
+            readings[meter_id] = (collect_time, None if value is None else float(value))
+        return readings
+
+    def get_many(self, meter_ids):
+        """ {meter_id: (collect_time, value)}，缺失的计量表先批量加载 """
+        resync_seconds = current_app.config.get('ENERGY_TRUSTED_CACHE_RESYNC_SECONDS', 300)
+        now = datetime.now()
+        meter_ids = set(meter_ids)
+        with self._lock:
+            if self._synced_at is None or (now - self._synced_at).total_seconds() >= resync_seconds:
+                self._readings = {}
+                self._synced_at = now
+            missing = [m for m in meter_ids if m not in self._readings]
+
+        if missing:
+            loaded = self._load(missing)
+            with self._lock:
+                for meter_id, reading in loaded.items():
+                    self._readings.setdefault(meter_id, reading)
+
+        with self._lock:
+            return {m: self._readings[m] for m in meter_ids}
+
+    def observe(self, meter_id, collect_time, value):
+        """ 新的可信数据 (判定为 Good / Fair 或人工修正) """
+        with self._lock:
+            current = self._readings.get(meter_id)
+            if current is None:
+                return  # 尚未加载，下次用到时从数据库取
+            if current[0] is None or collect_time >= current[0]:
+                self._readings[meter_id] = (collect_time, value)
+
+    def clear(self):
+        with self._lock:
+            self._readings = {}
+            self._synced_at = None
+
+
+trusted_reading_cache = TrustedReadingCache()
 
 
 class EnergyDataService:
@@ -12,6 +105,14 @@ class EnergyDataService:
 
     FLUCTUATION_THRESHOLD = 0.20  # 20%
 
+    # 波动率上限 → (数据质量, 是否待核实)，超过最后一档为 Bad
+    QUALITY_LEVELS = [
+        (0.10, 'Good', 0),
+        (0.20, 'Fair', 0),
+        (0.50, 'Medium', 1),
+    ]
+    TRUSTED = ('Good', 'Fair')
+
     @classmethod
     def save_energy_data(
         cls,
@@ -23,69 +124,124 @@ class EnergyDataService:
     ):
         """
         保存能耗数据，并自动判定数据质量
+        数据经写后缓冲异步入库: 返回时不一定已落库，也没有 energy_data_id
+        :return: 已进入写入队列 (缓冲关闭时为已同步写入) 的行字典 (含 data_quality / need_verify)，
+                 缓冲区已满被丢弃时返回 None
         """
+        rows = cls.save_energy_batch([dict(meter_id=meter_id, plant_id=plant_id, collect_time=collect_time,
+                                           energy_value=energy_value, unit=unit)])
+        return rows[0] if rows else None
 
-        # 1️ 查询该设备最近一条“可信数据”（Good / Fair）
-        last_record = (
-            EnergyData.query
-            .filter(
-                EnergyData.meter_id == meter_id,
-                EnergyData.data_quality.in_(['Good', 'Fair'])
-            )
-            .order_by(EnergyData.collect_time.desc())
-            .first()
-        )
-
-        # 默认值
-        need_verify = 0
-        data_quality = 'Good'
-
-        # 2 计算波动率
-        if last_record and last_record.energy_value and last_record.energy_value > 0:
-            last_value = float(last_record.energy_value)
-            current_value = float(energy_value)
-
-            fluctuation = abs(current_value - last_value) / last_value
-
-            if fluctuation <= 0.10:
-                data_quality = 'Good'
-            elif fluctuation <= 0.20:
-                data_quality = 'Fair'
-            elif fluctuation <= 0.50:
-                data_quality = 'Medium'
-                need_verify = 1
-            else:
-                data_quality = 'Bad'
-                need_verify = 1
-
-        # 3️ 构建 EnergyData 对象
-        data = EnergyData(
-            meter_id=meter_id,
-            plant_id=plant_id,
-            collect_time=collect_time,
-            energy_value=energy_value,
-            unit=unit,
-            data_quality=data_quality,
-            need_verify=need_verify
-        )
-
-        db.session.add(data)
-        db.session.commit()
+    @classmethod
+    def classify(cls, last_values, values):
+        """
+        按与上一条可信数据的波动率判定数据质量 (向量化)
+        :param last_values: 上一条可信数据 (无可信数据为 NaN)
+        :param values: 本次读数
+        :return: (数据质量数组, 待核实数组)
+        """
+        last_values = np.asarray(last_values, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+
+        # 无可信数据或上次读数 <= 0 时不判定，默认 Good
+        comparable = last_values > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fluctuation = np.abs(values - last_values) / last_values
+
+        quality = np.full(values.shape, 'Bad', dtype=object)
+        need_verify = np.ones(values.shape, dtype=np.int8)
+        decided = np.zeros(values.shape, dtype=bool)
+        for limit, level, verify in cls.QUALITY_LEVELS:
+            mask = ~decided & (fluctuation <= limit)
+            quality[mask] = level
+            need_verify[mask] = verify
+            decided |= mask
+        quality[~comparable] = 'Good'
+        need_verify[~comparable] = 0
+        return quality, need_verify
 
-        return data
+    @classmethod
+    def save_energy_batch(cls, readings):
+        """
+        批量保存多块计量表的读数并判定数据质量，整批一次写入
+        :param readings: [{meter_id, plant_id, collect_time, energy_value, unit}, ...]
+        :return: 写后缓冲已接收的行 (输入的前缀，含 data_quality / need_verify)，
+                 缓冲区已满被丢弃的行不返回、也不作为后续判定的"上一条可信数据"
+        判定结果与逐条调用 (每条入库后再判定下一条) 一致:
+        同一计量表有多条读数时按提交顺序分轮判定，每轮结束后把可信读数更新为该表的"上一条可信数据"
+        """
+        if not readings:
+            return []
+
+        rows = [dict(r) for r in readings]
+        last = trusted_reading_cache.get_many(r['meter_id'] for r in rows)
+
+        # 第 k 轮处理每块表的第 k 条读数
+        rounds, seen = [], {}
+        for i, row in enumerate(rows):
+            k = seen.get(row['meter_id'], 0)
+            seen[row['meter_id']] = k + 1
+            if k == len(rounds):
+                rounds.append([])
+            rounds[k].append(i)
+
+        for indexes in rounds:
+            last_values = [np.nan if last[rows[i]['meter_id']][1] is None else last[rows[i]['meter_id']][1]
+                           for i in indexes]
+            # 缺失读数按 NaN 判定: 无可比较的可信数据时为 Good，否则为 Bad 待核实
+            values = [np.nan if rows[i]['energy_value'] is None else float(rows[i]['energy_value']) for i in indexes]
+            quality, need_verify = cls.classify(last_values, values)
+
+            for i, level, verify in zip(indexes, quality, need_verify):
+                row = rows[i]
+                row['data_quality'] = level
+                row['need_verify'] = int(verify)
+                if level in cls.TRUSTED:
+                    previous_time = last[row['meter_id']][0]
+                    if previous_time is None or row['collect_time'] >= previous_time:
+                        last[row['meter_id']] = (row['collect_time'],
+                                                 TrustedReadingCache.quantize(row['energy_value']))
+
+        accepted = write_buffer.submit(EnergyData, rows)
+        rows = rows[:accepted]
+        for row in rows:
+            if row['data_quality'] in cls.TRUSTED:
+                trusted_reading_cache.observe(row['meter_id'], row['collect_time'],
+                                              TrustedReadingCache.quantize(row['energy_value']))
+        return rows
+
+    @staticmethod
+    def _stat_delta(data, value):
+        # 峰谷日统计只计入已确认数据，核实 / 修正 (先 flush) 后把变化量增量累加到日统计
+        return dict(meter_id=data.meter_id, plant_id=data.plant_id, collect_time=data.collect_time,
+                    energy_value=value, need_verify=0)
 
     @classmethod
     def confirm_energy_data(cls, data_id):
         data = EnergyData.query.get_or_404(data_id)
+        was_pending = data.need_verify
         data.need_verify = 0
+        db.session.flush()
+        if was_pending and data.energy_value is not None:
+            AnalysisService.apply_energy_rows([cls._stat_delta(data, data.energy_value)])
         db.session.commit()
+        period_report_cache.invalidate_dates([data.collect_time.date()])
 
     @classmethod
     def update_energy_data(cls, data_id, new_value):
         data = EnergyData.query.get_or_404(data_id)
 
+        counted = float(data.energy_value or 0) if not data.need_verify else 0.0
+
         data.energy_value = new_value
         data.need_verify = 0
         data.data_quality = 'Good'  # 或重新算一次
+        db.session.flush()
 
+        delta = float(new_value) - counted
+        if delta:
+            AnalysisService.apply_energy_rows([cls._stat_delta(data, delta)])
         db.session.commit()
+        period_report_cache.invalidate_dates([data.collect_time.date()])
+        # 修正后的读数标记为 Good，可能成为该表最近一条可信数据
+        trusted_reading_cache.observe(data.meter_id, data.collect_time, TrustedReadingCache.quantize(new_value))
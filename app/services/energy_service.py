@@ -1,111 +1,126 @@
 # app/services/energy_service.py
-from sqlalchemy import func, extract
+from sqlalchemy import func, extract, case
+from sqlalchemy.dialects import mysql, sqlite
 from app.extensions import db
 from app.models import  PeakValleyEnergy, EnergyData, EnergyMeter ,Plant
+from app.services.archive_service import ArchiveService
+from app.services.energy_cube import EnergyCubeService
+from app.services.report_cache import period_report_cache
+from app.services.tariff_calendar import tariff_calendar, PERIODS, DEFAULT_HOURS, DEFAULT_PRICES
+import numpy as np
 from decimal import Decimal
+from datetime import date, datetime, timedelta
 
 
 class AnalysisService:
-    # 定义峰谷时段 (小时)
-    SHARP_HOURS = [10, 11, 16, 17]
-    PEAK_HOURS = [8, 9, 12, 13, 14, 15, 18, 19, 20, 21]
-    FLAT_HOURS = [6, 7, 22, 23]
-    VALLEY_HOURS = [0, 1, 2, 3, 4, 5]
+    # 内置峰谷时段 (小时) 与单价，实际计价以分时电价日历 (tariff_calendar) 为准
+    SHARP_HOURS = DEFAULT_HOURS['sharp']
+    PEAK_HOURS = DEFAULT_HOURS['peak']
+    FLAT_HOURS = DEFAULT_HOURS['flat']
+    VALLEY_HOURS = DEFAULT_HOURS['valley']
+    PRICE_MAP = DEFAULT_PRICES
 
+    PERIODS = PERIODS
 
-    # 不同能源类型的模拟
-    PRICE_MAP = {
-        'electric': {'sharp': 1.5, 'peak': 1.2, 'flat': 0.8, 'valley': 0.4},  # 电力的单价
-        'water': {'sharp': 0.8, 'peak': 0.7, 'flat': 0.5, 'valley': 0.3},  # 水的单价
-        'gas': {'sharp': 2.0, 'peak': 1.8, 'flat': 1.0, 'valley': 0.5},  # 天然气的单价
-        'steam': {'sharp': 2.5, 'peak': 2.2, 'flat': 1.5, 'valley': 1.0},  # 蒸汽的单价
-    }
+    @staticmethod
+    def _day_range(stat_date):
+        """ [当日 00:00, 次日 00:00) 半开区间，可命中 collect_time 索引 """
+        start = datetime.combine(stat_date, datetime.min.time())
+        return start, start + timedelta(days=1)
+
+    @classmethod
+    def _period_buckets(cls, plant_id, energy_type, stat_date):
+        """
+        一次分组查询统计某厂区某能源类型当日各时段能耗 (所有计量表合计)
+        :return: {'sharp': x, 'peak': x, 'flat': x, 'valley': x}；该厂区无此类计量表时返回 None
+        """
+        meter_ids = [m for (m,) in db.session.query(EnergyMeter.meter_id)
+                     .filter_by(plant_id=plant_id, energy_type=energy_type)]
+        if not meter_ids:
+            return None
+
+        # 按一天中的分钟分组，支持非整点的时段边界
+        start, end = cls._day_range(stat_date)
+        minute = extract('hour', EnergyData.collect_time) * 60 + extract('minute', EnergyData.collect_time)
+        stats = db.session.query(minute, func.sum(EnergyData.energy_value)).filter(
+            EnergyData.collect_time >= start,
+            EnergyData.collect_time < end,
+            EnergyData.plant_id == plant_id,
+            EnergyData.meter_id.in_(meter_ids),
+            EnergyData.need_verify == 0  # 只统计已确认数据
+        ).group_by(minute).all()
+
+        day_table = tariff_calendar.get().day_table(stat_date)
+        sums = np.zeros(len(cls.PERIODS))
+        if stats:
+            minutes = np.array([int(m) for m, _ in stats], dtype=np.int64)
+            values = np.array([float(v or 0) for _, v in stats], dtype=np.float64)
+            sums += np.bincount(day_table[minutes], weights=values, minlength=len(cls.PERIODS))
+
+        # 已归档日期从冷存储文件读取 (在线表中只剩归档后补传的数据)
+        meters = set(meter_ids)
+        archived = [(r.collect_time.hour * 60 + r.collect_time.minute, float(r.energy_value))
+                    for r in ArchiveService.rows(EnergyData, stat_date, plant_id=plant_id, need_verify=0)
+                    if r.meter_id in meters and r.energy_value is not None]
+        if archived:
+            minutes, values = (np.array(col) for col in zip(*archived))
+            sums += np.bincount(day_table[minutes], weights=values, minlength=len(cls.PERIODS))
+        return {period: float(sums[i]) for i, period in enumerate(cls.PERIODS)}
+
+    @classmethod
+    def _fill_report(cls, report, energy_type, buckets):
+        """
+        写入各时段能耗并按分时电价日历中该厂区、该能源类型的单价计算成本
+        :return: 月度立方体的变化量 (plant_id, energy_type, stat_date, {字段: 变化量})，由调用方统一累加
+        """
+        sharp, peak, flat, valley = (buckets[p] for p in cls.PERIODS)
+        total_value = sharp + peak + flat + valley
+
+        price_map = tariff_calendar.get().price_map(report.plant_id, energy_type)
+        total_cost = (sharp * price_map.get('sharp', 0) +
+                      peak * price_map.get('peak', 0) +
+                      flat * price_map.get('flat', 0) +
+                      valley * price_map.get('valley', 0))
+        avg_price = total_cost / total_value if total_value > 0 else 0
+
+        values = {
+            'sharp_value': round(sharp, 2),
+            'peak_value': round(peak, 2),
+            'flat_value': round(flat, 2),
+            'valley_value': round(valley, 2),
+            'total_value': round(total_value, 2),
+            'total_cost': round(total_cost, 2),
+        }
+        delta = EnergyCubeService.delta(report, values)
+        for field, value in values.items():
+            setattr(report, field, value)
+        report.price_per_unit = round(avg_price, 4)
+        return report.plant_id, energy_type, report.stat_date, delta
 
     @classmethod
     def calculate_daily_energy_cost(cls, plant_id, energy_type, stat_date):
         """
         计算指定日期和厂区的日能耗成本 (包含峰谷能耗统计)
+        以原始数据为准重算并覆盖当日统计: 先锁定当日统计行，再读取原始数据。
+        写后缓冲的增量钩子与原始数据同一事务提交，且累加前要等这把锁，
+        所以锁之前已提交的读数都在本次读取的快照里，之后提交的读数再累加到重算结果上，不会重复或遗漏
         """
 
         try:
-            print(f"Start calculating energy cost for plant {plant_id}, energy type {energy_type}, date {stat_date}")
-
-            # 获取该厂区所有选中类型的能耗计量设备
-            meters = EnergyMeter.query.filter_by(plant_id=plant_id, energy_type=energy_type).all()
+            # 结束调用方之前的事务，保证读取原始数据的快照 (InnoDB 可重复读) 建立在加锁之后
+            db.session.commit()
+            report = cls._locked_report(plant_id, energy_type, stat_date)
 
-            if not meters:
-                print("No meters found for this plant and energy type")
+            buckets = cls._period_buckets(plant_id, energy_type, stat_date)
+            if buckets is None:
+                db.session.rollback()
+                print(f"No meters found for plant {plant_id}, energy type {energy_type}")
                 return None
 
-            sharp, peak, flat, valley = 0.0, 0.0, 0.0, 0.0
-
-            for meter in meters:
-                records = db.session.query(EnergyData).filter(
-                    func.date(EnergyData.collect_time) == stat_date,
-                    EnergyData.plant_id == plant_id,
-                    EnergyData.meter_id == meter.meter_id,
-                    EnergyData.need_verify == 0 # 只统计已确认数据
-                ).all()
-
-                # 根据时段进行分类计算能耗
-                for record in records:
-                    hour = record.collect_time.hour
-                    try:
-                        energy_value = float(record.energy_value)
-                    except ValueError:
-                        print(
-                            f"Invalid energy value: {record.energy_value} for meter {meter.meter_id} at {record.collect_time}")
-                        continue  # 跳过无效记录
-
-                    print(f"Record time: {record.collect_time}, hour: {hour}, energy value: {energy_value}")
-
-                    # 根据时段进行分类计算能耗
-                    if hour in cls.SHARP_HOURS:
-                        print(f"  - Sharp hours: Adding {energy_value} to sharp.")
-                        sharp += energy_value
-                    elif hour in cls.PEAK_HOURS:
-                        print(f"  - Peak hours: Adding {energy_value} to peak.")
-                        peak += energy_value
-                    elif hour in cls.FLAT_HOURS:
-                        print(f"  - Flat hours: Adding {energy_value} to flat.")
-                        flat += energy_value
-                    else:
-                        print(f"  - Valley hours: Adding {energy_value} to valley.")
-                        valley += energy_value
-
-            # 计算总能耗
-            total_value = sharp + peak + flat + valley
-            print(
-                f"Total energy consumption: sharp={sharp}, peak={peak}, flat={flat}, valley={valley}, total={total_value}")
-
-            # 使用对应能源类型的单价来计算总成本
-            price_map = cls.PRICE_MAP.get(energy_type, {})
-            total_cost = (sharp * price_map.get('sharp', 0) +
-                          peak * price_map.get('peak', 0) +
-                          flat * price_map.get('flat', 0) +
-                          valley * price_map.get('valley', 0))
-            avg_price = total_cost / total_value if total_value > 0 else 0
-
-            print(f"Total cost: {total_cost}, Average price per unit: {avg_price}")
-
-            # 存储或更新数据
-            report = PeakValleyEnergy.query.filter_by(plant_id=plant_id, stat_date=stat_date,
-                                                      energy_type=energy_type).first()
-            if not report:
-                print(f"Creating a new report for {plant_id} on {stat_date}")
-                report = PeakValleyEnergy(plant_id=plant_id, stat_date=stat_date, energy_type=energy_type)
-
-            report.sharp_value = round(sharp, 2)
-            report.peak_value = round(peak, 2)
-            report.flat_value = round(flat, 2)
-            report.valley_value = round(valley, 2)
-            report.total_value = round(total_value, 2)
-            report.total_cost = round(total_cost, 2)
-            report.price_per_unit = round(avg_price, 4)
-
-            db.session.add(report)
+            EnergyCubeService.apply([cls._fill_report(report, energy_type, buckets)])
+
             db.session.commit()
-            print(f"Report created/updated successfully for {plant_id} on {stat_date}")
+            period_report_cache.invalidate_dates([stat_date])
 
             return report
 
@@ -115,38 +130,159 @@ class AnalysisService:
             raise e
 
     @classmethod
-    def analyze_high_energy_plant(cls, stat_date, energy_type, threshold=0.3):
-        # 修改点：使用 join 关联 Plant 表，查询出 (能耗记录对象, 厂区名称)
-        records = (
+    def _locked_report(cls, plant_id, energy_type, stat_date):
+        """ 取出并锁定日统计 (SELECT ... FOR UPDATE)，不存在时先原子插入一条全 0 的日统计 """
+        zero = dict.fromkeys(EnergyCubeService.FIELDS, Decimal(0))
+        cls._upsert_daily_deltas([(plant_id, energy_type, stat_date, zero)])
+        return PeakValleyEnergy.query.filter_by(plant_id=plant_id, stat_date=stat_date, energy_type=energy_type) \
+            .with_for_update().populate_existing().one()
+
+    @classmethod
+    def apply_energy_rows(cls, rows):
+        """
+        增量更新峰谷日统计及月度立方体 (write_buffer 的 EnergyData 写入钩子，与原始数据同一事务，由调用方提交)
+        把本批已确认读数按 (厂区, 能源类型, 日期) 和时段汇总成变化量，用 INSERT ... ON DUPLICATE KEY UPDATE
+        原子累加，多个进程 (Web / 仿真脚本 / 补算任务) 同时写同一天也不会丢失更新或唯一索引冲突
+        不经写后缓冲直接写入的原始数据由 peak_valley_job.py 每天重算前一天时纠正
+        rows 中 energy_value 可以为负数 (修正已确认读数时传入差值)
+        """
+        rows = [r for r in rows if not r.get('need_verify') and r.get('energy_value') is not None
+                and r.get('plant_id') is not None]
+        if not rows:
+            return
+
+        meter_types = dict(db.session.query(EnergyMeter.meter_id, EnergyMeter.energy_type)
+                           .filter(EnergyMeter.meter_id.in_({r['meter_id'] for r in rows})).all())
+
+        keys, timestamps, values = [], [], []
+        for r in rows:
+            energy_type = meter_types.get(r['meter_id'])
+            if energy_type is None:
+                continue
+            ts = r['collect_time']
+            if isinstance(ts, str):
+                ts = datetime.fromisoformat(ts)
+            keys.append((r['plant_id'], energy_type, ts.date()))
+            timestamps.append(ts)
+            values.append(float(r['energy_value']))
+        if not keys:
+            return
+
+        # 整批时间戳一次分类，再按 (厂区, 能源类型, 日期) 累加到各时段
+        key_index = {}
+        rows_key = np.array([key_index.setdefault(k, len(key_index)) for k in keys], dtype=np.int64)
+        sums = np.zeros((len(key_index), len(cls.PERIODS)))
+        calendar = tariff_calendar.get()
+        np.add.at(sums, (rows_key, calendar.classify(timestamps)), values)
+
+        changes = []
+        for (plant_id, energy_type, stat_date), i in key_index.items():
+            price_map = calendar.price_map(plant_id, energy_type)
+            buckets = dict(zip(cls.PERIODS, sums[i].tolist()))
+            delta = {f'{p}_value': Decimal(str(round(buckets[p], 2))) for p in cls.PERIODS}
+            delta['total_value'] = sum(delta.values())
+            delta['total_cost'] = Decimal(str(round(sum(buckets[p] * price_map.get(p, 0) for p in cls.PERIODS), 2)))
+            changes.append((plant_id, energy_type, stat_date, delta))
+
+        cls._upsert_daily_deltas(changes)
+        EnergyCubeService.apply(changes)
+
+    @classmethod
+    def _upsert_daily_deltas(cls, changes):
+        """ 把变化量原子累加到日统计 (不存在则插入)，单价按累加后的 总成本 / 总能耗 重算 """
+        values = [
+            dict(plant_id=plant_id, energy_type=energy_type, stat_date=stat_date,
+                 price_per_unit=(delta['total_cost'] / delta['total_value']).quantize(Decimal('0.0001'))
+                 if delta['total_value'] > 0 else Decimal(0),
+                 **{f: delta[f] for f in EnergyCubeService.FIELDS})
+            for plant_id, energy_type, stat_date, delta in changes
+        ]
+        if not values:
+            return
+
+        table = PeakValleyEnergy.__table__
+
+        def updates(new):
+            total_value = func.coalesce(table.c.total_value, 0) + new.total_value
+            total_cost = func.coalesce(table.c.total_cost, 0) + new.total_cost
+            # 单价放在最前: MySQL 按顺序赋值，后面的表达式会读到已更新的列
+            return [('price_per_unit', case((total_value > 0, total_cost / total_value), else_=0))] + \
+                [(f, func.coalesce(table.c[f], 0) + new[f]) for f in EnergyCubeService.FIELDS]
+
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'mysql':
+            stmt = mysql.insert(table)
+            stmt = stmt.on_duplicate_key_update(updates(stmt.inserted))
+        else:
+            # 本地 SQLite (压测/调试) 使用等价的 ON CONFLICT 语法
+            stmt = sqlite.insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['stat_date', 'plant_id', 'energy_type'],
+                set_=dict(updates(stmt.excluded))
+            )
+        db.session.execute(stmt, values)
+
+    @staticmethod
+    def energy_rows_committed(rows):
+        """ write_buffer 的 EnergyData 提交监听: 日统计已随原始数据提交，失效涉及日期的周期报表缓存 """
+        dates = set()
+        for r in rows:
+            if r.get('need_verify') or r.get('energy_value') is None:
+                continue
+            ts = r['collect_time']
+            dates.add(datetime.fromisoformat(ts).date() if isinstance(ts, str) else ts.date())
+        period_report_cache.invalidate_dates(dates)
+
+    @staticmethod
+    def daily_plant_query(stat_date, energy_type):
+        """ 某日某能源类型各厂区的日统计 (能耗记录对象, 厂区名称)，按唯一索引前缀查找 (迁移 V006 的 check 校验) """
+        return (
             db.session.query(PeakValleyEnergy, Plant.plant_name)
             .join(Plant, PeakValleyEnergy.plant_id == Plant.plant_id)
             .filter(
                 PeakValleyEnergy.stat_date == stat_date,
                 PeakValleyEnergy.energy_type == energy_type
-            ).all()
+            )
         )
 
+    @classmethod
+    def analyze_high_energy_plant(cls, stat_date, energy_type, threshold=0.3):
+        # 修改点：使用 join 关联 Plant 表，查询出 (能耗记录对象, 厂区名称)
+        records = cls.daily_plant_query(stat_date, energy_type).all()
+        # r 是 PeakValleyEnergy 对象
+        return cls._high_energy_plants([(r.plant_id, plant_name, r.total_value) for r, plant_name in records],
+                                       threshold)
+
+    @classmethod
+    def analyze_high_energy_plant_month(cls, year, month, energy_type, threshold=0.3):
+        """ 按月分析高能耗厂区，直接读月度立方体 """
+        records = EnergyCubeService.plant_type_totals(year, 'month', month, energy_type=energy_type)
+        return cls._high_energy_plants([(r.plant_id, r.plant_name, r.total_val) for r in records], threshold)
+
+    @staticmethod
+    def _high_energy_plants(records, threshold):
+        """ records: [(plant_id, plant_name, total_value)]，返回 (平均值, 超出平均值 threshold 的厂区) """
+        records = [(plant_id, name, Decimal(str(value or 0))) for plant_id, name, value in records]
         if not records:
             return None, []
 
         # 计算平均值
-        total_sum = sum(r[0].total_value for r in records)
+        total_sum = sum(value for _, _, value in records)
         avg_value = float(total_sum / len(records))
 
         threshold_dec = Decimal(str(threshold))
         limit = Decimal(str(avg_value)) * (Decimal('1') + threshold_dec)
 
         high_plants = []
-        # r[0] 是 PeakValleyEnergy 对象，r[1] 是 plant_name 字符串
-        for r, plant_name in records:
-            if r.total_value > limit:
+        for plant_id, plant_name, total_value in records:
+            if total_value > limit:
                 high_plants.append({
-                    'plant_id': r.plant_id,
+                    'plant_id': plant_id,
                     'plant_name': plant_name,  # 新增：保存厂区名称
-                    'total_value': float(r.total_value),
+                    'total_value': float(total_value),
                     'avg_value': avg_value,
                     'exceed_pct': float(
-                        (r.total_value - Decimal(str(avg_value))) / Decimal(str(avg_value)) * 100
+                        (total_value - Decimal(str(avg_value))) / Decimal(str(avg_value)) * 100
                     )
                 })
 
@@ -154,49 +290,21 @@ class AnalysisService:
 
 
   #==========月度报表===========
-    @classmethod
-    def get_period_energy_report(cls, plant_id, energy_type, year, period_value, period_type='month'):
-        from datetime import date, timedelta
+    @staticmethod
+    def _period_range(year, period_type, period_value):
         import calendar
+        start_month, end_month = EnergyCubeService.period_months(period_type, period_value)
+        _, last_day = calendar.monthrange(year, end_month)
+        return date(year, start_month, 1), date(year, end_month, last_day)
 
-        # 1. 确定时间范围
-        if period_type == 'month':
-            start_date = date(year, period_value, 1)
-            _, last_day = calendar.monthrange(year, period_value)
-            end_date = date(year, period_value, last_day)
-        else:  # quarter
-            start_month = (period_value - 1) * 3 + 1
-            start_date = date(year, start_month, 1)
-            _, last_day = calendar.monthrange(year, start_month + 2)
-            end_date = date(year, start_month + 2, last_day)
-
-        # 2. 【核心】自动补偿缺失的日数据
-        # 检查从 start_date 到 end_date 每一天是否有数据，没有就算一遍
-        curr = start_date
-        while curr <= end_date:
-            exists = PeakValleyEnergy.query.filter_by(
-                plant_id=plant_id, energy_type=energy_type, stat_date=curr
-            ).first()
-            if not exists:
-                # 发现日能耗没更新，立即触发计算
-                cls.calculate_daily_energy_cost(plant_id, energy_type, curr)
-            curr += timedelta(days=1)
-
-        # 3. 聚合查询（求和）
-        report = db.session.query(
-            func.sum(PeakValleyEnergy.sharp_value).label('sharp'),
-            func.sum(PeakValleyEnergy.peak_value).label('peak'),
-            func.sum(PeakValleyEnergy.flat_value).label('flat'),
-            func.sum(PeakValleyEnergy.valley_value).label('valley'),
-            func.sum(PeakValleyEnergy.total_value).label('total'),
-            func.sum(PeakValleyEnergy.total_cost).label('cost')
-        ).filter(
-            PeakValleyEnergy.plant_id == plant_id,
-            PeakValleyEnergy.energy_type == energy_type,
-            PeakValleyEnergy.stat_date.between(start_date, end_date)
-        ).first()
-
-        return report
+    @classmethod
+    def get_period_energy_report(cls, plant_id, energy_type, year, period_value, period_type='month'):
+        """
+        月度 / 季度 / 年度能耗报表
+        日统计由 peak_valley_job.py 在每天结束后预计算 (当天由写入钩子增量维护)，
+        并同步累加到月度立方体，这里只汇总至多 12 个月度格子
+        """
+        return EnergyCubeService.period_total(plant_id, energy_type, year, period_type, period_value)
 
     #=======综合分析=========
 
@@ -206,27 +314,19 @@ class AnalysisService:
         """
         [多维度经营分析核心]
         修正版：增加 plant_costs 字段并保证厂区数据顺序一致
+        结果按 (年, 周期类型, 周期值) 缓存，日统计更新后失效
         """
+        start_date, end_date = cls._period_range(year, period_type, period_value)
+        return period_report_cache.get(
+            ('comprehensive', year, period_type, int(period_value)), start_date, end_date,
+            lambda: cls._comprehensive_analysis(year, period_type, period_value)
+        )
 
-
-        # 1. 基础聚合查询：关联厂区表和日统计表
-        query = db.session.query(
-            Plant.plant_name,
-            PeakValleyEnergy.energy_type,
-            func.sum(PeakValleyEnergy.total_value).label('total_val'),
-            func.sum(PeakValleyEnergy.total_cost).label('total_cost')
-        ).join(PeakValleyEnergy, Plant.plant_id == Plant.plant_id)
-
-        # 2. 时间维度过滤
-        query = query.filter(extract('year', PeakValleyEnergy.stat_date) == year)
-        if period_type == 'month':
-            query = query.filter(extract('month', PeakValleyEnergy.stat_date) == period_value)
-        else:  # quarter
-            start_month = (int(period_value) - 1) * 3 + 1
-            query = query.filter(extract('month', PeakValleyEnergy.stat_date).between(start_month, start_month + 2))
-
-        # 3. 按厂区和能源类型交叉分组
-        results = query.group_by(Plant.plant_name, PeakValleyEnergy.energy_type).all()
+    @classmethod
+    def _comprehensive_analysis(cls, year, period_type, period_value):
+        # 1~3. 从月度立方体按厂区和能源类型交叉汇总 (厂区名称, 能源类型, 总耗用, 总成本)
+        results = [(r.plant_name, r.energy_type, r.total_val, r.total_cost)
+                   for r in EnergyCubeService.plant_type_totals(year, period_type, period_value)]
 
         # 4. 结构化处理
         report_data = {
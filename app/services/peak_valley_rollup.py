@@ -0,0 +1,122 @@
+# app/services/peak_valley_rollup.py
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+from flask import current_app
+from app.extensions import db
+from app.models import EnergyMeter, PeakValleyEnergy
+from app.services.energy_service import AnalysisService
+
+
+class PeakValleyRollupService:
+    """
+    峰谷日统计 (peak_valley_energy) 预计算
+    - find_gaps: 一次区间查询找出缺失的 (厂区, 能源类型, 日期)
+    - backfill: 缺失日按进程池并行补算 (每个子进程独立的 app 与数据库连接)
+    - 由根目录 peak_valley_job.py 在每天结束后定时执行，报表接口只做最终 SUM 汇总
+    """
+
+    @staticmethod
+    def combos():
+        """ 需要统计的 (厂区, 能源类型) 组合: 有计量表的全部组合 """
+        return db.session.query(EnergyMeter.plant_id, EnergyMeter.energy_type) \
+            .filter(EnergyMeter.plant_id.isnot(None), EnergyMeter.energy_type.isnot(None)) \
+            .distinct().all()
+
+    @staticmethod
+    def existing_query(start_date, end_date):
+        """ 区间内已有日统计的 (plant_id, energy_type, stat_date)，由唯一索引覆盖 (迁移 V006 的 check 校验) """
+        return db.session.query(
+            PeakValleyEnergy.plant_id, PeakValleyEnergy.energy_type, PeakValleyEnergy.stat_date
+        ).filter(PeakValleyEnergy.stat_date >= start_date, PeakValleyEnergy.stat_date <= end_date)
+
+    @classmethod
+    def find_gaps(cls, start_date, end_date):
+        """ [start_date, end_date] (含两端) 内缺少日统计的 (plant_id, energy_type, stat_date) 列表 """
+        existing = set(cls.existing_query(start_date, end_date).all())
+        return [item for item in cls.all_items(start_date, end_date) if item not in existing]
+
+    @classmethod
+    def all_items(cls, start_date, end_date):
+        """ [start_date, end_date] 内全部 (plant_id, energy_type, stat_date)，修改电价日历后整段重算使用 """
+        combos = cls.combos()
+        items = []
+        day = start_date
+        while day <= end_date:
+            items.extend((plant_id, energy_type, day) for plant_id, energy_type in combos)
+            day += timedelta(days=1)
+        return items
+
+    @staticmethod
+    def closed_range(lookback_days, today=None):
+        """ 最近 lookback_days 个已结束的自然日 (不含今天，今天由写入钩子增量维护) """
+        today = today or date.today()
+        return today - timedelta(days=lookback_days), today - timedelta(days=1)
+
+    @classmethod
+    def backfill(cls, gaps, workers=None):
+        """
+        补算缺失的日统计
+        :param workers: 进程数，<= 1 时在当前进程顺序执行
+        :return: 成功补算的条数
+        """
+        if not gaps:
+            return 0
+        workers = workers or current_app.config.get('PEAK_VALLEY_ROLLUP_WORKERS', 4)
+
+        if workers <= 1 or len(gaps) == 1:
+            return sum(_compute_chunk([(p, e, d.isoformat()) for p, e, d in gaps]))
+
+        # 按日期分块，同一天的各组合由同一个子进程处理
+        by_day = {}
+        for plant_id, energy_type, day in gaps:
+            by_day.setdefault(day, []).append((plant_id, energy_type, day.isoformat()))
+        chunks = list(by_day.values())
+
+        # 子进程重新建立连接，fork 前释放父进程连接池，避免共享 socket
+        db_uri = current_app.config['SQLALCHEMY_DATABASE_URI']
+        db.engine.dispose()
+
+        done = 0
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)),
+                                 initializer=_init_worker, initargs=(db_uri,)) as pool:
+            futures = [pool.submit(_compute_chunk, chunk) for chunk in chunks]
+            for future in as_completed(futures):
+                try:
+                    done += sum(future.result())
+                except Exception as e:
+                    print(f"❌ 峰谷日统计补算失败: {e}")
+        return done
+
+
+# ------------------------------------------------------------------
+# 进程池子进程入口 (必须是模块级函数才能被 pickle)
+# ------------------------------------------------------------------
+_worker_app = None
+
+
+def _init_worker(db_uri):
+    global _worker_app
+    from config import Config
+    from app import create_app
+    Config.SQLALCHEMY_DATABASE_URI = db_uri
+    Config.WRITE_BUFFER_ENABLED = False
+    _worker_app = create_app()
+
+
+def _compute_chunk(items):
+    """ items: [(plant_id, energy_type, 'YYYY-MM-DD'), ...]，返回每项是否成功 """
+    def run():
+        results = []
+        for plant_id, energy_type, day in items:
+            try:
+                report = AnalysisService.calculate_daily_energy_cost(plant_id, energy_type, date.fromisoformat(day))
+                results.append(report is not None)
+            except Exception as e:
+                print(f"❌ 厂区 {plant_id} {energy_type} {day} 日统计失败: {e}")
+                results.append(False)
+        return results
+
+    if _worker_app is None:
+        return run()
+    with _worker_app.app_context():
+        return run()
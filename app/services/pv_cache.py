@@ -0,0 +1,166 @@
+# app/services/pv_cache.py
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, and_
+from app.extensions import db
+from app.models import PVGenerationData
+
+
+class PVLatestCache:
+    """
+    光伏设备最新读数缓存 (按 device_id)
+    - 接入链路每次上传即更新，实时接口无需再逐台查询 pv_generation_data
+    - 冷启动或超过 PV_LATEST_CACHE_RESYNC_SECONDS 未同步时，
+      用一条分组查询从数据库回填近期读数 (兼容多 worker 场景)
+    """
+
+    FIELDS = ('string_voltage_v', 'string_current_a', 'inverter_eff_pct', 'gen_kwh')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._readings = {}
+        self._synced_at = None
+
+    def update(self, rows):
+        """ 接入链路调用：rows 为写入 PVGenerationData 的字段字典 """
+        with self._lock:
+            for row in rows:
+                self._put(int(row['device_id']), row['collect_time'], row)
+
+    def _put(self, device_id, collect_time, values):
+        current = self._readings.get(device_id)
+        if current is not None and current['collect_time'] > collect_time:
+            return
+        reading = {'collect_time': collect_time}
+        for field in self.FIELDS:
+            reading[field] = float(values.get(field) or 0)
+        self._readings[device_id] = reading
+
+    def get_all(self):
+        """ 返回 {device_id: 最新读数} 的快照，必要时先从数据库回填 """
+        resync_seconds = current_app.config.get('PV_LATEST_CACHE_RESYNC_SECONDS', 30)
+        now = datetime.now()
+        if self._synced_at is None or (now - self._synced_at).total_seconds() >= resync_seconds:
+            self.resync()
+
+        with self._lock:
+            return dict(self._readings)
+
+    def resync(self):
+        """ 一次查询取出窗口期内每台设备的最新读数，与内存中更新的数据合并 """
+        window = current_app.config.get('PV_LATEST_CACHE_WINDOW_SECONDS', 300)
+        since = datetime.now() - timedelta(seconds=window)
+
+        latest = db.session.query(
+            PVGenerationData.device_id,
+            func.max(PVGenerationData.collect_time).label('max_time')
+        ).filter(PVGenerationData.collect_time >= since) \
+            .group_by(PVGenerationData.device_id).subquery()
+
+        records = db.session.query(PVGenerationData).join(
+            latest,
+            and_(PVGenerationData.device_id == latest.c.device_id,
+                 PVGenerationData.collect_time == latest.c.max_time)
+        ).all()
+
+        with self._lock:
+            for r in records:
+                self._put(r.device_id, r.collect_time, {f: getattr(r, f) for f in self.FIELDS})
+            self._synced_at = datetime.now()
+
+    def clear(self):
+        with self._lock:
+            self._readings = {}
+            self._synced_at = None
+
+
+class HistoryProfileCache:
+    """
+    光伏 7 天历史特征 (288 时间槽平均功率) 缓存
+    - 预测曲线 / 实时接口 / 模型状态 / 模型优化共用，TTL 内不再重复聚合
+    - 跨天或历史数据补传 (回填、重建汇总) 时显式失效
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._profiles = {}  # key -> (计算日期, 计算时间, profile)
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def get(self, key, loader):
+        """
+        :param key: 缓存键 (如并网点编号，None 表示全站)
+        :param loader: 未命中时调用的计算函数，返回 {slot: kW}
+        """
+        ttl = current_app.config.get('PV_HISTORY_CACHE_TTL_SECONDS', 300)
+        now = datetime.now()
+
+        with self._lock:
+            entry = self._profiles.get(key)
+            if entry is not None:
+                built_date, built_at, profile = entry
+                # 跨天后 7 天窗口整体滑动，即使未过期也重新计算
+                if built_date == now.date() and (now - built_at).total_seconds() < ttl:
+                    self._stats['hits'] += 1
+                    return profile
+            self._stats['misses'] += 1
+
+        profile = loader()
+        with self._lock:
+            self._profiles[key] = (now.date(), now, profile)
+        return profile
+
+    def invalidate(self, key=None):
+        """ 失效指定键，不传则全部失效 """
+        with self._lock:
+            if key is None:
+                self._profiles = {}
+            else:
+                self._profiles.pop(key, None)
+            self._stats['invalidations'] += 1
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data['entries'] = len(self._profiles)
+        total = data['hits'] + data['misses']
+        data['hit_rate'] = round(data['hits'] * 100.0 / total, 1) if total else 0.0
+        return data
+
+
+class RealtimeSnapshotCache:
+    """
+    光伏实时快照 (功率曲线 / 预测曲线 / 偏差率 / 当日发电量)
+    - 每个刷新周期 (PV_SNAPSHOT_TICK_SECONDS) 只计算一次，实时接口、模型状态、模型优化共用
+    - 计算在锁内进行，并发请求等待同一次计算结果而不是各算一遍
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshots = {}  # key -> (计算时间, snapshot)
+
+    def get(self, key, loader):
+        tick = current_app.config.get('PV_SNAPSHOT_TICK_SECONDS', 5)
+        with self._lock:
+            entry = self._snapshots.get(key)
+            now = datetime.now()
+            if entry is not None and (now - entry[0]).total_seconds() < tick:
+                return entry[1]
+
+            snapshot = loader()
+            self._snapshots[key] = (datetime.now(), snapshot)
+            return snapshot
+
+    def invalidate(self, key=None):
+        """ 预测系数变化等场景下立即失效，下次请求重新计算 """
+        with self._lock:
+            if key is None:
+                self._snapshots = {}
+            else:
+                self._snapshots.pop(key, None)
+
+
+# 进程内单例
+pv_latest_cache = PVLatestCache()
+history_profile_cache = HistoryProfileCache()
+realtime_snapshot_cache = RealtimeSnapshotCache()
@@ -0,0 +1,97 @@
+# app/services/pv_forecast_state.py
+import threading
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import func
+from app.extensions import db
+from app.models import PVForecastState
+
+
+class PVForecastStateStore:
+    """
+    光伏预测状态 (修正系数 / 模型版本 / 最近优化时间) 存取
+    - 按并网点持久化到 pv_forecast_state，重启不丢失，多个 worker 共享
+    - 进程内缓存全部状态；每隔 PV_FORECAST_STATE_CHECK_SECONDS 用一条
+      SUM(revision) 查询判断其它进程是否修改过，有变化才整表重新加载
+    """
+
+    DEFAULT_FACTOR = 1.0
+    DEFAULT_VERSION = 'v2.2-Unified'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states = {}  # grid_point_id (None=全站) -> dict
+        self._token = None
+        self._checked_at = None
+
+    @staticmethod
+    def _load_token():
+        return tuple(db.session.query(func.count(PVForecastState.state_id),
+                                      func.coalesce(func.sum(PVForecastState.revision), 0)).one())
+
+    def _refresh(self):
+        check_seconds = current_app.config.get('PV_FORECAST_STATE_CHECK_SECONDS', 5)
+        now = datetime.now()
+        if self._checked_at is not None and (now - self._checked_at).total_seconds() < check_seconds:
+            return
+
+        token = self._load_token()
+        if token != self._token:
+            states = {}
+            for r in PVForecastState.query.all():
+                states[r.grid_point_id] = self._to_dict(r)
+            with self._lock:
+                self._states = states
+                self._token = token
+        self._checked_at = now
+
+    def _to_dict(self, record):
+        return {
+            'factor': float(record.forecast_factor if record.forecast_factor is not None else self.DEFAULT_FACTOR),
+            'model_version': record.model_version or self.DEFAULT_VERSION,
+            'optimized_at': record.optimized_at
+        }
+
+    def get(self, grid_point_id=None):
+        """ 读取并网点 (None 为全站) 的预测状态，未优化过则返回默认值 """
+        self._refresh()
+        with self._lock:
+            state = self._states.get(grid_point_id)
+        if state is None:
+            return {'factor': self.DEFAULT_FACTOR, 'model_version': self.DEFAULT_VERSION, 'optimized_at': None}
+        return dict(state)
+
+    def save_factor(self, grid_point_id, factor, model_version=None):
+        """ 保存优化后的修正系数，立即对本进程生效，其它进程在下次检查时生效 """
+        if grid_point_id is None:
+            record = PVForecastState.query.filter(PVForecastState.grid_point_id.is_(None)).first()
+        else:
+            record = PVForecastState.query.filter_by(grid_point_id=grid_point_id).first()
+
+        if record is None:
+            record = PVForecastState(grid_point_id=grid_point_id, revision=1)
+            db.session.add(record)
+        else:
+            # 在数据库端自增，避免多个进程同时优化时互相覆盖
+            record.revision = PVForecastState.revision + 1
+
+        record.forecast_factor = factor
+        record.model_version = model_version or record.model_version or self.DEFAULT_VERSION
+        record.optimized_at = datetime.now()
+        db.session.commit()
+
+        with self._lock:
+            self._states[grid_point_id] = self._to_dict(record)
+        # 本进程的修改也会改变校验值，强制下次读取时重新核对
+        self._checked_at = None
+        return self.get(grid_point_id)
+
+    def clear(self):
+        with self._lock:
+            self._states = {}
+            self._token = None
+            self._checked_at = None
+
+
+# 进程内单例
+forecast_state_store = PVForecastStateStore()
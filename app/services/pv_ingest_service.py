@@ -0,0 +1,155 @@
+# app/services/pv_ingest_service.py
+import json
+import math
+from datetime import datetime
+from app.extensions import db
+from app.models import PVDevice, PVGenerationData
+from app.services.pv_cache import pv_latest_cache
+from app.services.write_buffer import write_buffer
+
+
+class PVIngestService:
+    """
+    光伏遥测数据接入服务
+    - 解析网关批量上报 (JSON 数组 / NDJSON)
+    - 一次遍历完成校验，整批交给写后缓冲，由后台线程多行 INSERT 入库
+    """
+
+    # 单批最大行数，超出由接口直接拒绝 (防止单个事务过大)
+    MAX_BATCH_SIZE = 5000
+
+    # 数值字段及缺省值 (与单条上传接口 upload_pv_data 保持一致)
+    NUMERIC_FIELDS = {
+        'string_voltage_v': 0,
+        'string_current_a': 0,
+        'inverter_eff_pct': 98.5,
+        'gen_kwh': 0
+    }
+
+    @staticmethod
+    def parse_payload(body, mimetype):
+        """
+        解析请求体，返回读数列表
+        支持: [{...}, {...}] / {"readings": [...]} / NDJSON (每行一个 JSON 对象)
+        """
+        if not body or not body.strip():
+            raise ValueError("请求体为空")
+
+        if mimetype in ('application/x-ndjson', 'application/jsonlines'):
+            readings = []
+            for line_no, line in enumerate(body.splitlines(), start=1):
+                if not line.strip():
+                    continue
+                try:
+                    readings.append(json.loads(line))
+                except ValueError:
+                    raise ValueError(f"第 {line_no} 行不是合法的 JSON")
+            return readings
+
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            raise ValueError("请求体不是合法的 JSON")
+
+        if isinstance(payload, dict):
+            payload = payload.get('readings')
+        if not isinstance(payload, list):
+            raise ValueError("请求体应为读数数组或 {\"readings\": [...]}")
+        return payload
+
+    @classmethod
+    def validate_readings(cls, readings):
+        """
+        一次遍历校验整批读数
+        :return: (rows, results)
+                 rows: 可直接用于 INSERT 的字典列表
+                 results: 与输入一一对应的逐行处理结果
+        """
+        # 1. 一次查询拿到本批涉及的全部设备 -> 并网点映射
+        device_ids = set()
+        for item in readings:
+            if isinstance(item, dict):
+                try:
+                    device_ids.add(int(item.get('device_id')))
+                except (TypeError, ValueError):
+                    pass
+
+        device_map = {}
+        if device_ids:
+            device_map = dict(
+                db.session.query(PVDevice.device_id, PVDevice.grid_point_id)
+                .filter(PVDevice.device_id.in_(device_ids)).all()
+            )
+
+        now = datetime.now()
+        rows, results = [], []
+
+        for idx, item in enumerate(readings):
+            reason = None
+            row = None
+
+            if not isinstance(item, dict):
+                reason = "读数格式错误"
+            else:
+                try:
+                    dev_id = int(item.get('device_id'))
+                except (TypeError, ValueError):
+                    dev_id = None
+
+                if dev_id is None:
+                    reason = "缺少 device_id"
+                elif dev_id not in device_map:
+                    reason = f"设备 {dev_id} 不存在"
+                else:
+                    row = {
+                        'device_id': dev_id,
+                        'grid_point_id': device_map[dev_id] or 1,
+                        'collect_time': now
+                    }
+
+                    # 网关补传的历史读数可携带采集时间
+                    if item.get('collect_time'):
+                        try:
+                            row['collect_time'] = datetime.fromisoformat(str(item['collect_time']))
+                        except ValueError:
+                            reason = "collect_time 格式错误"
+
+                    for field, default_val in cls.NUMERIC_FIELDS.items():
+                        if reason:
+                            break
+                        try:
+                            val = float(item.get(field, default_val))
+                        except (TypeError, ValueError):
+                            val = None
+                        if val is None or not math.isfinite(val):
+                            reason = f"{field} 不是合法数值"
+                        else:
+                            row[field] = val
+
+            if reason:
+                results.append({'index': idx, 'status': 'rejected', 'reason': reason})
+            else:
+                rows.append(row)
+                results.append({'index': idx, 'status': 'accepted'})
+
+        return rows, results
+
+    @classmethod
+    def ingest_batch(cls, readings):
+        """
+        校验一批读数并提交到写后缓冲 (缓冲关闭时同步多行 INSERT)
+        :return: 逐行处理结果列表
+        """
+        rows, results = cls.validate_readings(readings)
+
+        accepted = write_buffer.submit(PVGenerationData, rows)
+        pv_latest_cache.update(rows[:accepted])
+
+        # 队列已满被丢弃的行，回填为拒绝状态以便网关重传
+        if accepted < len(rows):
+            accepted_results = [r for r in results if r['status'] == 'accepted']
+            for r in accepted_results[accepted:]:
+                r['status'] = 'rejected'
+                r['reason'] = "写入队列已满，请稍后重试"
+
+        return results
@@ -0,0 +1,203 @@
+# app/services/pv_rollup_service.py
+from datetime import datetime, timedelta
+from sqlalchemy import func, extract, and_, or_
+from sqlalchemy.dialects import mysql, sqlite
+from app.extensions import db
+from app.models import PVGenerationData, PVSlotRollup
+from app.services.pv_cache import history_profile_cache
+
+
+class PVRollupService:
+    """
+    光伏 5 分钟时间槽汇总 (pv_slot_rollup) 维护与查询
+    - apply: 写入链路每批数据落库时增量累加 (由写后缓冲回调)
+    - rebuild: 按日期区间从原始数据重建 (历史数据导入后调用)
+    - 查询: 当日实时曲线、近 N 天历史特征、当日发电量
+    """
+
+    SLOTS_PER_DAY = 288
+
+    @staticmethod
+    def slot_of(dt):
+        return dt.hour * 12 + dt.minute // 5
+
+    @classmethod
+    def aggregate(cls, rows):
+        """ 将一批原始读数按 (日期, 时间槽, 设备) 聚合 """
+        buckets = {}
+        for row in rows:
+            ts = row['collect_time']
+            key = (ts.date(), cls.slot_of(ts), int(row['device_id']))
+            power = float(row.get('string_voltage_v') or 0) * float(row.get('string_current_a') or 0) / 1000.0
+            gen = float(row.get('gen_kwh') or 0)
+
+            b = buckets.get(key)
+            if b is None:
+                buckets[key] = {
+                    'slot_date': key[0],
+                    'slot_index': key[1],
+                    'device_id': key[2],
+                    'grid_point_id': row.get('grid_point_id'),
+                    'reading_cnt': 1,
+                    'power_sum_kw': power,
+                    'power_min_kw': power,
+                    'power_max_kw': power,
+                    'gen_kwh_sum': gen
+                }
+            else:
+                b['reading_cnt'] += 1
+                b['power_sum_kw'] += power
+                b['power_min_kw'] = min(b['power_min_kw'], power)
+                b['power_max_kw'] = max(b['power_max_kw'], power)
+                b['gen_kwh_sum'] += gen
+        return list(buckets.values())
+
+    @classmethod
+    def apply(cls, rows):
+        """
+        增量累加一批读数 (INSERT ... ON DUPLICATE KEY UPDATE)
+        与原始数据在同一事务内执行，由调用方负责提交
+        """
+        values = cls.aggregate(rows)
+        if not values:
+            return
+
+        table = PVSlotRollup.__table__
+        dialect = db.session.get_bind().dialect.name
+
+        if dialect == 'mysql':
+            stmt = mysql.insert(table)
+            new = stmt.inserted
+            stmt = stmt.on_duplicate_key_update(
+                reading_cnt=table.c.reading_cnt + new.reading_cnt,
+                power_sum_kw=table.c.power_sum_kw + new.power_sum_kw,
+                power_min_kw=func.least(table.c.power_min_kw, new.power_min_kw),
+                power_max_kw=func.greatest(table.c.power_max_kw, new.power_max_kw),
+                gen_kwh_sum=table.c.gen_kwh_sum + new.gen_kwh_sum
+            )
+        else:
+            # 本地 SQLite (压测/调试) 使用等价的 ON CONFLICT 语法
+            stmt = sqlite.insert(table)
+            new = stmt.excluded
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['slot_date', 'slot_index', 'device_id'],
+                set_=dict(
+                    reading_cnt=table.c.reading_cnt + new.reading_cnt,
+                    power_sum_kw=table.c.power_sum_kw + new.power_sum_kw,
+                    power_min_kw=func.min(table.c.power_min_kw, new.power_min_kw),
+                    power_max_kw=func.max(table.c.power_max_kw, new.power_max_kw),
+                    gen_kwh_sum=table.c.gen_kwh_sum + new.gen_kwh_sum
+                )
+            )
+
+        db.session.execute(stmt, values)
+
+        # 网关补传了往日数据，历史特征随之变化
+        today = datetime.now().date()
+        if any(v['slot_date'] < today for v in values):
+            history_profile_cache.invalidate()
+
+    @classmethod
+    def rebuild(cls, start_date, end_date):
+        """
+        从原始数据重建 [start_date, end_date] 区间的汇总 (含两端)
+        用于历史数据导入 / 首次上线时回填
+        """
+        start_dt = datetime.combine(start_date, datetime.min.time())
+        end_dt = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+
+        # 先删除 (加锁) 再读取原始数据: 写入钩子与原始数据同一事务，累加汇总前要等这把锁，
+        # 锁之前已提交的读数都在随后读取的快照里，之后提交的读数再累加到重建结果上
+        db.session.commit()
+        db.session.query(PVSlotRollup).filter(
+            PVSlotRollup.slot_date.between(start_date, end_date)
+        ).delete(synchronize_session=False)
+
+        power = PVGenerationData.string_voltage_v * PVGenerationData.string_current_a / 1000.0
+        slot = extract('hour', PVGenerationData.collect_time) * 12 + \
+            func.floor(extract('minute', PVGenerationData.collect_time) / 5)
+
+        stats = db.session.query(
+            func.date(PVGenerationData.collect_time).label('slot_date'),
+            slot.label('slot_index'),
+            PVGenerationData.device_id,
+            func.max(PVGenerationData.grid_point_id),
+            func.count(),
+            func.sum(power),
+            func.min(power),
+            func.max(power),
+            func.sum(PVGenerationData.gen_kwh)
+        ).filter(
+            PVGenerationData.collect_time >= start_dt,
+            PVGenerationData.collect_time < end_dt
+        ).group_by('slot_date', 'slot_index', PVGenerationData.device_id).all()
+
+        values = []
+        for d, s, dev, gp, cnt, p_sum, p_min, p_max, gen in stats:
+            if isinstance(d, str):
+                d = datetime.strptime(d, '%Y-%m-%d').date()
+            values.append({
+                'slot_date': d, 'slot_index': int(s), 'device_id': dev, 'grid_point_id': gp,
+                'reading_cnt': cnt, 'power_sum_kw': float(p_sum or 0),
+                'power_min_kw': float(p_min or 0), 'power_max_kw': float(p_max or 0),
+                'gen_kwh_sum': float(gen or 0)
+            })
+        if values:
+            db.session.execute(PVSlotRollup.__table__.insert(), values)
+        db.session.commit()
+        history_profile_cache.invalidate()
+        return len(values)
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _scope(query, grid_point_id):
+        if grid_point_id is not None:
+            query = query.filter(PVSlotRollup.grid_point_id == grid_point_id)
+        return query
+
+    @classmethod
+    def day_slot_averages(cls, day, grid_point_id=None):
+        """ 某日各时间槽的单条读数平均功率 {slot: kW} """
+        query = db.session.query(
+            PVSlotRollup.slot_index,
+            func.sum(PVSlotRollup.power_sum_kw) / func.sum(PVSlotRollup.reading_cnt)
+        ).filter(PVSlotRollup.slot_date == day)
+        stats = cls._scope(query, grid_point_id).group_by(PVSlotRollup.slot_index).all()
+        return {int(s): float(v or 0) for s, v in stats}
+
+    @classmethod
+    def history_slot_averages(cls, since, grid_point_id=None):
+        """ 自 since 起 (精确到时间槽) 各时间槽的单条读数平均功率 {slot: kW} """
+        since_date, since_slot = since.date(), cls.slot_of(since)
+        query = db.session.query(
+            PVSlotRollup.slot_index,
+            func.sum(PVSlotRollup.power_sum_kw) / func.sum(PVSlotRollup.reading_cnt)
+        ).filter(or_(
+            PVSlotRollup.slot_date > since_date,
+            and_(PVSlotRollup.slot_date == since_date, PVSlotRollup.slot_index >= since_slot)
+        ))
+        stats = cls._scope(query, grid_point_id).group_by(PVSlotRollup.slot_index).all()
+        return {int(s): float(v or 0) for s, v in stats}
+
+    @classmethod
+    def slot_average(cls, slot_index, start_date, end_date, grid_point_id=None):
+        """
+        [start_date, end_date) 日期窗口内某个时间槽的单条读数平均功率 (kW)
+        命中 (slot_date, slot_index, ...) 唯一索引的范围扫描，数据量与保留天数无关
+        """
+        query = db.session.query(
+            func.sum(PVSlotRollup.power_sum_kw) / func.sum(PVSlotRollup.reading_cnt)
+        ).filter(
+            PVSlotRollup.slot_date >= start_date,
+            PVSlotRollup.slot_date < end_date,
+            PVSlotRollup.slot_index == slot_index
+        )
+        return float(cls._scope(query, grid_point_id).scalar() or 0)
+
+    @classmethod
+    def day_energy(cls, day, grid_point_id=None):
+        """ 某日累计发电量 (kWh) """
+        query = db.session.query(func.sum(PVSlotRollup.gen_kwh_sum)).filter(PVSlotRollup.slot_date == day)
+        return float(cls._scope(query, grid_point_id).scalar() or 0)
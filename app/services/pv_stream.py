@@ -0,0 +1,185 @@
+# app/services/pv_stream.py
+import json
+import queue
+import threading
+from app.extensions import db
+
+
+class PVStreamHub:
+    """
+    光伏实时数据推送 (Server-Sent Events)
+    - 后台线程每个周期为每个被订阅的并网点计算一次快照，序列化一次后分发给所有订阅者
+    - 新订阅者先收到完整快照 (snapshot 事件)，之后只收到变化的字段和时间槽 (delta 事件)
+    - 订阅者消费过慢 (队列积压) 时丢弃积压事件，改发一次完整快照让其重新对齐
+    - 每个连接占用一个处理线程，连接数达到 max_clients 时拒绝新订阅 (调用方退回轮询接口)
+    数据库负载只与并网点数量相关，与打开的大屏数量无关
+    """
+
+    SERIES_FIELDS = ('chart_series', 'forecast_series')
+
+    def __init__(self, app=None):
+        self.app = None
+        self.tick_seconds = 5
+        self.heartbeat_seconds = 15
+        self.queue_size = 20
+        self.max_clients = 20
+
+        self._lock = threading.Lock()
+        self._worker_lock = threading.Lock()
+        self._subscribers = {}  # key -> set(queue)
+        self._loaders = {}      # key -> 快照计算函数
+        self._latest = {}       # key -> (version, snapshot)
+        self._worker = None
+        self._stop = threading.Event()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.tick_seconds = app.config.get('PV_STREAM_TICK_SECONDS', 5)
+        self.heartbeat_seconds = app.config.get('PV_STREAM_HEARTBEAT_SECONDS', 15)
+        self.queue_size = app.config.get('PV_STREAM_QUEUE_SIZE', 20)
+        self.max_clients = app.config.get('PV_STREAM_MAX_CLIENTS', 20)
+
+    # ------------------------------------------------------------------
+    # 订阅
+    # ------------------------------------------------------------------
+    def subscribe(self, key, loader):
+        """
+        在请求上下文中调用：注册订阅者并放入一份完整快照
+        :param key: 并网点编号 (None 为全站)
+        :param loader: 计算该并网点快照的函数
+        :return: 订阅者事件队列；连接数已达上限时返回 None
+        """
+        with self._lock:
+            if self._count() >= self.max_clients:
+                return None
+            self._loaders[key] = loader
+            has_latest = key in self._latest
+
+        if not has_latest:
+            snapshot = loader()
+            with self._lock:
+                self._latest.setdefault(key, (0, snapshot))
+
+        q = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            if self._count() >= self.max_clients:
+                return None  # 计算快照期间其他连接占满了名额
+            self._subscribers.setdefault(key, set()).add(q)
+            q.put_nowait(self._full_event(key))
+
+        self._ensure_worker()
+        return q
+
+    def unsubscribe(self, key, q):
+        with self._lock:
+            subscribers = self._subscribers.get(key)
+            if subscribers is not None:
+                subscribers.discard(q)
+                if not subscribers:
+                    # 无人订阅的并网点不再计算，下次订阅时重新取完整快照
+                    del self._subscribers[key]
+                    self._latest.pop(key, None)
+
+    def listen(self, key, q):
+        """ SSE 响应体生成器，空闲时定期发送注释行保活 """
+        try:
+            while True:
+                try:
+                    yield q.get(timeout=self.heartbeat_seconds)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+        finally:
+            self.unsubscribe(key, q)
+
+    def subscriber_count(self):
+        with self._lock:
+            return self._count()
+
+    def _count(self):
+        return sum(len(s) for s in self._subscribers.values())
+
+    # ------------------------------------------------------------------
+    # 周期计算与分发
+    # ------------------------------------------------------------------
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            with self._worker_lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._stop.clear()
+                    self._worker = threading.Thread(target=self._run, name='pv-stream', daemon=True)
+                    self._worker.start()
+
+    def _run(self):
+        while not self._stop.wait(self.tick_seconds):
+            with self._lock:
+                loaders = [(key, self._loaders[key]) for key, subs in self._subscribers.items() if subs]
+            if not loaders:
+                continue
+
+            with self.app.app_context():
+                for key, loader in loaders:
+                    try:
+                        snapshot = loader()
+                    except Exception as e:
+                        db.session.rollback()
+                        print(f"❌ 实时推送快照计算失败 (grid_point_id={key}): {e}")
+                        continue
+                    self._publish(key, snapshot)
+
+    def _publish(self, key, snapshot):
+        with self._lock:
+            if key not in self._latest:
+                return
+            version, previous = self._latest[key]
+            delta = self.diff(previous, snapshot)
+            if not delta:
+                return
+
+            version += 1
+            self._latest[key] = (version, snapshot)
+            delta['version'] = version
+            message = self._format('delta', version, delta)
+
+            for q in self._subscribers.get(key, ()):
+                try:
+                    q.put_nowait(message)
+                except queue.Full:
+                    self._resync(key, q)
+
+    def _resync(self, key, q):
+        while True:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                break
+        q.put_nowait(self._full_event(key))
+
+    def _full_event(self, key):
+        version, snapshot = self._latest[key]
+        return self._format('snapshot', version, dict(snapshot, version=version))
+
+    @classmethod
+    def diff(cls, previous, current):
+        """ 计算两份快照的差异: 标量字段整体比较，曲线只保留变化的时间槽 {slot: value} """
+        delta = {}
+        for field, value in current.items():
+            old = previous.get(field)
+            if field in cls.SERIES_FIELDS:
+                old = old or []
+                changed = {str(i): v for i, v in enumerate(value) if i >= len(old) or old[i] != v}
+                if changed:
+                    delta[field] = changed
+            elif old != value:
+                delta[field] = value
+        return delta
+
+    @staticmethod
+    def _format(event, version, payload):
+        return f"event: {event}\nid: {version}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+# 进程内单例，在 create_app 中通过 pv_stream_hub.init_app(app) 绑定
+pv_stream_hub = PVStreamHub()
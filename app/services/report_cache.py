@@ -0,0 +1,78 @@
+# app/services/report_cache.py
+import threading
+from datetime import datetime
+from flask import current_app
+
+
+class PeriodReportCache:
+    """
+    周期报表 (月 / 季度汇总) 结果缓存
+    - 键如 (报表名, 年, 周期类型, 周期值)，同时记录该报表覆盖的日期区间
+    - 日统计写入 (日统计计算 / 能耗数据落库 / 核实修正) 后按日期失效覆盖该日的报表
+    - 周期报表读月度立方体，其他进程 (peak_valley_job.py / 其他 worker) 的日统计增量和重算都会递增
+      立方体格子的 revision，通过 SUM(revision) 感知；REPORT_CACHE_TTL_SECONDS 只作兜底
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (开始日期, 结束日期, 计算时间, token, value)
+        self._generation = 0  # 每次失效递增，计算期间发生失效的结果不写入缓存
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    @staticmethod
+    def _token():
+        from app.services.energy_cube import EnergyCubeService  # energy_cube 依赖本模块，延迟导入
+        return EnergyCubeService.revision()
+
+    def get(self, key, start_date, end_date, loader):
+        """
+        :param start_date / end_date: 报表覆盖的日期区间 (含两端)，用于按日期失效
+        :param loader: 未命中时调用的计算函数
+        """
+        ttl = current_app.config.get('REPORT_CACHE_TTL_SECONDS', 300)
+        token = self._token()
+        now = datetime.now()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[3] == token and (now - entry[2]).total_seconds() < ttl:
+                self._stats['hits'] += 1
+                return entry[4]
+            self._stats['misses'] += 1
+            generation = self._generation
+
+        value = loader()
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = (start_date, end_date, now, token, value)
+        return value
+
+    def invalidate_dates(self, dates):
+        """ 失效覆盖任一日期的报表 """
+        dates = set(dates)
+        if not dates:
+            return
+        with self._lock:
+            stale = [key for key, (start, end, *_) in self._entries.items()
+                     if any(start <= d <= end for d in dates)]
+            for key in stale:
+                del self._entries[key]
+            self._generation += 1
+            if stale:
+                self._stats['invalidations'] += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._entries = {}
+            self._generation += 1
+            self._stats['invalidations'] += 1
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data['entries'] = len(self._entries)
+        return data
+
+
+# 进程内单例
+period_report_cache = PeriodReportCache()
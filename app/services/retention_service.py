@@ -0,0 +1,242 @@
+# app/services/retention_service.py
+from datetime import datetime, date, timedelta
+from flask import current_app
+from sqlalchemy import select, delete, func, text
+from app.extensions import db
+from app.models import CircuitData, TransformerData, PVGenerationData, EnergyData
+from app.services.archive_service import ArchiveService
+from app.services.config_cache import system_config
+
+
+class RetentionService:
+    """
+    遥测数据保留期管理 (circuit_data / transformer_data / pv_generation_data / energy_data)
+    - 保留天数读取 SystemConfig.data_retention_days，未配置时使用 Config.DATA_RETENTION_DAYS
+    - 已按天 RANGE 分区的 MySQL 表 (PARTITION BY RANGE (TO_DAYS(collect_time)))：
+      直接 DROP 过期分区，并预建未来 RETENTION_PARTITION_AHEAD_DAYS 天的分区
+      (docs/schema.sql 建的表未分区，由 retention_job.py --create-partitions 显式转换后才会走此模式；
+       其他分区方式的表按未分区处理)
+    - 未分区的表：按主键分批 DELETE 过期行，单批行数受 RETENTION_DELETE_BATCH 限制，避免长事务锁表
+    - RETENTION_REQUIRE_ARCHIVE 开启时只清理归档清单 (manifest) 中已有的日期:
+      这些日期在线表中残留的行 (归档后补传) 先合并进归档文件再删除；未归档的日期跳过，
+      含未归档日期的分区不删除。关闭后按保留期直接删除 (不保留冷数据的部署)
+    """
+
+    TABLES = [CircuitData, TransformerData, PVGenerationData, EnergyData]
+
+    @staticmethod
+    def retention_days():
+        default_days = current_app.config.get('DATA_RETENTION_DAYS', 365)
+        min_days = current_app.config.get('RETENTION_MIN_DAYS', 7)
+        days = system_config.get_int('data_retention_days', default_days)
+        # 防止误配置 (如 0) 清空全部数据
+        return max(days, min_days)
+
+    @classmethod
+    def cutoff(cls, today=None):
+        """ 早于该时间点的数据视为过期 (按整天对齐) """
+        today = today or date.today()
+        return datetime.combine(today - timedelta(days=cls.retention_days()), datetime.min.time())
+
+    # ------------------------------------------------------------------
+    # 分区 (仅 MySQL 且表已按天分区时生效)
+    # ------------------------------------------------------------------
+    @staticmethod
+    def partitions(table_name):
+        """
+        返回 [(分区名, 上界 TO_DAYS 值或 None 表示 MAXVALUE), ...]
+        未分区，或不是按 RANGE (TO_DAYS(collect_time)) 分区时返回 []
+        """
+        if db.engine.dialect.name != 'mysql':
+            return []
+        rows = db.session.execute(text(
+            "SELECT PARTITION_NAME, PARTITION_DESCRIPTION, PARTITION_METHOD, PARTITION_EXPRESSION "
+            "FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :t AND PARTITION_NAME IS NOT NULL "
+            "ORDER BY PARTITION_ORDINAL_POSITION"
+        ), {'t': table_name}).all()
+        by_day = all(method == 'RANGE' and (expr or '').replace('`', '').replace(' ', '').lower()
+                     == 'to_days(collect_time)' for _, _, method, expr in rows)
+        if not rows or not by_day:
+            return []
+        return [(name, None if desc == 'MAXVALUE' else int(desc)) for name, desc, _, _ in rows]
+
+    @staticmethod
+    def _to_days(d):
+        # 与 MySQL TO_DAYS() 一致 (0000-01-01 为第 1 天)
+        return d.toordinal() + 365
+
+    @classmethod
+    def _partition_plan(cls, parts, cutoff, today):
+        """ 计算需删除的过期分区与需预建的分区 """
+        cutoff_days = cls._to_days(cutoff.date())
+        expired = [name for name, upper in parts if upper is not None and upper <= cutoff_days]
+
+        existing = {upper for _, upper in parts if upper is not None}
+        ahead = current_app.config.get('RETENTION_PARTITION_AHEAD_DAYS', 7)
+        upcoming = []
+        for i in range(ahead + 1):
+            day = today + timedelta(days=i)
+            upper = cls._to_days(day + timedelta(days=1))
+            if upper not in existing and upper > max(existing, default=0):
+                upcoming.append((f"p{day.strftime('%Y%m%d')}", day + timedelta(days=1)))
+        return expired, upcoming
+
+    @classmethod
+    def partition_ddl(cls, model, today=None):
+        """
+        把未分区的表转换为按天 RANGE 分区的 DDL (retention_job.py --create-partitions 显式执行)
+        InnoDB 分区表不支持外键，且主键必须包含分区列: 先删除该表的外键，主键改为 (主键, collect_time)
+        保留期内每天一个分区，更早的数据放入 p_expired (下次执行保留策略时整体删除)
+        """
+        table = model.__tablename__
+        pk = model.__mapper__.primary_key[0].name
+        today = today or date.today()
+        cutoff = cls.cutoff(today).date()
+        ahead = current_app.config.get('RETENTION_PARTITION_AHEAD_DAYS', 7)
+
+        foreign_keys = [name for (name,) in db.session.execute(text(
+            "SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS "
+            "WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = :t"
+        ), {'t': table})]
+        defs = [f"PARTITION p_expired VALUES LESS THAN (TO_DAYS('{cutoff.isoformat()}'))"]
+        day = cutoff
+        while day <= today + timedelta(days=ahead):
+            defs.append(f"PARTITION p{day.strftime('%Y%m%d')} VALUES LESS THAN "
+                        f"(TO_DAYS('{(day + timedelta(days=1)).isoformat()}'))")
+            day += timedelta(days=1)
+        defs.append("PARTITION p_max VALUES LESS THAN MAXVALUE")
+
+        return [f"ALTER TABLE {table} DROP FOREIGN KEY {name}" for name in foreign_keys] + [
+            f"ALTER TABLE {table} MODIFY collect_time DATETIME NOT NULL, "
+            f"DROP PRIMARY KEY, ADD PRIMARY KEY ({pk}, collect_time)",
+            f"ALTER TABLE {table} PARTITION BY RANGE (TO_DAYS(collect_time)) ({', '.join(defs)})",
+        ]
+
+    # ------------------------------------------------------------------
+    # 执行
+    # ------------------------------------------------------------------
+    @staticmethod
+    def require_archive():
+        return current_app.config.get('RETENTION_REQUIRE_ARCHIVE', True)
+
+    @classmethod
+    def plan(cls, today=None):
+        """ 生成执行计划 (dry-run 直接展示该结果) """
+        today = today or date.today()
+        cutoff = cls.cutoff(today)
+        result = []
+        for model in cls.TABLES:
+            table = model.__tablename__
+            parts = cls.partitions(table)
+            item = {
+                'table': table,
+                'cutoff': cutoff,
+                'mode': 'partition' if parts else 'delete',
+                'expired_rows': db.session.query(func.count()).select_from(model)
+                .filter(model.collect_time < cutoff).scalar(),
+                'expired_partitions': [],
+                'new_partitions': [],
+                'unarchived_days': [],
+                'kept_partitions': []
+            }
+            if cls.require_archive():
+                archived = set(ArchiveService.archived_days(model))
+                item['unarchived_days'] = [d for d in ArchiveService.pending_days(model, cutoff.date())
+                                           if d not in archived]
+            if parts:
+                item['expired_partitions'], item['new_partitions'] = cls._partition_plan(parts, cutoff, today)
+                if item['unarchived_days']:
+                    # 含未归档数据的过期分区整体保留，等归档后再删除
+                    unarchived = set(item['unarchived_days'])
+                    item['kept_partitions'] = [name for name in item['expired_partitions']
+                                               if unarchived & set(cls._partition_days(table, name))]
+                    item['expired_partitions'] = [name for name in item['expired_partitions']
+                                                  if name not in item['kept_partitions']]
+            result.append(item)
+        return result
+
+    @staticmethod
+    def _partition_days(table, name):
+        """ 分区内有数据的日期 """
+        return [d for (d,) in db.session.execute(
+            text(f"SELECT DISTINCT DATE(collect_time) FROM {table} PARTITION ({name})"))]
+
+    @classmethod
+    def run(cls, dry_run=False, today=None):
+        """
+        执行保留策略，返回执行计划 (含实际删除行数 deleted_rows)
+        分区模式下 deleted_rows 为被删除分区内的行数；跨越截止时间的分区不删除，其中的过期行不计入
+        """
+        items = cls.plan(today)
+        if dry_run:
+            return items
+
+        batch = current_app.config.get('RETENTION_DELETE_BATCH', 5000)
+        for item, model in zip(items, cls.TABLES):
+            if item['mode'] == 'partition':
+                item['deleted_rows'] = cls._apply_partitions(model, item)
+            elif cls.require_archive():
+                item['deleted_rows'] = cls.purge_archived(model, item['cutoff'], item['unarchived_days'])
+            else:
+                item['deleted_rows'] = cls.purge_before(model, item['cutoff'], batch)
+        return items
+
+    @classmethod
+    def _apply_partitions(cls, model, item):
+        """ 删除过期分区并预建新分区，返回被删除分区内的行数 """
+        table = item['table']
+        dropped = 0
+        if item['expired_partitions']:
+            names = ', '.join(item['expired_partitions'])
+            dropped = db.session.execute(text(f"SELECT COUNT(*) FROM {table} PARTITION ({names})")).scalar()
+            if cls.require_archive():
+                # 已归档日期中残留的行 (归档后补传) 先合并进归档文件
+                for name in item['expired_partitions']:
+                    for day in cls._partition_days(table, name):
+                        ArchiveService.archive_day(model, day)
+            db.session.execute(text(f"ALTER TABLE {table} DROP PARTITION {names}"))
+
+        if item['new_partitions']:
+            defs = ', '.join(f"PARTITION {name} VALUES LESS THAN (TO_DAYS('{upper.isoformat()}'))"
+                             for name, upper in item['new_partitions'])
+            parts = cls.partitions(table)
+            if parts and parts[-1][1] is None:
+                # 末尾是 MAXVALUE 兜底分区时，需要从兜底分区中拆出新分区
+                tail = parts[-1][0]
+                db.session.execute(text(
+                    f"ALTER TABLE {table} REORGANIZE PARTITION {tail} INTO "
+                    f"({defs}, PARTITION {tail} VALUES LESS THAN MAXVALUE)"
+                ))
+            else:
+                db.session.execute(text(f"ALTER TABLE {table} ADD PARTITION ({defs})"))
+        db.session.commit()
+        return dropped
+
+    @staticmethod
+    def purge_archived(model, cutoff, unarchived_days):
+        """
+        只清理已归档日期的过期行: 先合并进归档文件 (ArchiveService.archive_day 与原文件去重合并) 再删除，
+        未归档的日期跳过，返回删除行数
+        """
+        skip = set(unarchived_days)
+        return sum(ArchiveService.archive_day(model, day)
+                   for day in ArchiveService.pending_days(model, cutoff.date()) if day not in skip)
+
+    @staticmethod
+    def purge_before(model, cutoff, batch):
+        """ 按主键分批删除 collect_time < cutoff 的行，每批独立提交 """
+        pk = model.__mapper__.primary_key[0]
+        total = 0
+        while True:
+            ids = db.session.execute(
+                select(pk).where(model.collect_time < cutoff).limit(batch)
+            ).scalars().all()
+            if not ids:
+                break
+            db.session.execute(delete(model).where(pk.in_(ids)))
+            db.session.commit()
+            total += len(ids)
+            if len(ids) < batch:
+                break
+        return total
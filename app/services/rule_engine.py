@@ -0,0 +1,204 @@
+# app/services/rule_engine.py
+import threading
+import time
+import numpy as np
+from flask import current_app
+from app.extensions import db
+from app.models import TransformerData, CircuitData, PVGenerationData, PowerRoom, PVDevice, EquipmentLedger
+from app.services.alarm_service import AlarmService
+from app.services.config_cache import system_config
+
+
+class ThresholdRule:
+    """ 编译后的单条阈值规则 """
+
+    def __init__(self, name, model, field, op, threshold, entity, label, unit, level='高', room_filter=None):
+        self.name = name
+        self.model = model
+        self.field = field
+        self.op = op
+        self.threshold = float(threshold)
+        self.entity = entity            # 行中标识设备的字段 (transformer_code / circuit_code / device_id)
+        self.label = label
+        self.unit = unit
+        self.level = level
+        self.room_filter = room_filter  # 仅对这些配电房生效 (None 表示不限)
+
+    @property
+    def alarm_type(self):
+        # 与原仿真终端的触发阈值写法一致 (如 '>85℃')，存入告警的 trigger_thresh；去重按规则名，不受阈值修改影响
+        return f"{self.op}{self.threshold:g}{self.unit}"
+
+    def violations(self, values):
+        """ values: 该字段的一维数组 (缺失为 NaN)，返回越限掩码 """
+        with np.errstate(invalid='ignore'):
+            return values > self.threshold if self.op == '>' else values < self.threshold
+
+
+class ThresholdRuleEngine:
+    """
+    遥测阈值规则引擎
+    - 规则定义见 RULES，阈值优先读取 SystemConfig，未配置时使用 Config
+    - 编译后的规则与设备 → 台账映射缓存在内存中，system_config 版本变化 (参数被修改) 时立即重新编译，
+      另每 RULE_ENGINE_RELOAD_SECONDS 秒重新编译一次，感知新增设备
+    - 每批落库数据按字段向量化判定，同一设备同一规则每批只取最严重的一条，经 AlarmService 幂等建单
+    """
+
+    # (规则名, 模型, 字段, 比较符, SystemConfig 键, Config 键, 默认值, 设备字段, 告警描述, 单位)
+    RULES = [
+        ('transformer_temp_high', TransformerData, 'winding_temp_c', '>', 'transformer_temp_high', None, 85.0,
+         'transformer_code', '绕组温度过高', '℃'),
+        ('circuit_overload_amp', CircuitData, 'current_a', '>', 'circuit_overload_amp', None, 400.0,
+         'circuit_code', '回路电流过载', 'A'),
+        ('VOLTAGE_LIMIT_35KV', CircuitData, 'voltage_kv', '>', 'voltage_limit_35kv', 'VOLTAGE_LIMIT_35KV', 37.0,
+         'circuit_code', '35KV回路电压越限', 'kV'),
+        ('INVERTER_EFFICIENCY_MIN', PVGenerationData, 'inverter_eff_pct', '<', 'inverter_efficiency_min',
+         'INVERTER_EFFICIENCY_MIN', 85.0, 'device_id', '逆变器效率偏低', '%'),
+    ]
+
+    def __init__(self, app=None):
+        self.reload_seconds = 30
+        self._lock = threading.Lock()
+        self._compiled = None
+        self._compiled_at = 0.0
+        self._stats = {'rows': 0, 'violations': 0, 'alarms': 0, 'reloads': 0}
+        self._listener_fns = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.reload_seconds = app.config.get('RULE_ENGINE_RELOAD_SECONDS', 30)
+
+    # ------------------------------------------------------------------
+    # 编译
+    # ------------------------------------------------------------------
+    def compile(self):
+        """ 一次读取全部阈值配置和设备映射，生成 {模型: [规则]} """
+        config_version = system_config.current_version()
+
+        rooms_35kv = {room_id for room_id, level in db.session.query(PowerRoom.power_room_id, PowerRoom.voltage_level)
+                      if level and '35' in level}
+
+        rules = {}
+        for name, model, field, op, conf_key, cfg_key, default, entity, label, unit in self.RULES:
+            threshold = current_app.config.get(cfg_key, default) if cfg_key else default
+            threshold = system_config.get_float(conf_key, threshold)
+            rule = ThresholdRule(name, model, field, op, threshold, entity, label, unit,
+                                 room_filter=rooms_35kv if name == 'VOLTAGE_LIMIT_35KV' else None)
+            rules.setdefault(model, []).append(rule)
+
+        ledger = dict(db.session.query(EquipmentLedger.equipment_code, EquipmentLedger.equipment_id).all())
+        device_ledger = {
+            device_id: ledger[code]
+            for device_id, code in db.session.query(PVDevice.device_id, PVDevice.device_code)
+            if code in ledger
+        }
+        return {'rules': rules, 'ledger': ledger, 'device_ledger': device_ledger, 'config_version': config_version}
+
+    def compiled(self):
+        now = time.monotonic()
+        config_version = system_config.current_version()
+        with self._lock:
+            if self._compiled is not None and now - self._compiled_at < self.reload_seconds \
+                    and self._compiled['config_version'] == config_version:
+                return self._compiled
+        compiled = self.compile()
+        with self._lock:
+            self._compiled, self._compiled_at = compiled, now
+            self._stats['reloads'] += 1
+        return compiled
+
+    def invalidate(self):
+        with self._lock:
+            self._compiled = None
+
+    def thresholds(self):
+        """ 当前生效的阈值 {规则名: 阈值} (监控页面 / 调试使用) """
+        return {rule.name: rule.threshold for rules in self.compiled()['rules'].values() for rule in rules}
+
+    # ------------------------------------------------------------------
+    # 判定
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _column(rows, field):
+        return np.array([np.nan if row.get(field) is None else float(row[field]) for row in rows], dtype=np.float64)
+
+    def _equipment_id(self, compiled, rule, row):
+        key = row.get(rule.entity)
+        if rule.entity == 'device_id':
+            return compiled['device_ledger'].get(int(key)) if key is not None else None
+        return compiled['ledger'].get(key)
+
+    def evaluate(self, model, rows):
+        """
+        判定一批读数，返回越限列表 [(规则, 台账设备ID, 行)]
+        同一设备同一规则只保留最严重的一条
+        """
+        compiled = self.compiled()
+        rules = compiled['rules'].get(model)
+        if not rules or not rows:
+            return []
+
+        columns = {}
+        worst = {}
+        for rule in rules:
+            values = columns.get(rule.field)
+            if values is None:
+                values = columns[rule.field] = self._column(rows, rule.field)
+            mask = rule.violations(values)
+            if rule.room_filter is not None:
+                rooms = columns.get('power_room_id')
+                if rooms is None:
+                    rooms = columns['power_room_id'] = self._column(rows, 'power_room_id')
+                mask &= np.isin(rooms, list(rule.room_filter))
+
+            for i in np.flatnonzero(mask):
+                row = rows[i]
+                equipment_id = self._equipment_id(compiled, rule, row)
+                if equipment_id is None:
+                    continue
+                key = (rule.name, equipment_id)
+                severity = values[i] if rule.op == '>' else -values[i]
+                if key not in worst or severity > worst[key][0]:
+                    worst[key] = (severity, rule, equipment_id, row)
+
+        with self._lock:
+            self._stats['rows'] += len(rows)
+            self._stats['violations'] += len(worst)
+        return [(rule, equipment_id, row) for _, rule, equipment_id, row in worst.values()]
+
+    def process(self, model, rows):
+        """ 判定并为越限设备建立告警 (write_buffer 提交监听入口) """
+        created = 0
+        for rule, equipment_id, row in self.evaluate(model, rows):
+            value = float(row[rule.field])
+            content = f"{row.get(rule.entity)} {rule.label} ({round(value, 1)}{rule.unit})"
+            alarm, _ = AlarmService.create_alarm(equipment_id=equipment_id, content=content, level=rule.level,
+                                                 alarm_type=rule.alarm_type, rule_name=rule.name)
+            if alarm:
+                created += 1
+                current_app.logger.warning("自动告警: %s", content)
+        if created:
+            with self._lock:
+                self._stats['alarms'] += created
+        return created
+
+    def listener(self, model):
+        """ write_buffer.register_listener 使用的回调 (每个模型复用同一个函数，重复注册会被忽略) """
+        fn = self._listener_fns.get(model)
+        if fn is None:
+            def fn(rows):
+                self.process(model, rows)
+            self._listener_fns[model] = fn
+        return fn
+
+    def models(self):
+        return list(dict.fromkeys(r[1] for r in self.RULES))
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+# 进程内单例，在 create_app 中通过 rule_engine.init_app(app) 绑定
+rule_engine = ThresholdRuleEngine()
@@ -0,0 +1,225 @@
+# app/services/tariff_calendar.py
+import json
+import threading
+from datetime import date
+import numpy as np
+from app.services.config_cache import system_config
+
+# 时段编码与 PERIODS 下标一致
+PERIODS = ('sharp', 'peak', 'flat', 'valley')
+SHARP, PEAK, FLAT, VALLEY = range(4)
+MINUTES_PER_DAY = 24 * 60
+
+# 内置默认时段 (小时) 与单价，未配置 tariff_calendar 时使用
+DEFAULT_HOURS = {
+    'sharp': [10, 11, 16, 17],
+    'peak': [8, 9, 12, 13, 14, 15, 18, 19, 20, 21],
+    'flat': [6, 7, 22, 23],
+    'valley': [0, 1, 2, 3, 4, 5],
+}
+DEFAULT_PRICES = {
+    'electric': {'sharp': 1.5, 'peak': 1.2, 'flat': 0.8, 'valley': 0.4},  # 电力的单价
+    'water': {'sharp': 0.8, 'peak': 0.7, 'flat': 0.5, 'valley': 0.3},  # 水的单价
+    'gas': {'sharp': 2.0, 'peak': 1.8, 'flat': 1.0, 'valley': 0.5},  # 天然气的单价
+    'steam': {'sharp': 2.5, 'peak': 2.2, 'flat': 1.5, 'valley': 1.0},  # 蒸汽的单价
+}
+
+
+def _parse_minute(text):
+    hour, minute = (int(x) for x in text.strip().split(':'))
+    if not (0 <= hour <= 24 and 0 <= minute < 60) or (hour == 24 and minute):
+        raise ValueError(f"时间格式错误: {text}")
+    return hour * 60 + minute
+
+
+def parse_ranges(spec):
+    """
+    '09:00-11:30,22:00-06:00' 或 ['09:00-11:30', ...] → [(起始分钟, 结束分钟)]
+    结束时间小于起始时间表示跨零点
+    """
+    if isinstance(spec, str):
+        spec = [s for s in spec.split(',') if s.strip()]
+    ranges = []
+    for item in spec:
+        start, end = item.split('-')
+        ranges.append((_parse_minute(start), _parse_minute(end)))
+    return ranges
+
+
+def _paint(row, ranges, code):
+    for start, end in ranges:
+        if start <= end:
+            row[start:end] = code
+        else:
+            row[start:] = code
+            row[:end] = code
+
+
+class TariffCalendar:
+    """
+    编译后的分时电价日历
+    - table: (日程数 × 1440) 的时段编码查找表，一天中每分钟属于哪个时段
+    - 每个日期按 月份 → 季节 → 工作日 / 节假日 选出日程
+    - classify() 对整组时间戳一次向量化分类，不做逐条 hour in list 判定
+
+    tariff_calendar (SystemConfig, JSON，全部字段可选):
+    {
+      "schedules": {"summer": {"sharp": ["10:00-11:30"], "peak": [...], "flat": [...]}, ...},  // 未列出的分钟为谷
+      "seasons": [{"months": [7, 8, 9], "workday": "summer", "holiday": "offday"}],          // 未覆盖的月份用 default
+      "weekend": [5, 6],                       // 按节假日日程计价的星期 (0=周一)，默认不区分
+      "holidays": ["2026-10-01"], "workdays": ["2026-10-10"],   // 法定节假日 / 调休上班
+      "prices": {"electric": {"sharp": 1.5, ...}},             // 覆盖内置单价
+      "plant_prices": {"1": {"electric": {"peak": 1.1}}}       // 按厂区覆盖单价
+    }
+    日程 default 为内置时段，并叠加系统参数 peak_hours (尖段仍为尖段，其余分钟按峰段)
+    """
+
+    def __init__(self, raw=None, peak_hours=None):
+        raw = raw or {}
+        if not isinstance(raw, dict):
+            raise ValueError('tariff_calendar 必须是 JSON 对象')
+
+        # 1. 日程 → 查找表
+        schedules = {'default': self._default_schedule(peak_hours)}
+        for name, spec in (raw.get('schedules') or {}).items():
+            schedules[name] = self._build_schedule(spec)
+        self.names = list(schedules)
+        self.table = np.stack([schedules[name] for name in self.names])
+        index = {name: i for i, name in enumerate(self.names)}
+
+        # 2. 月份 → 工作日 / 节假日日程 (下标 1..12)
+        self.month_workday = np.zeros(13, dtype=np.int16)
+        self.month_holiday = np.zeros(13, dtype=np.int16)
+        for season in raw.get('seasons') or []:
+            workday = index[season.get('workday', 'default')]
+            holiday = index[season.get('holiday', season.get('workday', 'default'))]
+            for month in season['months']:
+                if not 1 <= int(month) <= 12:
+                    raise ValueError(f"月份错误: {month}")
+                self.month_workday[int(month)] = workday
+                self.month_holiday[int(month)] = holiday
+
+        self.weekend = np.array([int(d) for d in raw.get('weekend') or []], dtype=np.int64)
+        self.holidays = np.array([date.fromisoformat(d) for d in raw.get('holidays') or []], dtype='datetime64[D]')
+        self.workdays = np.array([date.fromisoformat(d) for d in raw.get('workdays') or []], dtype='datetime64[D]')
+
+        # 3. 单价: 厂区覆盖 > 日历覆盖 > 内置
+        self.prices = {etype: dict(p) for etype, p in DEFAULT_PRICES.items()}
+        for etype, p in (raw.get('prices') or {}).items():
+            self.prices.setdefault(etype, {}).update({k: float(v) for k, v in p.items()})
+        self.plant_prices = {
+            int(plant_id): {etype: {k: float(v) for k, v in p.items()} for etype, p in by_type.items()}
+            for plant_id, by_type in (raw.get('plant_prices') or {}).items()
+        }
+
+    @staticmethod
+    def _default_schedule(peak_hours):
+        row = np.full(MINUTES_PER_DAY, VALLEY, dtype=np.int8)
+        for code, period in ((FLAT, 'flat'), (PEAK, 'peak'), (SHARP, 'sharp')):
+            for hour in DEFAULT_HOURS[period]:
+                row[hour * 60:(hour + 1) * 60] = code
+        if peak_hours:
+            extra = np.full(MINUTES_PER_DAY, VALLEY, dtype=np.int8)
+            _paint(extra, parse_ranges(peak_hours), PEAK)
+            row = np.minimum(row, extra)
+        return row
+
+    @staticmethod
+    def _build_schedule(spec):
+        unknown = set(spec) - set(PERIODS)
+        if unknown:
+            raise ValueError(f"未知时段: {', '.join(sorted(unknown))}")
+        row = np.full(MINUTES_PER_DAY, VALLEY, dtype=np.int8)
+        # 优先级: 尖 > 峰 > 平 > 谷，后绘制的覆盖先绘制的
+        for code, period in ((FLAT, 'flat'), (PEAK, 'peak'), (SHARP, 'sharp')):
+            _paint(row, parse_ranges(spec.get(period) or []), code)
+        return row
+
+    # ------------------------------------------------------------------
+    # 分类
+    # ------------------------------------------------------------------
+    def day_schedules(self, days):
+        """ days: datetime64[D] 数组 → 每天使用的日程下标 """
+        days = np.asarray(days, dtype='datetime64[D]')
+        months = days.astype('datetime64[M]').astype(np.int64) % 12 + 1
+        holiday = np.zeros(days.shape, dtype=bool)
+        if self.weekend.size:
+            # 1970-01-01 为周四
+            holiday |= np.isin((days.astype(np.int64) + 3) % 7, self.weekend)
+        if self.holidays.size:
+            holiday |= np.isin(days, self.holidays)
+        if self.workdays.size:
+            holiday &= ~np.isin(days, self.workdays)
+        return np.where(holiday, self.month_holiday[months], self.month_workday[months])
+
+    def day_table(self, stat_date):
+        """ 某一天的 1440 分钟时段编码 """
+        return self.table[self.day_schedules(np.array([stat_date], dtype='datetime64[D]'))[0]]
+
+    def classify(self, timestamps):
+        """ 时间戳 (datetime 列表或 datetime64 数组) → 时段编码数组 (PERIODS 下标) """
+        ts = np.asarray(timestamps, dtype='datetime64[m]')
+        days = ts.astype('datetime64[D]')
+        minutes = (ts - days).astype(np.int64)
+        return self.table[self.day_schedules(days), minutes]
+
+    def bucket_sums(self, timestamps, values):
+        """ 按时段汇总: {'sharp': x, 'peak': x, 'flat': x, 'valley': x} """
+        if len(timestamps) == 0:
+            return dict.fromkeys(PERIODS, 0.0)
+        sums = np.bincount(self.classify(timestamps), weights=np.asarray(values, dtype=np.float64),
+                           minlength=len(PERIODS))
+        return {period: float(sums[i]) for i, period in enumerate(PERIODS)}
+
+    def price_map(self, plant_id, energy_type):
+        prices = dict(self.prices.get(energy_type, {}))
+        prices.update(self.plant_prices.get(plant_id, {}).get(energy_type, {}))
+        return prices
+
+
+class TariffCalendarCache:
+    """
+    分时电价日历进程内缓存
+    system_config 版本变化 (tariff_calendar / peak_hours 被修改) 时重新编译；配置无效时沿用内置日历
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calendar = None
+        self._version = None
+
+    @staticmethod
+    def parse(text, peak_hours=None):
+        """ 解析并编译，配置有误时抛出 ValueError (管理后台保存前校验) """
+        try:
+            raw = json.loads(text) if text else {}
+            return TariffCalendar(raw, peak_hours)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"分时电价日历配置错误: {e}")
+
+    def get(self):
+        version = system_config.current_version()
+        with self._lock:
+            if self._calendar is not None and self._version == version:
+                return self._calendar
+
+        peak_hours = system_config.get_str('peak_hours')
+        try:
+            calendar = self.parse(system_config.get_str('tariff_calendar'), peak_hours)
+        except ValueError as e:
+            print(f"⚠️ {e}，使用内置日历")
+            try:
+                calendar = self.parse(None, peak_hours)
+            except ValueError:
+                calendar = TariffCalendar()
+        with self._lock:
+            self._calendar, self._version = calendar, version
+        return calendar
+
+    def invalidate(self):
+        with self._lock:
+            self._calendar = None
+
+
+# 进程内单例
+tariff_calendar = TariffCalendarCache()
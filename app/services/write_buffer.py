@@ -0,0 +1,314 @@
+# app/services/write_buffer.py
+import atexit
+import queue
+import threading
+import time
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from app.extensions import db
+
+
+class WriteBehindBuffer:
+    """
+    遥测数据写后缓冲 (write-behind)
+    - 接入方 (上传接口 / 仿真脚本 / 能耗服务) 只负责入队，立即返回
+    - 后台线程按 "行数达到阈值 或 时间间隔到期" 触发，按模型分组批量 INSERT
+    - 队列满时阻塞等待 put_timeout 秒 (背压)，仍无空位则丢弃并计数
+    - 每个模型的原始数据与其写入钩子 (汇总表增量) 在同一事务中提交，重算任务看到原始数据时增量必然已落库
+    - 数据库暂不可用 (OperationalError) 时整批进入重试队列，间隔 retry_delay 秒重试，最多 max_retries 次
+    - 其它失败 (坏数据 / 钩子处理某行出错) 二分拆批重写，只丢弃无法写入的单行并打印日志、计数
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = True
+        self.max_size = 50000
+        self.flush_rows = 1000
+        self.flush_interval = 1.0
+        self.put_timeout = 0.5
+        self.max_retries = 5
+        self.retry_delay = 5.0
+
+        self._queue = queue.Queue(maxsize=self.max_size)
+        self._flush_lock = threading.Lock()
+        self._worker_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._worker = None
+        self._stop = threading.Event()
+        self._stats = self._empty_stats()
+        self._atexit_registered = False
+        self._hooks = {}
+        self._listeners = {}
+        self._retries = []  # [(到期时间, 已重试次数, model, rows)]
+
+        if app is not None:
+            self.init_app(app)
+
+    @staticmethod
+    def _empty_stats():
+        return {
+            'enqueued_rows': 0,
+            'flushed_rows': 0,
+            'dropped_rows': 0,
+            'failed_rows': 0,
+            'retried_count': 0,
+            'flush_count': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0
+        }
+
+    def init_app(self, app):
+        """ 从 app.config 读取缓冲参数 (与 db.init_app 一样在工厂函数中调用) """
+        self.app = app
+        self.enabled = app.config.get('WRITE_BUFFER_ENABLED', True)
+        self.max_size = app.config.get('WRITE_BUFFER_MAX_SIZE', 50000)
+        self.flush_rows = app.config.get('WRITE_BUFFER_FLUSH_ROWS', 1000)
+        self.flush_interval = app.config.get('WRITE_BUFFER_FLUSH_INTERVAL', 1.0)
+        self.put_timeout = app.config.get('WRITE_BUFFER_PUT_TIMEOUT', 0.5)
+        self.max_retries = app.config.get('WRITE_BUFFER_MAX_RETRIES', 5)
+        self.retry_delay = app.config.get('WRITE_BUFFER_RETRY_DELAY', 5.0)
+
+        if self._queue.empty():
+            self._queue = queue.Queue(maxsize=self.max_size)
+
+        if not self._atexit_registered:
+            atexit.register(self.shutdown)
+            self._atexit_registered = True
+
+    def register_hook(self, model, fn):
+        """
+        注册写入钩子: fn(rows) 与该模型的原始数据 INSERT 在同一事务中执行，由本缓冲负责提交
+        用于维护汇总表等派生数据；钩子抛出异常时整批回滚，按上述规则重试或拆批
+        """
+        hooks = self._hooks.setdefault(model, [])
+        if fn not in hooks:
+            hooks.append(fn)
+
+    def register_listener(self, model, fn):
+        """
+        注册提交监听: fn(rows) 在该模型的批次成功提交之后调用
+        用于告警判定等有独立副作用的下游处理 (监听失败不影响已落库的数据)
+        """
+        listeners = self._listeners.setdefault(model, [])
+        if fn not in listeners:
+            listeners.append(fn)
+
+    # ------------------------------------------------------------------
+    # 入队
+    # ------------------------------------------------------------------
+    def submit(self, model, rows):
+        """
+        提交一批待写入的行
+        :param model: 目标模型类 (PVGenerationData / CircuitData / TransformerData / EnergyData)
+        :param rows: 字段字典列表
+        :return: 成功入队 (或已同步写入) 的行数，其余行因队列已满被丢弃
+        """
+        if not rows:
+            return 0
+
+        # 未启用缓冲时退化为同步批量写入
+        if not self.enabled:
+            self._write_now({model: list(rows)})
+            return len(rows)
+
+        self._ensure_worker()
+
+        accepted = 0
+        for row in rows:
+            try:
+                self._queue.put((model, row), timeout=self.put_timeout)
+                accepted += 1
+            except queue.Full:
+                break
+
+        with self._stats_lock:
+            self._stats['enqueued_rows'] += accepted
+            self._stats['dropped_rows'] += len(rows) - accepted
+
+        if accepted < len(rows):
+            print(f"⚠️ 写入缓冲区已满，丢弃 {len(rows) - accepted} 行 {model.__tablename__} 数据")
+        return accepted
+
+    def submit_batch(self, batch):
+        """
+        提交多个模型的一批数据 {model: rows}
+        未启用缓冲时在同一事务内一次写入，启用时逐模型入队 (由后台线程合并刷写)
+        """
+        batch = {model: list(rows) for model, rows in batch.items() if rows}
+        if not batch:
+            return 0
+        if not self.enabled:
+            self._write_now(batch)
+            return sum(len(rows) for rows in batch.values())
+        return sum(self.submit(model, rows) for model, rows in batch.items())
+
+    def _write_now(self, batch):
+        """ 同步写入 (未启用缓冲)，顺带执行已到期的重试 """
+        with self._flush_lock:
+            self._write(batch)
+            self._run_retries()
+
+    def _ensure_worker(self):
+        # 延迟到首次入队时才启动线程，避免 gunicorn fork 之前就创建线程
+        if self._worker is None or not self._worker.is_alive():
+            with self._worker_lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._stop.clear()
+                    self._worker = threading.Thread(target=self._run, name='write-behind', daemon=True)
+                    self._worker.start()
+
+    # ------------------------------------------------------------------
+    # 后台刷写
+    # ------------------------------------------------------------------
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            with self._flush_lock:
+                if batch:
+                    self._write(batch)
+                self._run_retries()
+            if batch:
+                self._mark_done(batch)
+
+    def _collect(self):
+        """ 收集一批数据：行数达到 flush_rows 或等待超过 flush_interval 即返回 """
+        batch, count = {}, 0
+        deadline = time.monotonic() + self.flush_interval
+
+        while count < self.flush_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                model, row = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.setdefault(model, []).append(row)
+            count += 1
+
+        return batch
+
+    def _drain(self):
+        batch = {}
+        while True:
+            try:
+                model, row = self._queue.get_nowait()
+            except queue.Empty:
+                return batch
+            batch.setdefault(model, []).append(row)
+
+    def _mark_done(self, batch):
+        for _ in range(sum(len(rows) for rows in batch.values())):
+            self._queue.task_done()
+
+    def _write(self, batch, attempt=0):
+        """ 按模型逐个写入 (某张表的坏数据不拖累其它表)，再对已提交的行调用提交监听 """
+        start = time.perf_counter()
+        committed = {}
+
+        with self.app.app_context():
+            for model, rows in batch.items():
+                done = self._write_rows(model, rows, attempt)
+                if done:
+                    committed[model] = done
+
+        cost_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self._stats['flush_count'] += 1
+            self._stats['last_flush_ms'] = cost_ms
+            self._stats['max_flush_ms'] = max(self._stats['max_flush_ms'], cost_ms)
+            self._stats['total_flush_ms'] += cost_ms
+            self._stats['flushed_rows'] += sum(len(rows) for rows in committed.values())
+
+        if committed:
+            self._notify(committed)
+
+    def _write_rows(self, model, rows, attempt):
+        """
+        一个事务内执行多行 INSERT 与该模型的写入钩子并提交 (调用方已进入 app_context)
+        :return: 已提交的行
+        """
+        try:
+            db.session.execute(insert(model), rows)
+            for hook in self._hooks.get(model, ()):
+                hook(rows)
+            db.session.commit()
+            return rows
+        except Exception as e:
+            db.session.rollback()
+            if isinstance(e, OperationalError) and attempt < self.max_retries:
+                print(f"❌ 写入缓冲刷写失败 ({model.__tablename__}, {len(rows)} 行, 第 {attempt + 1} 次): {e}")
+                with self._stats_lock:
+                    self._retries.append((time.monotonic() + self.retry_delay, attempt + 1, model, rows))
+                return []
+            if len(rows) == 1:
+                with self._stats_lock:
+                    self._stats['failed_rows'] += 1
+                print(f"❌ 丢弃无法写入的 {model.__tablename__} 数据: {rows[0]} ({e})")
+                return []
+
+        # 二分拆批: 只有坏行所在的一半继续拆分，其余行照常落库
+        mid = len(rows) // 2
+        return self._write_rows(model, rows[:mid], attempt) + self._write_rows(model, rows[mid:], attempt)
+
+    # ------------------------------------------------------------------
+    # 失败重试
+    # ------------------------------------------------------------------
+    def _run_retries(self, force=False):
+        """ 执行已到期的重试任务 (force=True 时不等待到期，退出前使用)，调用方持有 _flush_lock """
+        now = time.monotonic()
+        with self._stats_lock:
+            due = [r for r in self._retries if force or r[0] <= now]
+            self._retries = [r for r in self._retries if not (force or r[0] <= now)]
+            self._stats['retried_count'] += len(due)
+        for _, attempt, model, rows in due:
+            self._write({model: rows}, attempt)
+
+    def _notify(self, batch):
+        """ 批次提交后依次调用提交监听 (不计入刷写耗时) """
+        if not any(model in self._listeners for model in batch):
+            return
+        with self.app.app_context():
+            for model, rows in batch.items():
+                for listener in self._listeners.get(model, ()):
+                    try:
+                        listener(rows)
+                    except Exception as e:
+                        db.session.rollback()
+                        print(f"⚠️ 提交监听处理失败 ({model.__tablename__}): {e}")
+
+    def flush(self):
+        """ 立即同步刷写队列中的全部数据与待重试任务，并等待后台线程手上的批次落库 (脚本退出 / 压测时使用) """
+        with self._flush_lock:
+            batch = self._drain()
+            if batch:
+                self._write(batch)
+            self._run_retries(force=True)
+        self._mark_done(batch)
+        self._queue.join()
+
+    def shutdown(self):
+        self._stop.set()
+        if self.app is not None:
+            self.flush()
+
+    # ------------------------------------------------------------------
+    # 监控指标
+    # ------------------------------------------------------------------
+    def stats(self):
+        with self._stats_lock:
+            data = dict(self._stats)
+            data['retry_pending'] = len(self._retries)
+        flushes = data.pop('total_flush_ms')
+        data['avg_flush_ms'] = round(flushes / data['flush_count'], 2) if data['flush_count'] else 0.0
+        data['last_flush_ms'] = round(data['last_flush_ms'], 2)
+        data['max_flush_ms'] = round(data['max_flush_ms'], 2)
+        data['queue_depth'] = self._queue.qsize()
+        data['queue_capacity'] = self.max_size
+        data['enabled'] = self.enabled
+        return data
+
+
+# 进程内单例，在 create_app 中通过 write_buffer.init_app(app) 绑定
+write_buffer = WriteBehindBuffer()
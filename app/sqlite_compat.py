@@ -0,0 +1,13 @@
+# app/sqlite_compat.py
+"""
+本地 SQLite (压测 / 迁移校验 / 测试) 兼容
+模型主键为 BigInteger，SQLite 只有 INTEGER PRIMARY KEY 才会自增；导入本模块后建表时按 INTEGER 生成
+只影响 sqlite 方言，对 MySQL 无作用
+"""
+from sqlalchemy import BigInteger
+from sqlalchemy.ext.compiler import compiles
+
+
+@compiles(BigInteger, 'sqlite')
+def _sqlite_bigint(type_, compiler, **kw):
+    return 'INTEGER'
@@ -0,0 +1,57 @@
+# archive_job.py
+"""
+遥测数据冷存储归档任务 (导出为按日压缩列式文件 → 分批删除在线数据)
+
+用法:
+    python archive_job.py --dry-run          # 只列出待归档的日期
+    python archive_job.py                    # 执行一次
+    python archive_job.py --days 60          # 临时指定归档天数 (覆盖 ARCHIVE_AFTER_DAYS)
+    python archive_job.py --loop             # 常驻运行，默认每 24 小时执行一次
+"""
+import argparse
+import time
+from app import create_app
+from app.services.archive_service import ArchiveService
+
+app = create_app()
+
+
+def run_once(dry_run):
+    with app.app_context():
+        items = ArchiveService.run(dry_run=dry_run)
+
+        print("=" * 60)
+        print(f"📦 归档 {app.config['ARCHIVE_AFTER_DAYS']} 天前的遥测数据 → {ArchiveService.archive_dir()}"
+              f"{' (dry-run，不做修改)' if dry_run else ''}")
+        for item in items:
+            days = item['days']
+            span = f"{days[0]} ~ {days[-1]}" if days else '-'
+            line = f"   {item['table']:<20} 截止 {item['cutoff']} 待归档 {len(days)} 天 ({span})"
+            if not dry_run:
+                line += f" → 已归档 {item['archived_rows']} 行"
+            print(line)
+        print("=" * 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='遥测数据冷存储归档任务')
+    parser.add_argument('--dry-run', action='store_true', help='只列出待归档的日期')
+    parser.add_argument('--days', type=int, help='归档早于该天数的数据 (默认 ARCHIVE_AFTER_DAYS)')
+    parser.add_argument('--loop', action='store_true', help='常驻运行')
+    parser.add_argument('--interval-hours', type=float, default=24, help='常驻运行时的执行间隔 (小时)')
+    args = parser.parse_args()
+
+    if args.days is not None:
+        app.config['ARCHIVE_AFTER_DAYS'] = args.days
+
+    run_once(args.dry_run)
+    while args.loop:
+        time.sleep(args.interval_hours * 3600)
+        try:
+            run_once(args.dry_run)
+        except Exception as e:
+            print(f"❌ 归档任务执行失败: {e}")
+
+
+if __name__ == '__main__':
+    main()
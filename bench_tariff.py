@@ -0,0 +1,101 @@
+# bench_tariff.py
+"""
+分时电价分类压测：逐条 hour in list 判定 (原实现) vs 日历查找表向量化分类
+
+用法:
+    python bench_tariff.py                                # 默认 100 块表 × 1 年 × 15 分钟一条
+    python bench_tariff.py --meters 200 --interval-min 5
+    python bench_tariff.py --calendar tariff.json         # 使用自定义日历 (与系统参数 tariff_calendar 格式相同)
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+import numpy as np
+
+from app.services.tariff_calendar import TariffCalendar, PERIODS, DEFAULT_HOURS
+
+# 示例日历: 夏季尖峰 + 周末 / 节假日平谷，非整点边界
+SAMPLE_CALENDAR = {
+    'schedules': {
+        'summer': {'sharp': ['10:30-12:00', '16:00-17:30'], 'peak': ['08:00-10:30', '12:00-16:00', '17:30-21:00'],
+                   'flat': ['06:30-08:00', '21:00-23:00']},
+        'offday': {'flat': ['08:00-22:00']},
+    },
+    'seasons': [{'months': [7, 8, 9], 'workday': 'summer', 'holiday': 'offday'},
+                {'months': [1, 2, 3, 4, 5, 6, 10, 11, 12], 'workday': 'default', 'holiday': 'offday'}],
+    'weekend': [5, 6],
+    'holidays': ['2026-10-01', '2026-10-02', '2026-10-03'],
+    'plant_prices': {'1': {'electric': {'sharp': 1.65}}},
+}
+
+
+def legacy_classify(timestamps):
+    codes = []
+    for ts in timestamps:
+        hour = ts.hour
+        if hour in DEFAULT_HOURS['sharp']:
+            codes.append(0)
+        elif hour in DEFAULT_HOURS['peak']:
+            codes.append(1)
+        elif hour in DEFAULT_HOURS['flat']:
+            codes.append(2)
+        else:
+            codes.append(3)
+    return codes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分时电价分类压测')
+    parser.add_argument('--meters', type=int, default=100, help='计量表数量')
+    parser.add_argument('--days', type=int, default=365, help='数据天数')
+    parser.add_argument('--interval-min', type=int, default=15, help='采集间隔 (分钟)')
+    parser.add_argument('--legacy-rows', type=int, default=500000, help='原实现只测前 N 条 (逐条判定较慢)')
+    parser.add_argument('--calendar', help='自定义日历 JSON 文件 (默认使用内置示例日历)')
+    args = parser.parse_args()
+
+    raw = SAMPLE_CALENDAR
+    if args.calendar:
+        with open(args.calendar, encoding='utf-8') as f:
+            raw = json.load(f)
+
+    start = np.datetime64('2026-01-01T00:00', 'm')
+    steps = np.arange(args.days * 24 * 60 // args.interval_min, dtype=np.int64) * args.interval_min
+    series = start + steps.astype('timedelta64[m]')
+    timestamps = np.tile(series, args.meters)
+    values = np.random.uniform(5, 50, timestamps.size)
+
+    print("=" * 60)
+    print(f"🚀 压测开始: {args.meters} 块表 × {args.days} 天 × {args.interval_min} 分钟, 共 {timestamps.size:,} 条")
+
+    # 1. 原实现: 逐条 hour in list
+    sample = timestamps[:args.legacy_rows].astype(datetime)
+    begin = time.perf_counter()
+    legacy = legacy_classify(sample)
+    legacy_rate = len(sample) / (time.perf_counter() - begin)
+
+    # 2. 内置日历向量化 (结果应与原实现一致)
+    default = TariffCalendar()
+    begin = time.perf_counter()
+    codes = default.classify(timestamps)
+    default_cost = time.perf_counter() - begin
+    matched = np.array_equal(codes[:len(legacy)], np.array(legacy, dtype=np.int8))
+
+    # 3. 季节 / 节假日日历: 分类 + 汇总 + 计价
+    calendar = TariffCalendar(raw)
+    begin = time.perf_counter()
+    buckets = calendar.bucket_sums(timestamps, values)
+    prices = calendar.price_map(1, 'electric')
+    cost = sum(buckets[p] * prices.get(p, 0) for p in PERIODS)
+    calendar_cost = time.perf_counter() - begin
+
+    print(f"   原实现 (逐条判定): {legacy_rate:,.0f} rows/sec, 估算全量 {timestamps.size / legacy_rate:,.1f} s")
+    print(f"   内置日历向量化  : {timestamps.size / default_cost:,.0f} rows/sec, 全量 {default_cost:.2f} s "
+          f"(结果{'一致' if matched else '不一致'})")
+    print(f"   季节日历 + 计价 : {timestamps.size / calendar_cost:,.0f} rows/sec, 全量 {calendar_cost:.2f} s")
+    print(f"   各时段能耗: " + ", ".join(f"{p}={buckets[p]:,.0f}" for p in PERIODS) + f", 成本 {cost:,.0f}")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -30,9 +30,92 @@ class Config:
     # [cite_start]3. 告警业务 [cite: 58]
     # 高等级告警需在 15 分钟内响应
     ALARM_RESPONSE_TIME_LIMIT = 15  # 单位：分钟
+    # 未结案告警去重索引与数据库重新同步的间隔 (秒)
+    ALARM_OPEN_INDEX_RESYNC_SECONDS = 60
+    # 阈值规则引擎重新编译间隔 (秒)，用于感知新增设备；参数修改由 system_config 版本号立即触发
+    RULE_ENGINE_RELOAD_SECONDS = 30
+    # 系统参数缓存检查其他 worker 修改 (COUNT + MAX(updated_at)) 的间隔 (秒)
+    SYSTEM_CONFIG_CHECK_SECONDS = 5
 
     # [cite_start]4. 安全登录策略 [cite: 130]
     # 登录失败 5 次后锁定账号
     LOGIN_MAX_FAILURES = 5
 
+    # ================= 遥测写入缓冲 (write-behind) =================
+    # 关闭后所有遥测数据退化为同步批量写入
+    WRITE_BUFFER_ENABLED = True
+    # 队列容量 (行)，超出后触发背压
+    WRITE_BUFFER_MAX_SIZE = 50000
+    # 攒够多少行 或 等待多少秒 触发一次批量刷写
+    WRITE_BUFFER_FLUSH_ROWS = 1000
+    WRITE_BUFFER_FLUSH_INTERVAL = 1.0
+    # 队列满时入队最长等待时间 (秒)，超时丢弃并计数
+    WRITE_BUFFER_PUT_TIMEOUT = 0.5
+    # 数据库暂不可用时整批重试的间隔 (秒) 与最多重试次数，超过后拆批逐行定位坏数据
+    WRITE_BUFFER_RETRY_DELAY = 5.0
+    WRITE_BUFFER_MAX_RETRIES = 5
+
+    # ================= 光伏最新读数缓存 =================
+    # 每隔多少秒从数据库回填一次 (同步其它进程写入的数据)
+    PV_LATEST_CACHE_RESYNC_SECONDS = 30
+    # 回填时只查询最近多少秒内的读数
+    PV_LATEST_CACHE_WINDOW_SECONDS = 300
+
+    # ================= 光伏历史特征缓存 =================
+    # 7 天历史特征的缓存有效期 (秒)，跨天及历史补传时会提前失效
+    PV_HISTORY_CACHE_TTL_SECONDS = 300
+    # 实时快照刷新周期 (秒)，周期内实时接口/模型状态/模型优化共用同一份计算结果
+    PV_SNAPSHOT_TICK_SECONDS = 5
+    # 预测状态 (修正系数) 多进程一致性检查间隔 (秒)
+    PV_FORECAST_STATE_CHECK_SECONDS = 5
+
+    # ================= 光伏实时推送 (SSE) =================
+    # 每个 SSE 连接在整个连接期间占用一个处理线程 / 协程:
+    # 部署时须使用多线程或协程 worker (如 gunicorn -k gthread --threads 32 或 -k gevent)，
+    # 同步 worker (gunicorn 默认 -k sync) 下每个大屏会独占一个 worker 进程
+    # 单进程最多同时推送的连接数，应小于 worker 的线程数；超出时返回 503，页面退回 since/version 增量轮询
+    PV_STREAM_MAX_CLIENTS = 20
+    # 推送周期 (秒)，每个周期每个并网点只计算一次快照
+    PV_STREAM_TICK_SECONDS = 5
+    # 无数据变化时的保活间隔 (秒)
+    PV_STREAM_HEARTBEAT_SECONDS = 15
+    # 单个连接最多积压的事件数，超出后改发完整快照
+    PV_STREAM_QUEUE_SIZE = 20
+
+    # ================= 遥测数据保留 =================
+    # 默认保留天数 (系统参数 data_retention_days 优先)
+    DATA_RETENTION_DAYS = 365
+    # 保留天数下限，防止误配置清空数据
+    RETENTION_MIN_DAYS = 7
+    # 未分区表每批删除行数
+    RETENTION_DELETE_BATCH = 5000
+    # 已分区表预建未来多少天的分区
+    RETENTION_PARTITION_AHEAD_DAYS = 7
+    # 只清理已归档 (归档清单中有记录) 的日期，未归档的过期数据保留；不保留冷数据的部署可关闭
+    RETENTION_REQUIRE_ARCHIVE = True
+
+    # ================= 遥测冷存储归档 =================
+    # 早于该天数的遥测数据导出为按日压缩列式文件后从在线表删除
+    ARCHIVE_AFTER_DAYS = 90
+    # 归档文件目录 (含 manifest.json)
+    ARCHIVE_DIR = os.environ.get('EMS_ARCHIVE_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'archive')
+    # 归档后每批删除行数
+    ARCHIVE_DELETE_BATCH = 5000
+
+    # ================= 峰谷日统计预计算 =================
+    # 每次检查最近多少天的日统计缺口 (覆盖上月整月，供月报 / 季报直接汇总)
+    PEAK_VALLEY_ROLLUP_LOOKBACK_DAYS = 35
+    # 每天零点后延迟多少分钟执行 (等待补传数据落库)
+    PEAK_VALLEY_ROLLUP_DELAY_MINUTES = 10
+    # 补算进程数 (<= 1 时在当前进程顺序执行)
+    PEAK_VALLEY_ROLLUP_WORKERS = 4
+
+    # ================= 能耗数据质量判定 =================
+    # 各计量表最近可信读数缓存的重新加载间隔 (秒)，感知其他进程写入 / 修正的数据
+    ENERGY_TRUSTED_CACHE_RESYNC_SECONDS = 300
+
+    # ================= 周期报表缓存 =================
+    # 月度 / 季度汇总结果缓存有效期 (秒)，本进程日统计更新时立即失效，其他进程的修改通过立方体 SUM(revision) 感知
+    REPORT_CACHE_TTL_SECONDS = 300
+
     ###
\ No newline at end of file
@@ -89,6 +89,7 @@ CREATE TABLE IF NOT EXISTS transformer_data (
     env_temp_c DECIMAL(5, 1) COMMENT '环境温度',
     env_humidity DECIMAL(5, 2) COMMENT '环境湿度',
     run_status VARCHAR(20) COMMENT '运行状态',
+    INDEX ix_transformer_data_room_time (power_room_id, collect_time),
     FOREIGN KEY (power_room_id) REFERENCES power_room(power_room_id)
 ) COMMENT='变压器监测数据表';
 
@@ -109,6 +110,7 @@ CREATE TABLE IF NOT EXISTS circuit_data (
     cable_temp_c DECIMAL(5, 1) COMMENT '电缆头温度',
     capacitor_temp_c DECIMAL(5, 1) COMMENT '电容器温度',
     is_abnormal TINYINT DEFAULT 0 COMMENT '是否异常',
+    INDEX ix_circuit_data_room_time (power_room_id, collect_time),
     FOREIGN KEY (power_room_id) REFERENCES power_room(power_room_id)
 ) COMMENT='回路监测数据表';
 
@@ -151,10 +153,29 @@ CREATE TABLE IF NOT EXISTS pv_generation_data (
     string_voltage_v DECIMAL(10, 2) COMMENT '组串电压',
     string_current_a DECIMAL(10, 2) COMMENT '组串电流',
     is_abnormal TINYINT DEFAULT 0,
+    INDEX ix_pv_generation_data_device_time (device_id, collect_time),
     FOREIGN KEY (device_id) REFERENCES pv_device(device_id),
     FOREIGN KEY (grid_point_id) REFERENCES grid_point(grid_point_id)
 ) COMMENT='光伏发电数据表';
 
+-- 光伏 5 分钟时间槽汇总 (按设备，随数据接入增量维护)
+CREATE TABLE IF NOT EXISTS pv_slot_rollup (
+    rollup_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    slot_date DATE NOT NULL,
+    slot_index SMALLINT NOT NULL COMMENT '时间槽 (hour*12 + minute//5, 0-287)',
+    device_id BIGINT NOT NULL,
+    grid_point_id BIGINT,
+    reading_cnt INT DEFAULT 0 COMMENT '读数条数',
+    power_sum_kw DECIMAL(16, 4) DEFAULT 0 COMMENT '功率累计 (kW)',
+    power_min_kw DECIMAL(12, 4) COMMENT '最小功率 (kW)',
+    power_max_kw DECIMAL(12, 4) COMMENT '最大功率 (kW)',
+    gen_kwh_sum DECIMAL(16, 4) DEFAULT 0 COMMENT '发电量累计',
+    UNIQUE INDEX uq_pv_slot_rollup (slot_date, slot_index, device_id),
+    INDEX ix_pv_slot_rollup_grid (grid_point_id, slot_date, slot_index),
+    FOREIGN KEY (device_id) REFERENCES pv_device(device_id),
+    FOREIGN KEY (grid_point_id) REFERENCES grid_point(grid_point_id)
+) COMMENT='光伏时间槽汇总表';
+
 -- 光伏预测数据
 CREATE TABLE IF NOT EXISTS pv_forecast_data (
     forecast_id BIGINT AUTO_INCREMENT PRIMARY KEY,
@@ -169,6 +190,18 @@ CREATE TABLE IF NOT EXISTS pv_forecast_data (
     FOREIGN KEY (grid_point_id) REFERENCES grid_point(grid_point_id)
 ) COMMENT='光伏预测数据表';
 
+-- 光伏预测状态 (按并网点，grid_point_id 为空表示全站)
+CREATE TABLE IF NOT EXISTS pv_forecast_state (
+    state_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    grid_point_id BIGINT UNIQUE,
+    forecast_factor DECIMAL(6, 4) DEFAULT 1.0 COMMENT '预测修正系数',
+    model_version VARCHAR(20) COMMENT '模型版本',
+    optimized_at DATETIME COMMENT '最近一次优化时间',
+    revision INT NOT NULL DEFAULT 0 COMMENT '修改次数 (用于多进程缓存失效判断)',
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (grid_point_id) REFERENCES grid_point(grid_point_id)
+) COMMENT='光伏预测状态表';
+
 
 -- ==================== 综合能耗模块 ====================
 
@@ -196,6 +229,7 @@ CREATE TABLE IF NOT EXISTS energy_data (
     unit VARCHAR(10) COMMENT '单位',
     data_quality VARCHAR(10) COMMENT '数据质量',
     need_verify TINYINT DEFAULT 0 COMMENT '是否待核实',
+    INDEX ix_energy_data_meter_time (meter_id, collect_time),
     FOREIGN KEY (meter_id) REFERENCES energy_meter(meter_id),
     FOREIGN KEY (plant_id) REFERENCES plant(plant_id)
 ) COMMENT='能耗监测数据表';
@@ -213,9 +247,28 @@ CREATE TABLE IF NOT EXISTS peak_valley_energy (
     total_value DECIMAL(12, 2) COMMENT '总能耗',
     price_per_unit DECIMAL(10, 4) COMMENT '单位成本',
     total_cost DECIMAL(12, 2) COMMENT '总成本',
+    UNIQUE INDEX uq_peak_valley_date_plant_type (stat_date, plant_id, energy_type),
     FOREIGN KEY (plant_id) REFERENCES plant(plant_id)
 ) COMMENT='峰谷能耗统计表';
 
+-- 能耗月度汇总立方体 (厂区 × 能源类型 × 月，随峰谷日统计增量维护)
+CREATE TABLE IF NOT EXISTS energy_monthly_cube (
+    cube_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    stat_year SMALLINT NOT NULL COMMENT '年份',
+    stat_month SMALLINT NOT NULL COMMENT '月份 (1-12)',
+    plant_id BIGINT NOT NULL,
+    energy_type VARCHAR(20) NOT NULL COMMENT '能源类型',
+    sharp_value DECIMAL(16, 2) DEFAULT 0 COMMENT '尖峰值',
+    peak_value DECIMAL(16, 2) DEFAULT 0 COMMENT '高峰值',
+    flat_value DECIMAL(16, 2) DEFAULT 0 COMMENT '平段值',
+    valley_value DECIMAL(16, 2) DEFAULT 0 COMMENT '低谷值',
+    total_value DECIMAL(16, 2) DEFAULT 0 COMMENT '总能耗',
+    total_cost DECIMAL(16, 2) DEFAULT 0 COMMENT '总成本',
+    revision INT NOT NULL DEFAULT 0 COMMENT '修改次数 (用于多进程报表缓存失效判断)',
+    UNIQUE INDEX uq_energy_monthly_cube (stat_year, stat_month, plant_id, energy_type),
+    FOREIGN KEY (plant_id) REFERENCES plant(plant_id)
+) COMMENT='能耗月度汇总立方体';
+
 
 -- ==================== 告警与工单模块 ====================
 
@@ -228,6 +281,8 @@ CREATE TABLE IF NOT EXISTS alarm (
     alarm_content VARCHAR(255) COMMENT '告警内容',
     handle_status VARCHAR(20) COMMENT '处理状态',
     trigger_thresh VARCHAR(50) COMMENT '触发阈值',
+    open_dedup_key VARCHAR(100) NULL COMMENT '未结案告警去重键 (设备ID:告警类型，规则引擎告警为 设备ID:规则名)，结案后置空',
+    UNIQUE INDEX uq_alarm_open_dedup_key (open_dedup_key),
     FOREIGN KEY (equipment_id) REFERENCES equipment_ledger(equipment_id)
 ) COMMENT='系统告警表';
 
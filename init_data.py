@@ -16,6 +16,7 @@ from app.models import (
     # 【新增】系统配置表
     SystemConfig
 )
+from app.services.pv_rollup_service import PVRollupService
 
 app = create_app()
 
@@ -342,6 +343,10 @@ def init_mock_data():
                 curr += timedelta(minutes=15)
             db.session.commit()
 
+            # 直接经 ORM 写入，不经过写后缓冲的汇总钩子，这里重建 5 分钟时间槽汇总
+            slot_cnt = PVRollupService.rebuild(start_time.date(), now.date())
+            print(f"📊 已重建光伏时间槽汇总 {slot_cnt} 条")
+
         # ================= 8. 预测/报表/告警 =================
         tomorrow = datetime.now().date() + timedelta(days=1)
         if not PVForecastData.query.filter_by(forecast_date=tomorrow).first():
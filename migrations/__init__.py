@@ -0,0 +1,19 @@
+# migrations/__init__.py
+"""
+数据库结构版本化迁移
+- 每个迁移模块提供 VERSION / DESCRIPTION / upgrade()，可选 check() (EXPLAIN 校验，tests/test_migrations.py 自动执行)
+- 由根目录 migrate_db.py 按 VERSION 顺序执行，已执行的版本记录在 schema_migration 表
+- 新建库 (init_db.py / db.create_all) 已直接包含模型中的最新结构，迁移会自动跳过已存在的对象
+"""
+from . import v001_pv_slot_rollup, v002_pv_forecast_state, v003_time_series_indexes, \
+    v004_alarm_dedup_key, v005_system_config_text, v006_peak_valley_index, v007_energy_monthly_cube
+
+MIGRATIONS = [
+    v001_pv_slot_rollup,
+    v002_pv_forecast_state,
+    v003_time_series_indexes,
+    v004_alarm_dedup_key,
+    v005_system_config_text,
+    v006_peak_valley_index,
+    v007_energy_monthly_cube,
+]
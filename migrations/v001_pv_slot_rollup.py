@@ -0,0 +1,30 @@
+# migrations/v001_pv_slot_rollup.py
+from datetime import timedelta
+from sqlalchemy import func
+from app.extensions import db
+from app.models import PVGenerationData, PVSlotRollup
+from app.services.pv_rollup_service import PVRollupService
+
+VERSION = 1
+DESCRIPTION = '新增光伏 5 分钟时间槽汇总 pv_slot_rollup 并从原始数据回填'
+
+# 回填按日期分段重建，控制单次分组查询的数据量
+CHUNK_DAYS = 30
+
+
+def upgrade():
+    PVSlotRollup.__table__.create(bind=db.engine, checkfirst=True)
+    print("   ✅ pv_slot_rollup")
+
+    first, last = db.session.query(func.min(PVGenerationData.collect_time),
+                                   func.max(PVGenerationData.collect_time)).one()
+    if first is None:
+        print("   ⏭️  光伏原始数据为空，无需回填")
+        return
+
+    slots, day = 0, first.date()
+    while day <= last.date():
+        end = min(day + timedelta(days=CHUNK_DAYS - 1), last.date())
+        slots += PVRollupService.rebuild(day, end)
+        day = end + timedelta(days=1)
+    print(f"   ✅ 从光伏原始数据回填时间槽汇总 {slots} 条 ({first.date()} ~ {last.date()})")
@@ -0,0 +1,12 @@
+# migrations/v002_pv_forecast_state.py
+from app.extensions import db
+from app.models import PVForecastState
+
+VERSION = 2
+DESCRIPTION = '新增光伏预测状态表 pv_forecast_state (按并网点持久化修正系数)'
+
+
+def upgrade():
+    # 无需回填: 未保存过状态的并网点按默认系数 1.0 运行
+    PVForecastState.__table__.create(bind=db.engine, checkfirst=True)
+    print("   ✅ pv_forecast_state")
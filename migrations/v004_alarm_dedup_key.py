@@ -0,0 +1,54 @@
+# migrations/v004_alarm_dedup_key.py
+from sqlalchemy import inspect, text
+from app.extensions import db
+from app.models import Alarm
+from app.services.alarm_service import AlarmService
+from app.services.rule_engine import ThresholdRuleEngine
+
+VERSION = 4
+DESCRIPTION = '告警表增加未结案去重键 open_dedup_key 及唯一索引'
+
+INDEX_NAME = 'uq_alarm_open_dedup_key'
+
+
+def _rule_name(trigger_thresh):
+    """ 由规则引擎告警存入的阈值描述 (如 '>85℃') 反查规则名，与 create_alarm(rule_name=...) 的去重键一致 """
+    for name, _, _, op, _, _, _, _, _, unit in ThresholdRuleEngine.RULES:
+        if trigger_thresh and trigger_thresh.startswith(op) and trigger_thresh.endswith(unit):
+            try:
+                float(trigger_thresh[len(op):len(trigger_thresh) - len(unit)])
+            except ValueError:
+                continue
+            return name
+    return None
+
+
+def upgrade():
+    columns = {c['name'] for c in inspect(db.engine).get_columns('alarm')}
+    if 'open_dedup_key' not in columns:
+        db.session.execute(text("ALTER TABLE alarm ADD COLUMN open_dedup_key VARCHAR(100) NULL"))
+        db.session.commit()
+        print("   ✅ alarm.open_dedup_key")
+
+    # 回填: 规则引擎告警按 设备ID:规则名，其他告警按 设备ID:告警类型；
+    # 同一去重键的多条未结案告警只给最早的一条分配，避免唯一索引冲突
+    open_alarms = db.session.query(Alarm.alarm_id, Alarm.equipment_id, Alarm.trigger_thresh).filter(
+        Alarm.handle_status.in_(['未处理', '处理中']),
+        Alarm.open_dedup_key.is_(None),
+        Alarm.equipment_id.isnot(None)
+    ).order_by(Alarm.occur_time, Alarm.alarm_id).all()
+    taken = {k for (k,) in db.session.query(Alarm.open_dedup_key).filter(Alarm.open_dedup_key.isnot(None))}
+    filled = 0
+    for alarm_id, equipment_id, alarm_type in open_alarms:
+        key = AlarmService.dedup_key(equipment_id, _rule_name(alarm_type) or alarm_type)
+        if key in taken:
+            continue
+        taken.add(key)
+        db.session.query(Alarm).filter_by(alarm_id=alarm_id).update({'open_dedup_key': key})
+        filled += 1
+    db.session.commit()
+    print(f"   ✅ 回填未结案告警去重键 {filled} 条")
+
+    index = next(i for i in Alarm.__table__.indexes if i.name == INDEX_NAME)
+    index.create(bind=db.engine, checkfirst=True)
+    print(f"   ✅ alarm.{INDEX_NAME}")
@@ -0,0 +1,18 @@
+# migrations/v005_system_config_text.py
+from sqlalchemy import inspect, text
+from app.extensions import db
+
+VERSION = 5
+DESCRIPTION = '系统参数 config_value 改为 TEXT (存放分时电价日历 JSON)'
+
+
+def upgrade():
+    if db.engine.dialect.name != 'mysql':
+        # SQLite 不限制 VARCHAR 长度，无需修改
+        print("   ⏭️ 非 MySQL 数据库，跳过")
+        return
+    column = next(c for c in inspect(db.engine).get_columns('system_config') if c['name'] == 'config_value')
+    if 'TEXT' not in str(column['type']).upper():
+        db.session.execute(text("ALTER TABLE system_config MODIFY config_value TEXT NOT NULL COMMENT '配置值'"))
+        db.session.commit()
+    print("   ✅ system_config.config_value TEXT")
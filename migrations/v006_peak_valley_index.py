@@ -0,0 +1,52 @@
+# migrations/v006_peak_valley_index.py
+from datetime import date
+from sqlalchemy import select, func, delete
+from app.extensions import db
+from app.models import PeakValleyEnergy
+from .v003_time_series_indexes import explain_indexes
+
+VERSION = 6
+DESCRIPTION = '峰谷日统计增加 (stat_date, plant_id, energy_type) 唯一索引'
+
+INDEX_NAME = 'uq_peak_valley_date_plant_type'
+
+
+def upgrade():
+    # 清理重复的日统计 (同一天同一厂区同一能源类型保留最新计算的一条)，否则周期汇总会重复计入
+    keep = select(func.max(PeakValleyEnergy.pv_id)).group_by(
+        PeakValleyEnergy.stat_date, PeakValleyEnergy.plant_id, PeakValleyEnergy.energy_type
+    ).scalar_subquery()
+    ids = [pv_id for (pv_id,) in db.session.query(PeakValleyEnergy.pv_id)
+           .filter(PeakValleyEnergy.pv_id.notin_(keep))]
+    for i in range(0, len(ids), 1000):
+        db.session.execute(delete(PeakValleyEnergy).where(PeakValleyEnergy.pv_id.in_(ids[i:i + 1000])))
+    db.session.commit()
+    print(f"   ✅ 清理重复日统计 {len(ids)} 条")
+
+    index = next(i for i in PeakValleyEnergy.__table__.indexes if i.name == INDEX_NAME)
+    index.create(bind=db.engine, checkfirst=True)
+    print(f"   ✅ peak_valley_energy.{INDEX_NAME}")
+
+
+def hot_queries():
+    """ 实际按日期查询日统计的语句: (说明, 语句)，取自服务层，避免与线上查询脱节 """
+    from app.services.energy_service import AnalysisService
+    from app.services.peak_valley_rollup import PeakValleyRollupService
+    day = date(2026, 1, 5)
+    return [
+        ('日统计缺口扫描 (peak_valley_job / find_gaps)',
+         PeakValleyRollupService.existing_query(date(2026, 1, 1), date(2026, 3, 31)).statement),
+        ('单日高能耗厂区 (analyze_high_energy_plant)',
+         AnalysisService.daily_plant_query(day, 'electric').statement),
+    ]
+
+
+def check():
+    """ 按日期查询日统计的语句应命中新索引，返回是否全部通过 """
+    ok = True
+    for label, stmt in hot_queries():
+        plan = explain_indexes(stmt)
+        hit = any(INDEX_NAME in p for p in plan)
+        ok = ok and hit
+        print(f"   {'✅' if hit else '❌'} {label}: {', '.join(plan) or '全表扫描'}")
+    return ok
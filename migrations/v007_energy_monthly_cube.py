@@ -0,0 +1,22 @@
+# migrations/v007_energy_monthly_cube.py
+from sqlalchemy import inspect, text
+from app.extensions import db
+from app.models import EnergyMonthlyCube
+from app.services.energy_cube import EnergyCubeService
+
+VERSION = 7
+DESCRIPTION = '新增能耗月度汇总立方体 energy_monthly_cube 并从峰谷日统计回填'
+
+
+def upgrade():
+    EnergyMonthlyCube.__table__.create(bind=db.engine, checkfirst=True)
+    print("   ✅ energy_monthly_cube")
+    columns = {c['name'] for c in inspect(db.engine).get_columns('energy_monthly_cube')}
+    if 'revision' not in columns:
+        db.session.execute(text("ALTER TABLE energy_monthly_cube ADD COLUMN revision INT NOT NULL DEFAULT 0"))
+        db.session.commit()
+        print("   ✅ energy_monthly_cube.revision")
+
+    cells = EnergyCubeService.rebuild()
+    db.session.commit()
+    print(f"   ✅ 从峰谷日统计回填月度汇总 {cells} 格")
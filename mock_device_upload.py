@@ -5,7 +5,7 @@ import requests
 from datetime import datetime
 
 # ================= 配置 =================
-API_URL = "http://127.0.0.1:5000/monitor/api/pv/upload"
+API_URL = "http://127.0.0.1:5000/monitor/api/pv/upload_batch"
 INTERVAL_SECONDS = 5
 
 # 标准功率曲线 (基准：单台峰值约 500kW)
@@ -50,6 +50,7 @@ def upload_loop():
         try:
             # 获取平滑后的基准值
             base_p = get_base_power()
+            batch = []
 
             for dev_id in device_ids:
                 # 1. 差异化各设备功率 (ID 2 略低, ID 3 略高)
@@ -82,7 +83,10 @@ def upload_loop():
                     "gen_kwh": round(p * (INTERVAL_SECONDS / 3600), 4)
                 }
 
-                requests.post(API_URL, json=payload, timeout=2)
+                batch.append(payload)
+
+            # 5. 整批一次上传 (网关模式)
+            requests.post(API_URL, json=batch, timeout=2)
 
             # print(f"[{datetime.now().strftime('%H:%M:%S')}] 🌤️ 发送功率: {round(base_p * 3, 2)} kW")
 
@@ -0,0 +1,97 @@
+# peak_valley_job.py
+"""
+峰谷日统计预计算任务 (每天结束后补齐 peak_valley_energy，月报 / 季报只做汇总)
+
+用法:
+    python peak_valley_job.py --dry-run                       # 只列出缺少日统计的日期
+    python peak_valley_job.py                                 # 补算最近 PEAK_VALLEY_ROLLUP_LOOKBACK_DAYS 天，并重算昨天
+    python peak_valley_job.py --start 2025-01-01 --end 2025-03-31 --workers 8   # 历史区间回填
+    python peak_valley_job.py --start 2026-01-01 --recompute  # 修改分时电价日历后重算区间内全部日统计
+    python peak_valley_job.py --rebuild-cube                  # 从日统计重建月度汇总立方体 (校验修复)
+    python peak_valley_job.py --loop                          # 常驻运行，每天零点后执行一次
+"""
+import argparse
+import time
+from datetime import date, datetime, timedelta
+from config import Config
+
+# 补算直接写日统计表，不经过写后缓冲
+Config.WRITE_BUFFER_ENABLED = False
+
+from app import create_app
+from app.extensions import db
+from app.services.peak_valley_rollup import PeakValleyRollupService
+from app.services.energy_cube import EnergyCubeService
+
+app = create_app()
+
+
+def run_once(args):
+    with app.app_context():
+        if args.start:
+            start_date = date.fromisoformat(args.start)
+            end_date = date.fromisoformat(args.end) if args.end else date.today() - timedelta(days=1)
+        else:
+            start_date, end_date = PeakValleyRollupService.closed_range(args.lookback_days)
+
+        if args.recompute:
+            gaps = PeakValleyRollupService.all_items(start_date, end_date)
+        else:
+            gaps = PeakValleyRollupService.find_gaps(start_date, end_date)
+            if not args.start:
+                # 刚结束的一天整日重算，纠正增量累加的偏差 (不经写后缓冲写入的数据 / 重试后仍失败的写入钩子)
+                missing = set(gaps)
+                gaps += [item for item in PeakValleyRollupService.all_items(end_date, end_date) if item not in missing]
+        days = sorted({day for _, _, day in gaps})
+
+        print("=" * 60)
+        print(f"📊 峰谷日统计 {start_date} ~ {end_date}: {'重算' if args.recompute else '缺失'} {len(gaps)} 条 ({len(days)} 天)"
+              f"{' (dry-run，不做修改)' if args.dry_run else ''}")
+        if days:
+            print(f"   日期范围: {days[0]} ~ {days[-1]}")
+        if gaps and not args.dry_run:
+            start = time.perf_counter()
+            done = PeakValleyRollupService.backfill(gaps, workers=args.workers)
+            print(f"   ✅ 已补算 {done}/{len(gaps)} 条, 耗时 {time.perf_counter() - start:.1f}s")
+        print("=" * 60)
+
+
+def seconds_until_next_run(delay_minutes):
+    now = datetime.now()
+    next_run = datetime.combine(now.date() + timedelta(days=1), datetime.min.time()) + timedelta(minutes=delay_minutes)
+    return (next_run - now).total_seconds()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='峰谷日统计预计算任务')
+    parser.add_argument('--dry-run', action='store_true', help='只列出缺少日统计的日期')
+    parser.add_argument('--start', help='回填起始日期 YYYY-MM-DD (默认按 --lookback-days)')
+    parser.add_argument('--end', help='回填结束日期 YYYY-MM-DD (默认昨天)')
+    parser.add_argument('--lookback-days', type=int, default=Config.PEAK_VALLEY_ROLLUP_LOOKBACK_DAYS,
+                        help='检查最近多少天')
+    parser.add_argument('--workers', type=int, default=Config.PEAK_VALLEY_ROLLUP_WORKERS, help='补算进程数')
+    parser.add_argument('--recompute', action='store_true', help='重算区间内全部日统计 (含已存在的)')
+    parser.add_argument('--rebuild-cube', action='store_true', help='从日统计重建月度汇总立方体后退出')
+    parser.add_argument('--loop', action='store_true', help='常驻运行，每天零点后执行一次')
+    args = parser.parse_args()
+
+    if args.rebuild_cube:
+        with app.app_context():
+            cells = EnergyCubeService.rebuild()
+            db.session.commit()
+            print(f"✅ 月度汇总立方体已重建: {cells} 格")
+        return
+
+    run_once(args)
+    while args.loop:
+        time.sleep(seconds_until_next_run(Config.PEAK_VALLEY_ROLLUP_DELAY_MINUTES))
+        args.start = args.end = None
+        args.recompute = False
+        try:
+            run_once(args)
+        except Exception as e:
+            print(f"❌ 峰谷日统计任务执行失败: {e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# retention_job.py
+"""
+遥测数据保留期定时任务 (过期分区删除 / 过期数据分批清理 / 预建分区)
+
+用法:
+    python retention_job.py --dry-run        # 只打印执行计划，不做任何修改
+    python retention_job.py                  # 执行一次
+    python retention_job.py --loop           # 常驻运行，默认每 24 小时执行一次 (也可交给 cron 调度单次执行)
+    python retention_job.py --create-partitions --dry-run   # 打印把遥测表转换为按天分区的 DDL
+    python retention_job.py --create-partitions             # 执行转换 (仅 MySQL，会删除这些表的外键并重建表)
+"""
+import argparse
+import time
+from sqlalchemy import text
+from app import create_app
+from app.extensions import db
+from app.services.retention_service import RetentionService
+
+app = create_app()
+
+
+def run_once(dry_run):
+    with app.app_context():
+        days = RetentionService.retention_days()
+        items = RetentionService.run(dry_run=dry_run)
+
+        print("=" * 60)
+        print(f"🗄️ 数据保留 {days} 天{' (dry-run，不做修改)' if dry_run else ''}")
+        for item in items:
+            line = f"   {item['table']:<20} 截止 {item['cutoff']:%Y-%m-%d} 过期 {item['expired_rows']} 行"
+            if item['mode'] == 'partition':
+                line += f"，删除分区 {item['expired_partitions'] or '-'}，预建分区 {[n for n, _ in item['new_partitions']] or '-'}"
+            if not dry_run:
+                line += f" → 已清理 {item['deleted_rows']} 行"
+            print(line)
+            if item['unarchived_days']:
+                days = item['unarchived_days']
+                print(f"   ⚠️ {item['table']} 有 {len(days)} 天过期数据未归档 ({days[0]} ~ {days[-1]})，已跳过"
+                      f"{'，保留分区 ' + str(item['kept_partitions']) if item['kept_partitions'] else ''}"
+                      f" (先运行 archive_job.py)")
+        print("=" * 60)
+
+
+def create_partitions(dry_run):
+    with app.app_context():
+        if db.engine.dialect.name != 'mysql':
+            print("❌ 只有 MySQL 支持按天分区")
+            return
+        for model in RetentionService.TABLES:
+            table = model.__tablename__
+            if RetentionService.partitions(table):
+                print(f"⏭️  {table} 已按天分区")
+                continue
+            for sql in RetentionService.partition_ddl(model):
+                print(f"   {sql[:160]}{'...' if len(sql) > 160 else ''}")
+                if not dry_run:
+                    db.session.execute(text(sql))
+            if not dry_run:
+                db.session.commit()
+                print(f"✅ {table} 已转换为按天分区")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='遥测数据保留期定时任务')
+    parser.add_argument('--dry-run', action='store_true', help='只打印执行计划')
+    parser.add_argument('--loop', action='store_true', help='常驻运行')
+    parser.add_argument('--interval-hours', type=float, default=24, help='常驻运行时的执行间隔 (小时)')
+    parser.add_argument('--create-partitions', action='store_true', help='把遥测表转换为按天 RANGE 分区后退出')
+    args = parser.parse_args()
+
+    if args.create_partitions:
+        create_partitions(args.dry_run)
+        return
+
+    run_once(args.dry_run)
+    while args.loop:
+        time.sleep(args.interval_hours * 3600)
+        try:
+            run_once(args.dry_run)
+        except Exception as e:
+            print(f"❌ 数据保留任务执行失败: {e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,7 @@ import random
 from datetime import datetime, timedelta, time
 from app import create_app, db
 from app.models import PVGenerationData, PVDevice, GridPoint
+from app.services.pv_rollup_service import PVRollupService
 
 app = create_app()
 
@@ -77,6 +78,10 @@ def seed_7day_history():
                         db.session.add(rec)
             db.session.commit()
 
+        # 4. 重建 5 分钟时间槽汇总 (实时曲线/历史特征读取该表)
+        slot_cnt = PVRollupService.rebuild(seven_days_ago.date(), now_dt.date())
+        print(f"📊 已重建时间槽汇总 {slot_cnt} 条")
+
         print("✅ 历史数据注入完成！模型现在可以‘学习’到 14:00 的下跌规律了。")
         print("=" * 60)
 
@@ -83,6 +83,7 @@ def simulate_energy_collect():
             return
 
         print(f"✅ 成功加载 {len(meters)} 个设备，开始循环采集...")
+        meter_types = {m.meter_id: m.energy_type for m in meters}
 
         while running:
             if paused:
@@ -90,6 +91,7 @@ def simulate_energy_collect():
                 continue
 
             now = datetime.now()
+            readings = []
 
             for meter in meters:
                 # 1. 按能源类型决定基础参数
@@ -108,34 +110,35 @@ def simulate_energy_collect():
                 if error_mode:
                     # 💡 产生极大值，强制触发 EnergyDataService 的异常拦截逻辑
                     value = base * random.uniform(5.0, 10.0)
-                    log_prefix = "⚠️ [异常触发]"
                 else:
                     # 正常随机波动
                     value = base + random.uniform(-1.5, 1.5)
                     # 模拟 5% 的自发随机异常
                     if random.random() < 0.05:
                         value *= random.uniform(1.4, 2.0)
-                    log_prefix = "📈 [正常采集]"
-
-                value = round(value, 2)
-
-                # 3. 统一通过 Service 入库 (Service 会自动判定 need_verify)
-                try:
-                    EnergyDataService.save_energy_data(
-                        meter_id=meter.meter_id,
-                        plant_id=meter.plant_id,
-                        collect_time=now,
-                        energy_value=value,
-                        unit=unit
-                    )
 
+                readings.append(dict(
+                    meter_id=meter.meter_id,
+                    plant_id=meter.plant_id,
+                    collect_time=now,
+                    energy_value=round(value, 2),
+                    unit=unit
+                ))
+
+            # 3. 本轮所有计量表一次批量判定并入库 (Service 会自动判定 need_verify)
+            try:
+                rows = EnergyDataService.save_energy_batch(readings)
+                if len(rows) < len(readings):
+                    print(f"⚠️ 写入缓冲区已满，本轮 {len(readings) - len(rows)} 条未入库")
+                log_prefix = "⚠️ [异常触发]" if error_mode else "📈 [正常采集]"
+                for row in rows:
                     print(
                         f"[{now.strftime('%H:%M:%S')}] {log_prefix} "
-                        f"{meter.energy_type.upper()}(ID:{meter.meter_id}) "
-                        f"值: {value}{unit}"
+                        f"{meter_types[row['meter_id']].upper()}(ID:{row['meter_id']}) "
+                        f"值: {row['energy_value']}{row['unit']} ({row['data_quality']})"
                     )
-                except Exception as e:
-                    print(f"❌ 入库失败 (ID:{meter.meter_id}): {str(e)}")
+            except Exception as e:
+                print(f"❌ 本轮 {len(readings)} 条入库失败: {str(e)}")
 
             # 按照配置的间隔等待
             time.sleep(INTERVAL_SECONDS)
@@ -1,11 +1,20 @@
+"""
+配电网实时数据仿真终端 (兼作接入链路压测工具)
+
+用法:
+    python simulate_realtime.py                                # 交互模式，按 configs.py 的设备规模仿真
+    python simulate_realtime.py --scale 500                    # 每台配置设备扩展为 500 台虚拟设备
+    python simulate_realtime.py --scale 1000 --headless --ticks 20 --interval 1   # 无交互压测
+"""
+import argparse
 import time
 import threading
 import random
 from datetime import datetime
 from app import create_app
 from app.extensions import db
-from app.services.alarm_service import AlarmService
-from app.models import TransformerData, CircuitData, PowerRoom, EquipmentLedger, Alarm
+from app.services.write_buffer import write_buffer
+from app.models import TransformerData, CircuitData, PowerRoom, EquipmentLedger
 
 # 1. 【引入配置】
 from app.configs import ROOM_CONFIGS
@@ -13,6 +22,8 @@ from app.configs import ROOM_CONFIGS
 app = create_app()
 
 INTERVAL_SECONDS = 15
+# 设备映射自动刷新间隔 (台账新增设备后无需重启仿真)
+REGISTRY_REFRESH_SECONDS = 300
 
 # 2. 【自动展平列表】用于随机故障抽取
 # 解释：遍历 ROOM_CONFIGS，拿出每个 transformers 元组的第一个元素(编号)
@@ -25,124 +36,171 @@ fault_state = {
     'circuit_targets': []
 }
 
+# 设备映射 (启动时一次加载，refresh_registry() 刷新)
+# transformers / circuits: [(配电房ID, 设备编号, 配置设备编号), ...]
+# 越限告警由写入链路上的阈值规则引擎 (app/services/rule_engine.py) 判定，仿真终端只负责产生数据
+registry = {
+    'scale': 1,
+    'transformers': [],
+    'circuits': [],
+    'loaded_at': 0.0
+}
 
-# ================= 变压器生成逻辑 =================
-def generate_transformer_task():
+
+# ================= 设备映射 =================
+def refresh_registry():
+    """ 两次查询加载配电房 / 台账映射，并按 scale 扩展虚拟设备 """
     with app.app_context():
-        now = datetime.now()
-
-        # 3. 【遍历配置】无需再手动定义 ROOM_MAPPING
-        for room_conf in ROOM_CONFIGS:
-            room_code = room_conf['code']  # 注意这里是 'code' 键
-            room = PowerRoom.query.filter_by(room_code=room_code).first()
-            if not room: continue
-
-            # 遍历该房间下的变压器 (注意是元组解包)
-            for t_code, _, _ in room_conf['transformers']:
-                ledger = EquipmentLedger.query.filter_by(equipment_code=t_code).first()
-                if not ledger: continue
-
-                is_faulty = (t_code in fault_state['transformer_targets'])
-
-                if not is_faulty:
-                    base = 60 if '001' in t_code or '004' in t_code else 40
-                    load_rate = base + random.uniform(-5, 5)
-                    winding_temp = 40 + (load_rate * 0.4) + random.uniform(-1, 1)
-                    core_temp = winding_temp + 2
-                    run_status = '正常'
-
-                    # 心跳日志
-                    if t_code == 'TRANS_001' and not fault_state['transformer_targets']:
-                        print(f"[{now.strftime('%H:%M:%S')}] 🔌 [变压器] 系统平稳")
-                else:
-                    load_rate = random.uniform(90, 98)
-                    winding_temp = 90 + random.uniform(0, 5)
-                    core_temp = winding_temp + 5
-                    run_status = '超温告警'
-                    print(f"[{now.strftime('%H:%M:%S')}] 🔥 [变压器] {t_code} 故障! 温度: {winding_temp:.1f}℃")
-
-                td = TransformerData(
-                    power_room_id=room.power_room_id, transformer_code=t_code, collect_time=now,
-                    load_rate_percent=round(load_rate, 2), winding_temp_c=round(winding_temp, 1),
-                    core_temp_c=round(core_temp, 1), env_temp_c=25.0, env_humidity=45.0, run_status=run_status
-                )
-                db.session.add(td)
-
-                if winding_temp > 85.0:
-                    trigger_alarm(ledger.equipment_id, f'{t_code} 绕组温度过高 ({round(winding_temp, 1)}℃)', '>85℃')
-
-        db.session.commit()
+        room_ids = dict(db.session.query(PowerRoom.room_code, PowerRoom.power_room_id).all())
+        ledger_ids = dict(db.session.query(EquipmentLedger.equipment_code, EquipmentLedger.equipment_id).all())
 
+    scale = registry['scale']
+    transformers, circuits = [], []
+    for room_conf in ROOM_CONFIGS:
+        room_id = room_ids.get(room_conf['code'])
+        if not room_id: continue
 
-# ================= 回路生成逻辑 =================
-def generate_circuit_task():
-    with app.app_context():
-        now = datetime.now()
+        for t_code, _, _ in room_conf['transformers']:
+            if t_code not in ledger_ids: continue
+            transformers.append((room_id, t_code, t_code))
+            # 虚拟设备沿用原设备的配电房和负载特征，不参与故障注入 (未登记台账，不会产生告警)
+            transformers.extend((room_id, f'{t_code}_S{i:04d}', t_code) for i in range(1, scale))
 
-        for room_conf in ROOM_CONFIGS:
-            room = PowerRoom.query.filter_by(room_code=room_conf['code']).first()
-            if not room: continue
+        for c_code, _, _ in room_conf['circuits']:
+            circuits.append((room_id, c_code, c_code))
+            circuits.extend((room_id, f'{c_code}_S{i:04d}', c_code) for i in range(1, scale))
 
-            for c_code, _, _ in room_conf['circuits']:
-                ledger = EquipmentLedger.query.filter_by(equipment_code=c_code).first()
+    registry.update(transformers=transformers, circuits=circuits, loaded_at=time.monotonic())
+    print(f"🔄 设备映射已加载: 变压器 {len(transformers)} 台, 回路 {len(circuits)} 条")
 
-                is_faulty = (c_code in fault_state['circuit_targets'])
-                voltage = 10.2 + random.uniform(-0.1, 0.1)
 
-                if not is_faulty:
-                    base = 200 if 'incoming' in c_code else 50
-                    current = base + random.uniform(-5, 5)
-                    active_power = current * voltage * 1.732 * 0.95
-                    is_abnormal = 0
-                    cable_temp = 30 + (current / 20)
+def ensure_registry():
+    if time.monotonic() - registry['loaded_at'] >= REGISTRY_REFRESH_SECONDS:
+        refresh_registry()
 
-                    if c_code == 'AL1_incoming' and not fault_state['circuit_targets']:
-                        print(f"[{now.strftime('%H:%M:%S')}] ⚡ [回  路] 系统平稳")
-                else:
-                    current = 600 + random.uniform(0, 50)
-                    active_power = current * voltage * 1.732 * 0.6
-                    is_abnormal = 1
-                    cable_temp = 85.0
-                    print(f"[{now.strftime('%H:%M:%S')}] 💥 [回  路] {c_code} 过载! 电流: {current:.1f}A")
 
-                cd = CircuitData(
-                    power_room_id=room.power_room_id, circuit_code=c_code, collect_time=now,
-                    voltage_kv=round(voltage, 2), current_a=round(current, 2), active_power_kw=round(active_power, 2),
-                    reactive_power_kvar=round(active_power * 0.3, 2), power_factor=0.95, forward_kwh=10000.0,
-                    reverse_kwh=0, switch_status='合闸', cable_temp_c=round(cable_temp, 1),
-                    capacitor_temp_c=30.0, is_abnormal=is_abnormal
-                )
-                db.session.add(cd)
+# ================= 变压器生成逻辑 =================
+def build_transformer_rows(now):
+    rows = []
+
+    for room_id, t_code, template in registry['transformers']:
+        is_faulty = (t_code in fault_state['transformer_targets'])
+
+        if not is_faulty:
+            base = 60 if '001' in template or '004' in template else 40
+            load_rate = base + random.uniform(-5, 5)
+            winding_temp = 40 + (load_rate * 0.4) + random.uniform(-1, 1)
+            core_temp = winding_temp + 2
+            run_status = '正常'
+
+            # 心跳日志
+            if t_code == 'TRANS_001' and not fault_state['transformer_targets']:
+                print(f"[{now.strftime('%H:%M:%S')}] 🔌 [变压器] 系统平稳")
+        else:
+            load_rate = random.uniform(90, 98)
+            winding_temp = 90 + random.uniform(0, 5)
+            core_temp = winding_temp + 5
+            run_status = '超温告警'
+            print(f"[{now.strftime('%H:%M:%S')}] 🔥 [变压器] {t_code} 故障! 温度: {winding_temp:.1f}℃")
 
-                if current > 400.0 and ledger:
-                    trigger_alarm(ledger.equipment_id, f'{c_code} 回路电流过载 ({round(current, 1)}A)', '>400A')
+        rows.append(dict(
+            power_room_id=room_id, transformer_code=t_code, collect_time=now,
+            load_rate_percent=round(load_rate, 2), winding_temp_c=round(winding_temp, 1),
+            core_temp_c=round(core_temp, 1), env_temp_c=25.0, env_humidity=45.0, run_status=run_status
+        ))
 
-        db.session.commit()
+    return rows
 
 
-# ================= 通用辅助 =================
-def trigger_alarm(equipment_id, content, threshold_desc):
-    search_key = content.split(' ')[0]
-    existing_alarm = Alarm.query.filter(
-        Alarm.equipment_id == equipment_id, Alarm.alarm_content.like(f'%{search_key}%'),
-        Alarm.handle_status.in_(['未处理', '处理中'])
-    ).first()
-    if not existing_alarm:
-        print(f"   >>> 🚨 [自动告警] 已为 {search_key} 创建告警单！")
-        AlarmService.create_alarm(equipment_id=equipment_id, content=content, level='高', alarm_type=threshold_desc)
+def generate_transformer_task():
+    ensure_registry()
+    write_buffer.submit_batch({TransformerData: build_transformer_rows(datetime.now())})
+
+
+# ================= 回路生成逻辑 =================
+def build_circuit_rows(now):
+    rows = []
+
+    for room_id, c_code, template in registry['circuits']:
+        is_faulty = (c_code in fault_state['circuit_targets'])
+        voltage = 10.2 + random.uniform(-0.1, 0.1)
+
+        if not is_faulty:
+            base = 200 if 'incoming' in template else 50
+            current = base + random.uniform(-5, 5)
+            active_power = current * voltage * 1.732 * 0.95
+            is_abnormal = 0
+            cable_temp = 30 + (current / 20)
+
+            if c_code == 'AL1_incoming' and not fault_state['circuit_targets']:
+                print(f"[{now.strftime('%H:%M:%S')}] ⚡ [回  路] 系统平稳")
+        else:
+            current = 600 + random.uniform(0, 50)
+            active_power = current * voltage * 1.732 * 0.6
+            is_abnormal = 1
+            cable_temp = 85.0
+            print(f"[{now.strftime('%H:%M:%S')}] 💥 [回  路] {c_code} 过载! 电流: {current:.1f}A")
+
+        rows.append(dict(
+            power_room_id=room_id, circuit_code=c_code, collect_time=now,
+            voltage_kv=round(voltage, 2), current_a=round(current, 2), active_power_kw=round(active_power, 2),
+            reactive_power_kvar=round(active_power * 0.3, 2), power_factor=0.95, forward_kwh=10000.0,
+            reverse_kwh=0, switch_status='合闸', cable_temp_c=round(cable_temp, 1),
+            capacitor_temp_c=30.0, is_abnormal=is_abnormal
+        ))
+
+    return rows
 
 
+def generate_circuit_task():
+    ensure_registry()
+    write_buffer.submit_batch({CircuitData: build_circuit_rows(datetime.now())})
+
+
+def generate_tick():
+    """ 一个采集周期: 变压器与回路数据合并为一批提交 """
+    ensure_registry()
+    now = datetime.now()
+    batch = {TransformerData: build_transformer_rows(now), CircuitData: build_circuit_rows(now)}
+    return write_buffer.submit_batch(batch)
+
+
+# ================= 通用辅助 =================
 def auto_generator_loop():
     while True:
         time.sleep(INTERVAL_SECONDS)
-        generate_transformer_task()
-        generate_circuit_task()
+        generate_tick()
+
+
+def headless_loop(ticks):
+    """ 无交互压测: 按周期生成数据并输出每周期行数 / 生成耗时 / 写入缓冲指标 """
+    print("=" * 60)
+    print(f"🚀 实时仿真压测: 变压器 {len(registry['transformers'])} 台, 回路 {len(registry['circuits'])} 条, "
+          f"周期 {INTERVAL_SECONDS} 秒, 共 {ticks or '∞'} 个周期")
+    print("=" * 60)
+
+    tick = 0
+    while not ticks or tick < ticks:
+        started = time.perf_counter()
+        rows = generate_tick()
+        cost_ms = (time.perf_counter() - started) * 1000
+        tick += 1
+        stats = write_buffer.stats()
+        print(f"   周期 {tick:>4}: 提交 {rows} 行, 生成 {cost_ms:.1f} ms, "
+              f"队列 {stats['queue_depth']}/{stats['queue_capacity']}, 已落库 {stats['flushed_rows']}, 丢弃 {stats['dropped_rows']}")
+        time.sleep(max(0.0, INTERVAL_SECONDS - cost_ms / 1000))
+
+    write_buffer.flush()
+    stats = write_buffer.stats()
+    print("-" * 60)
+    print(f"✅ 完成: 落库 {stats['flushed_rows']} 行, 丢弃 {stats['dropped_rows']}, 失败 {stats['failed_rows']}, "
+          f"平均刷写 {stats['avg_flush_ms']} ms, 最大 {stats['max_flush_ms']} ms")
 
 
 def main_controller():
     print("=" * 60)
     print("🚀 智能仿真终端 (配置驱动版 - 动态适配 configs.py)")
-    print(f"   刷新频率: {INTERVAL_SECONDS} 秒")
+    print(f"   刷新频率: {INTERVAL_SECONDS} 秒, 设备扩展倍数: {registry['scale']}")
     print("-" * 60)
     print("   [error_t] : 随机让 1~3 台变压器故障")
     print("   [fix_t]   : 修复变压器")
@@ -150,6 +208,7 @@ def main_controller():
     print("   [error_c] : 随机让 1~3 条回路故障")
     print("   [fix_c]   : 修复回路")
     print("-" * 60)
+    print("   [refresh] : 重新加载配电房 / 设备台账映射")
     print("   [q]       : 退出")
     print("=" * 60)
 
@@ -186,9 +245,31 @@ def main_controller():
             fault_state['circuit_targets'] = []
             print("\n💚 回路已修复。")
             generate_circuit_task()
+
+        elif cmd == 'refresh':
+            refresh_registry()
         else:
             print("❌ 无效指令")
 
 
+def main():
+    global INTERVAL_SECONDS
+    parser = argparse.ArgumentParser(description='配电网实时数据仿真终端')
+    parser.add_argument('--scale', type=int, default=1, help='每台配置设备扩展的虚拟设备数 (压测用)')
+    parser.add_argument('--interval', type=float, default=INTERVAL_SECONDS, help='采集周期 (秒)')
+    parser.add_argument('--headless', action='store_true', help='无交互压测模式')
+    parser.add_argument('--ticks', type=int, default=0, help='压测周期数 (0 表示不限)')
+    args = parser.parse_args()
+
+    INTERVAL_SECONDS = args.interval
+    registry['scale'] = max(1, args.scale)
+    refresh_registry()
+
+    if args.headless:
+        headless_loop(args.ticks)
+    else:
+        main_controller()
+
+
 if __name__ == '__main__':
-    main_controller()
\ No newline at end of file
+    main()
@@ -0,0 +1,27 @@
+# tests/conftest.py
+"""
+测试公共夹具: 每个测试使用独立的临时 SQLite 库，写后缓冲关闭 (同步写入)
+"""
+import pytest
+
+from app import sqlite_compat  # noqa: F401  SQLite 下 BigInteger 主键自增
+from config import Config
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # 只在本测试内覆盖，测试结束后还原全局 Config
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', 'sqlite:///' + str(tmp_path / 'test.db'))
+    monkeypatch.setattr(Config, 'WRITE_BUFFER_ENABLED', False)
+
+    from app import create_app
+    from app.extensions import db
+    from app.services.report_cache import period_report_cache
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        period_report_cache.invalidate()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,110 @@
+# tests/test_energy_quality.py
+"""
+批量判定 (save_energy_batch) 与原逐条实现 (每条查询最近可信数据后单行入库) 的数据质量对比，
+覆盖档位边界、0 / 负数 / 缺失的历史值、NaN 与缺失读数、同一批内同一计量表多条读数
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func
+
+from app.extensions import db
+from app.models import EnergyData, EnergyMeter, Plant
+from app.services.energy_data_service import EnergyDataService, trusted_reading_cache
+
+HISTORY_TIME = datetime(2026, 1, 1)
+
+# 计量表历史 (最近一条读数的值, 数据质量)，None 表示没有历史
+HISTORIES = [(100, 'Good'), (100, 'Fair'), (100, 'Bad'), (0, 'Good'), (-5, 'Good'), (None, 'Good'), None]
+
+# 以上一条可信值 100 为基准: 恰好落在 10% / 20% / 50% 档位边界及两侧
+VALUES = [100, 110, 90, 110.01, 120, 80, 120.01, 150, 50, 150.01, 49.99, 0, 250, 100.004, 100.005, 55.555,
+          float('nan')]
+
+
+def _legacy_save(r):
+    """ 原 save_energy_data 的判定逻辑 (逐条查询 + 单行提交) """
+    last_record = (
+        EnergyData.query
+        .filter(EnergyData.meter_id == r['meter_id'], EnergyData.data_quality.in_(['Good', 'Fair']))
+        .order_by(EnergyData.collect_time.desc())
+        .first()
+    )
+    need_verify, data_quality = 0, 'Good'
+    if last_record and last_record.energy_value and last_record.energy_value > 0:
+        last_value = float(last_record.energy_value)
+        fluctuation = abs(float(r['energy_value']) - last_value) / last_value
+        if fluctuation <= 0.10:
+            data_quality = 'Good'
+        elif fluctuation <= 0.20:
+            data_quality = 'Fair'
+        elif fluctuation <= 0.50:
+            data_quality, need_verify = 'Medium', 1
+        else:
+            data_quality, need_verify = 'Bad', 1
+    db.session.add(EnergyData(data_quality=data_quality, need_verify=need_verify, **r))
+    db.session.commit()
+    return data_quality, need_verify
+
+
+def _seed():
+    trusted_reading_cache.clear()  # 进程内缓存按 meter_id 保存，不能带到新的测试库
+    plant = Plant(plant_code='T_PLANT', plant_name='测试厂区')
+    db.session.add(plant)
+    db.session.flush()
+    meters = [EnergyMeter(plant_id=plant.plant_id, energy_type='electric') for _ in HISTORIES]
+    db.session.add_all(meters)
+    db.session.flush()
+    for meter, history in zip(meters, HISTORIES):
+        if history is not None:
+            value, quality = history
+            db.session.add(EnergyData(meter_id=meter.meter_id, plant_id=plant.plant_id, collect_time=HISTORY_TIME,
+                                      energy_value=value, unit='kWh', data_quality=quality,
+                                      need_verify=int(quality == 'Bad')))
+    db.session.commit()
+    return [(m.meter_id, plant.plant_id) for m in meters]
+
+
+def _batches(meters):
+    """ 每批每块表两条读数: 第二条与第一条比较，同时覆盖批内分轮判定 """
+    batches = []
+    for k in range(0, len(VALUES), 2):
+        ts = HISTORY_TIME + timedelta(minutes=k + 1)
+        batch = []
+        for j, value in enumerate(VALUES[k:k + 2]):
+            batch += [dict(meter_id=meter_id, plant_id=plant_id, collect_time=ts + timedelta(seconds=j),
+                           energy_value=value, unit='kWh') for meter_id, plant_id in meters]
+        batches.append(batch)
+    return batches
+
+
+def test_batch_classification_matches_per_row_path(app):
+    meters = _seed()
+    batches = _batches(meters)
+    history_max_id = db.session.query(func.max(EnergyData.energy_data_id)).scalar()
+
+    legacy = [_legacy_save(dict(r)) for batch in batches for r in batch]
+
+    db.session.execute(delete(EnergyData).where(EnergyData.energy_data_id > history_max_id))
+    db.session.commit()
+    trusted_reading_cache.clear()
+
+    batched = [(row['data_quality'], row['need_verify'])
+               for batch in batches for row in EnergyDataService.save_energy_batch(batch)]
+
+    readings = [(r['meter_id'], r['energy_value']) for batch in batches for r in batch]
+    mismatched = [(reading, a, b) for reading, a, b in zip(readings, legacy, batched) if a != b]
+    assert len(batched) == len(legacy)
+    assert not mismatched
+
+
+def test_missing_value_is_flagged_only_when_comparable(app):
+    # 原实现遇到缺失读数且有可比较的可信数据时直接抛出异常，批量判定改为 Bad 待核实
+    meters = _seed()
+    ts = HISTORY_TIME + timedelta(minutes=1)
+    rows = EnergyDataService.save_energy_batch([
+        dict(meter_id=meter_id, plant_id=plant_id, collect_time=ts, energy_value=None, unit='kWh')
+        for meter_id, plant_id in meters
+    ])
+
+    comparable = [h is not None and h[1] in ('Good', 'Fair') and (h[0] or 0) > 0 for h in HISTORIES]
+    assert [(r['data_quality'], r['need_verify']) for r in rows] == \
+        [('Bad', 1) if c else ('Good', 0) for c in comparable]
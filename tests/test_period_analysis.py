@@ -0,0 +1,107 @@
+# tests/test_period_analysis.py
+"""
+周期综合分析与暴力逐条累加的结果对比 (厂区 join 与日期区间过滤的回归测试)
+"""
+import random
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import insert
+
+from app.extensions import db
+from app.models import Plant, PeakValleyEnergy, EnergyMeter, EnergyData
+from app.services.energy_service import AnalysisService
+from app.services.energy_cube import EnergyCubeService
+
+ENERGY_TYPES = ('electric', 'water', 'gas', 'steam')
+PERIODS = [(2025, 'month', m) for m in range(1, 13)] + [(2025, 'quarter', q) for q in range(1, 5)] + \
+    [(2025, 'year', 1), (2026, 'month', 1)]
+
+
+def _seed(plants=4):
+    """ 2024-12-01 ~ 2026-01-31 的日统计，跨年数据用于校验区间边界 """
+    random.seed(20250101)
+    plant_objs = [Plant(plant_code=f'T_{i}', plant_name=f'测试厂区{i}') for i in range(plants)]
+    db.session.add_all(plant_objs)
+    db.session.commit()
+    names = {p.plant_id: p.plant_name for p in plant_objs}
+
+    rows = []
+    day = date(2024, 12, 1)
+    while day <= date(2026, 1, 31):
+        for plant_id in names:
+            for energy_type in ENERGY_TYPES:
+                value = Decimal(str(round(random.uniform(100, 1000), 2)))
+                rows.append(dict(plant_id=plant_id, energy_type=energy_type, stat_date=day, total_value=value,
+                                 total_cost=(value * Decimal('0.85')).quantize(Decimal('0.01'))))
+        day += timedelta(days=1)
+    db.session.execute(insert(PeakValleyEnergy), rows)
+    EnergyCubeService.rebuild()
+    db.session.commit()
+    return names, rows
+
+
+def _in_period(day, year, period_type, period_value):
+    if day.year != year:
+        return False
+    if period_type == 'month':
+        return day.month == period_value
+    if period_type == 'quarter':
+        return (day.month - 1) // 3 + 1 == period_value
+    return True
+
+
+def _brute_force(names, rows, year, period_type, period_value):
+    totals = {}
+    for r in rows:
+        if _in_period(r['stat_date'], year, period_type, period_value):
+            key = (names[r['plant_id']], r['energy_type'])
+            val, cost = totals.get(key, (Decimal(0), Decimal(0)))
+            totals[key] = (val + r['total_value'], cost + r['total_cost'])
+    return totals
+
+
+def test_comprehensive_analysis_matches_brute_force(app):
+    names, rows = _seed()
+    for year, period_type, period_value in PERIODS:
+        expected = _brute_force(names, rows, year, period_type, period_value)
+        _, results = AnalysisService.get_period_comprehensive_analysis(year, period_type, period_value)
+        actual = {(r[0], r[1]): (r[2], r[3]) for r in results}
+        assert actual == expected, f"{year} {period_type} {period_value} 与暴力计算不一致"
+
+
+def test_cached_analysis_refreshes_after_new_daily_stat(app):
+    _seed(plants=2)
+    AnalysisService.get_period_comprehensive_analysis(2025, 'quarter', 1)
+
+    plant = Plant(plant_code='T_NEW', plant_name='新增厂区')
+    db.session.add(plant)
+    db.session.flush()
+    meter = EnergyMeter(plant_id=plant.plant_id, energy_type='electric')
+    db.session.add(meter)
+    db.session.flush()
+    db.session.add(EnergyData(meter_id=meter.meter_id, plant_id=plant.plant_id,
+                              collect_time=datetime(2025, 2, 1, 10), energy_value=Decimal('10.00'),
+                              unit='kWh', data_quality='Good', need_verify=0))
+    db.session.commit()
+    AnalysisService.calculate_daily_energy_cost(plant.plant_id, 'electric', date(2025, 2, 1))
+
+    _, results = AnalysisService.get_period_comprehensive_analysis(2025, 'quarter', 1)
+    assert ('新增厂区', 'electric', Decimal('10.00')) in [(r[0], r[1], r[2]) for r in results]
+
+
+def test_cached_analysis_sees_other_process_delta_on_existing_day(app):
+    names, _ = _seed(plants=2)
+    plant_id = next(iter(names))
+    meter = EnergyMeter(plant_id=plant_id, energy_type='electric')
+    db.session.add(meter)
+    db.session.commit()
+    before = {(r[0], r[1]): r[2] for r in AnalysisService.get_period_comprehensive_analysis(2025, 'month', 3)[1]}
+
+    # 模拟其他进程的写入钩子: 累加到已有日统计，不经过本进程的按日期失效
+    AnalysisService.apply_energy_rows([dict(meter_id=meter.meter_id, plant_id=plant_id, need_verify=0,
+                                            collect_time=datetime(2025, 3, 10, 10), energy_value=5)])
+    db.session.commit()
+
+    after = {(r[0], r[1]): r[2] for r in AnalysisService.get_period_comprehensive_analysis(2025, 'month', 3)[1]}
+    key = (names[plant_id], 'electric')
+    assert after[key] == before[key] + Decimal('5.00')
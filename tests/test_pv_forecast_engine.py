@@ -0,0 +1,81 @@
+# tests/test_pv_forecast_engine.py
+"""
+PVForecastEngine 与原逐槽循环 (monitor.get_final_forecast_series) 的结果逐位对比:
+多个并网点 x 多种气象 x 连续多天，含分段系数和历史数据缺失 / 为 0 的时间槽
+"""
+import math
+import random
+
+import numpy as np
+import pytest
+
+from app.blueprints.monitor import BASE_FORECAST_RULES
+from app.services.pv_forecast_engine import PVForecastEngine
+
+# 晴 / 多云 / 雨 (forecast_tomorrow_weather 的气象系数) 及优化系数的上下限
+WEATHER_FACTORS = [1.15, 0.65, 0.25, 0.1, 2.5]
+DAYS = 7
+
+
+def legacy_forecast_series(history_map, factor, split_idx=None):
+    """ 原 monitor.get_final_forecast_series 的逐槽实现 """
+    forecast_288 = []
+    if split_idx is None:
+        split_idx = -1
+
+    for slot in range(288):
+        h = slot // 12
+        m_frac = (slot % 12) / 12.0
+        curr_rule = BASE_FORECAST_RULES[h]
+        next_rule = BASE_FORECAST_RULES[(h + 1) % 24]
+        rule_val = curr_rule + (next_rule - curr_rule) * m_frac
+        hist_val = history_map.get(slot, rule_val)
+        base_val = (hist_val * 0.8) + (rule_val * 0.2)
+        active_factor = 1.0 if slot < split_idx else factor
+        final_val = base_val * active_factor
+        forecast_288.append(round(final_val * (1 + math.sin(slot) * 0.002), 2))
+
+    return forecast_288
+
+
+def _histories():
+    random.seed(20260301)
+    daytime = {slot: random.uniform(0, 1600) for slot in range(72, 220) if random.random() < 0.9}
+    return [
+        {},                                                   # 新并网点: 全部回退为规则值
+        {slot: 0.0 for slot in range(288)},                   # 全天历史为 0 (停机)
+        {slot: random.uniform(0, 50) for slot in range(288)},
+        daytime,
+        {0: 12.345, 143: 800.005, 287: 1.0},                  # 首尾时间槽及恰好 .xx5 的值
+    ]
+
+
+@pytest.mark.parametrize('split_idx', [None, 0, 1, 137, 287, 288])
+def test_engine_matches_legacy_loop_over_days_and_weather(split_idx):
+    random.seed(split_idx or 0)
+    histories = _histories()
+    # 逐日系数: 气象系数 x 每天随机扰动
+    day_factors = np.array([[w * random.uniform(0.9, 1.1) for _ in range(DAYS)] for w in WEATHER_FACTORS])
+
+    result = PVForecastEngine.forecast(PVForecastEngine.profile_matrix(histories), day_factors,
+                                       BASE_FORECAST_RULES, split_idx=split_idx)
+
+    assert result.shape == (len(histories), len(WEATHER_FACTORS), DAYS, 288)
+    for g, history_map in enumerate(histories):
+        for f in range(len(WEATHER_FACTORS)):
+            for d in range(DAYS):
+                expected = legacy_forecast_series(history_map, float(day_factors[f, d]), split_idx)
+                assert result[g, f, d].tolist() == expected, f"grid={g} weather={f} day={d}"
+
+
+def test_single_factor_matches_legacy_loop():
+    # get_final_forecast_series 传入标量系数
+    history_map = _histories()[3]
+    result = PVForecastEngine.forecast(PVForecastEngine.profile_matrix([history_map]), 0.65, BASE_FORECAST_RULES,
+                                       split_idx=100)
+    assert result[0].tolist() == legacy_forecast_series(history_map, 0.65, 100)
+
+
+def test_round2_matches_builtin_round_near_half():
+    values = np.array([0.125, 0.135, 2.675, 1.005, -1.005, 800.005, 1e6 + 0.015, 0.0, -0.0, 123.4549999])
+    assert PVForecastEngine.round2(values.copy()).tolist() == [round(v, 2) for v in values.tolist()]
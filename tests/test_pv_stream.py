@@ -0,0 +1,25 @@
+# tests/test_pv_stream.py
+"""
+实时推送连接数上限: 达到 PV_STREAM_MAX_CLIENTS 后新连接返回 503，页面退回轮询接口；连接关闭后释放名额
+"""
+from app.services.pv_stream import pv_stream_hub
+
+
+def test_stream_rejects_connections_over_the_cap(app, monkeypatch):
+    monkeypatch.setattr(pv_stream_hub, 'max_clients', 1)
+    client = app.test_client()
+
+    first = client.get('/monitor/api/pv/stream', buffered=False)
+    assert first.status_code == 200
+    assert next(first.response).startswith(b'event: snapshot')
+
+    second = client.get('/monitor/api/pv/stream')
+    assert second.status_code == 503
+    assert second.get_json()['fallback'] == '/monitor/api/pv/realtime'
+    assert client.get('/monitor/api/pv/realtime').status_code == 200
+
+    first.close()
+    assert pv_stream_hub.subscriber_count() == 0
+    reconnected = client.get('/monitor/api/pv/stream', buffered=False)
+    assert reconnected.status_code == 200
+    reconnected.close()
@@ -0,0 +1,51 @@
+# tests/test_pv_upload.py
+"""
+单条上传接口与批量接口共用校验: 不合法的读数返回 400，既不入队也不进入最新读数缓存
+"""
+import pytest
+
+from app.extensions import db
+from app.models import GridPoint, Plant, PVDevice, PVGenerationData
+from app.services.pv_cache import pv_latest_cache
+
+
+@pytest.fixture
+def device(app):
+    plant = Plant(plant_code='T_PLANT', plant_name='测试厂区')
+    db.session.add(plant)
+    db.session.flush()
+    grid = GridPoint(plant_id=plant.plant_id, grid_code='T_GRID')
+    db.session.add(grid)
+    db.session.flush()
+    dev = PVDevice(grid_point_id=grid.grid_point_id, device_code='T_INV')
+    db.session.add(dev)
+    db.session.commit()
+    return dev
+
+
+@pytest.mark.parametrize('payload', [
+    {'device_id': 'x'},
+    {'device_id': 999},
+    {'device_id': None, 'string_voltage_v': 650},
+    {'string_voltage_v': 'abc'},
+    {'gen_kwh': [1]},
+])
+def test_invalid_reading_is_rejected_before_enqueue(app, device, payload):
+    payload = {'device_id': device.device_id, **payload}
+    pv_latest_cache.clear()
+
+    resp = app.test_client().post('/monitor/api/pv/upload', json=payload)
+
+    assert resp.status_code == 400
+    assert PVGenerationData.query.count() == 0
+    assert pv_latest_cache.get_all() == {}
+
+
+def test_valid_reading_is_stored_with_device_grid_point(app, device):
+    resp = app.test_client().post('/monitor/api/pv/upload', json={
+        'device_id': device.device_id, 'string_voltage_v': 650.5, 'string_current_a': 120})
+
+    assert resp.status_code == 200
+    row = PVGenerationData.query.one()
+    assert row.grid_point_id == device.grid_point_id
+    assert float(row.string_voltage_v) == 650.5
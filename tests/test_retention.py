@@ -0,0 +1,64 @@
+# tests/test_retention.py
+"""
+保留期清理与归档清单: 只清理已归档的日期 (残留行先合并进归档文件)，未归档的过期数据保留
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.extensions import db
+from app.models import CircuitData
+from app.services.archive_service import ArchiveService
+from app.services.retention_service import RetentionService
+
+TODAY = date(2026, 6, 1)
+
+
+@pytest.fixture
+def circuit_days(app, tmp_path, monkeypatch):
+    """ 两个过期日期 (只有第一个已归档，且归档后又补传了一行) 和一个保留期内的日期 """
+    monkeypatch.setitem(app.config, 'ARCHIVE_DIR', str(tmp_path / 'archive'))
+    archived, unarchived = TODAY - timedelta(days=400), TODAY - timedelta(days=380)
+    recent = TODAY - timedelta(days=10)
+
+    def add(day, n, first_hour=0):
+        start = datetime.combine(day, datetime.min.time())
+        db.session.add_all([CircuitData(power_room_id=1, circuit_code=f'C{h}', voltage_kv=35,
+                                        collect_time=start + timedelta(hours=h))
+                            for h in range(first_hour, first_hour + n)])
+        db.session.commit()
+
+    add(archived, 3)
+    ArchiveService.archive_day(CircuitData, archived)
+    add(archived, 1, first_hour=12)  # 归档后补传
+    add(unarchived, 2)
+    add(recent, 2)
+    return archived, unarchived, recent
+
+
+def _online_days():
+    return sorted({r.collect_time.date() for r in CircuitData.query})
+
+
+def test_only_archived_days_are_purged(app, circuit_days):
+    archived, unarchived, recent = circuit_days
+
+    plan = {item['table']: item for item in RetentionService.run(today=TODAY)}
+
+    item = plan['circuit_data']
+    assert item['mode'] == 'delete'
+    assert item['unarchived_days'] == [unarchived]
+    assert item['deleted_rows'] == 1
+    assert _online_days() == [unarchived, recent]
+    # 补传的行已合并进归档文件，没有丢失
+    assert len(ArchiveService.read_day(CircuitData, archived)['circuit_data_id']) == 4
+
+
+def test_purge_without_archive_when_disabled(app, circuit_days, monkeypatch):
+    _, _, recent = circuit_days
+    monkeypatch.setitem(app.config, 'RETENTION_REQUIRE_ARCHIVE', False)
+
+    item = next(i for i in RetentionService.run(today=TODAY) if i['table'] == 'circuit_data')
+
+    assert item['deleted_rows'] == 3
+    assert _online_days() == [recent]
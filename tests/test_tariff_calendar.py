@@ -0,0 +1,95 @@
+# tests/test_tariff_calendar.py
+"""
+分时电价日历: 季节切换、周末 / 法定节假日 / 调休上班的日程选择，以及半点边界的分钟级时段分类
+"""
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.services.tariff_calendar import PERIODS, TariffCalendar, TariffCalendarCache
+
+RAW = {
+    'schedules': {
+        'summer': {'sharp': ['10:30-11:30'], 'peak': ['08:00-22:00'], 'flat': ['06:30-08:00', '22:00-22:30']},
+        'offday': {'flat': ['08:00-22:00']},
+    },
+    'seasons': [{'months': [7, 8, 9], 'workday': 'summer', 'holiday': 'offday'}],
+    'weekend': [5, 6],
+    'holidays': ['2026-07-15'],
+    'workdays': ['2026-07-05'],
+}
+
+
+def _periods(calendar, timestamps):
+    return [PERIODS[code] for code in calendar.classify(timestamps)]
+
+
+def test_day_schedules_switch_season_and_follow_holidays():
+    calendar = TariffCalendar(RAW)
+    days = np.array(['2026-06-30', '2026-07-01', '2026-07-04', '2026-07-05', '2026-07-15', '2026-09-30',
+                     '2026-10-01', '2026-10-03'], dtype='datetime64[D]')
+    assert [calendar.names[i] for i in calendar.day_schedules(days)] == [
+        'default',   # 6 月不在任何季节
+        'summer',    # 7 月 1 日切换到夏季工作日日程
+        'offday',    # 周六
+        'summer',    # 周日但调休上班
+        'offday',    # 周三，法定节假日
+        'summer',    # 夏季最后一天
+        'default',   # 10 月回到默认日程 (未配置 holiday 的月份，节假日也用 default)
+        'default',   # 10 月的周六
+    ]
+
+
+def test_classify_on_season_switch_and_half_hour_boundaries():
+    calendar = TariffCalendar(RAW)
+    ts = [
+        datetime(2026, 6, 30, 10, 15),      # 默认日程 10 点整点为尖段
+        datetime(2026, 7, 1, 10, 15),       # 夏季尖段从 10:30 开始
+        datetime(2026, 7, 1, 10, 29, 59),   # 秒被截断，仍在 10:29
+        datetime(2026, 7, 1, 10, 30),
+        datetime(2026, 7, 1, 11, 29),
+        datetime(2026, 7, 1, 11, 30),       # 区间右端不含
+        datetime(2026, 7, 1, 6, 29),
+        datetime(2026, 7, 1, 6, 30),
+        datetime(2026, 7, 1, 22, 29),
+        datetime(2026, 7, 1, 22, 30),
+        datetime(2026, 7, 15, 10, 45),      # 节假日按 offday
+        datetime(2026, 7, 4, 7, 59),
+        datetime(2026, 7, 4, 8, 0),
+    ]
+    assert _periods(calendar, ts) == ['sharp', 'peak', 'peak', 'sharp', 'sharp', 'peak', 'valley', 'flat',
+                                      'flat', 'valley', 'flat', 'valley', 'flat']
+
+
+def test_peak_hours_overlay_and_overnight_range():
+    calendar = TariffCalendar({}, peak_hours='06:30-07:00,23:30-00:30')
+    ts = [datetime(2026, 3, 2, h, m) for h, m in [(6, 29), (6, 30), (6, 59), (7, 0), (23, 29), (23, 30), (0, 29),
+                                                   (0, 30), (10, 0)]]
+    # 默认日程 6 点为平段、23 点为平段、0 点为谷段；叠加的峰段不覆盖尖段
+    assert _periods(calendar, ts) == ['flat', 'peak', 'peak', 'flat', 'flat', 'peak', 'peak', 'valley', 'sharp']
+
+
+def test_bucket_sums_match_per_reading_classification():
+    calendar = TariffCalendar(RAW)
+    rng = np.random.default_rng(7)
+    start = np.datetime64('2026-06-28T00:00')
+    ts = start + rng.integers(0, 10 * 24 * 60, 500).astype('timedelta64[m]')
+    values = rng.uniform(0, 10, 500)
+
+    expected = dict.fromkeys(PERIODS, 0.0)
+    for t, v in zip(ts, values):
+        expected[PERIODS[calendar.classify([t])[0]]] += v
+    assert calendar.bucket_sums(ts, values) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('text', [
+    '{"schedules": {"x": {"noon": ["12:00-13:00"]}}}',
+    '{"schedules": {"x": {"peak": ["25:00-26:00"]}}}',
+    '{"seasons": [{"months": [13]}]}',
+    '{"seasons": [{"months": [7], "workday": "missing"}]}',
+    '[1]',
+])
+def test_invalid_calendar_is_rejected(text):
+    with pytest.raises(ValueError):
+        TariffCalendarCache.parse(text)
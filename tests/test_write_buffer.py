@@ -0,0 +1,53 @@
+# tests/test_write_buffer.py
+"""
+写后缓冲刷写: 原始数据与写入钩子同一事务；坏行被二分拆批隔离，数据库暂不可用时整批重试
+"""
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.exc import OperationalError
+
+from app.extensions import db
+from app.models import PVGenerationData, PVSlotRollup
+from app.services.pv_rollup_service import PVRollupService
+from app.services.write_buffer import write_buffer
+
+
+def _rows(n):
+    now = datetime(2026, 3, 2, 10, 0)
+    return [dict(device_id=1, grid_point_id=1, collect_time=now, string_voltage_v=650.0,
+                 string_current_a=100.0, inverter_eff_pct=98.5, gen_kwh=1.0) for _ in range(n)]
+
+
+def _counts():
+    raw = db.session.query(func.count(PVGenerationData.gen_data_id)).scalar()
+    rolled = db.session.query(func.coalesce(func.sum(PVSlotRollup.reading_cnt), 0)).scalar()
+    return raw, int(rolled)
+
+
+def test_bad_row_is_isolated_and_good_rows_commit_with_rollup(app):
+    rows = _rows(8)
+    rows[5]['string_voltage_v'] = 'abc'  # 汇总钩子无法解析，整批失败后应只丢弃这一行
+    failed = write_buffer.stats()['failed_rows']
+
+    write_buffer.submit(PVGenerationData, rows)
+
+    assert _counts() == (7, 7)
+    assert write_buffer.stats()['failed_rows'] == failed + 1
+
+
+def test_operational_error_retries_whole_batch_once(app, monkeypatch):
+    calls = []
+
+    def flaky(rows):
+        calls.append(len(rows))
+        if len(calls) == 1:
+            raise OperationalError('INSERT', {}, Exception('Lock wait timeout exceeded'))
+
+    monkeypatch.setitem(write_buffer._hooks, PVGenerationData, [flaky, PVRollupService.apply])
+
+    write_buffer.submit(PVGenerationData, _rows(4))
+    assert _counts() == (0, 0)  # 整批回滚，等待重试
+
+    write_buffer.flush()
+    assert calls == [4, 4]
+    assert _counts() == (4, 4)